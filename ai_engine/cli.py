@@ -10,6 +10,7 @@ from rich.syntax import Syntax
 from rich.table import Table
 from rich.panel import Panel
 from rich.markdown import Markdown
+from rich.live import Live
 from .core import AIEngine
 from .lm_studio import LMStudioInterface
 
@@ -86,48 +87,57 @@ class AICLI(cmd.Cmd):
             self.console.print(f"[red]Erro: {str(e)}[/red]")
     
     def do_validar(self, arg):
-        """Valida o código do arquivo especificado.
+        """Valida o código dos arquivos especificados.
         
-        Uso: validar <arquivo>
+        Uso: validar <arquivo> [<arquivo> ...]
         """
         if not arg:
             self.console.print("[red]Especifique o arquivo[/red]")
             return
             
         try:
-            file_path = Path(arg)
-            if not file_path.exists():
-                self.console.print("[red]Arquivo não encontrado[/red]")
-                return
+            file_paths = [Path(path) for path in arg.split()]
+            for file_path in file_paths:
+                if not file_path.exists():
+                    self.console.print(f"[red]Arquivo não encontrado: {file_path}[/red]")
+                    return
                 
-            code = file_path.read_text()
-            result = self.lm_studio.validate_code(code)
-            
-            # Mostra resultado
-            table = Table(title=f"Validação de {file_path.name}")
-            table.add_column("Tipo")
-            table.add_column("Detalhes")
-            
-            if result["erros"]:
-                for erro in result["erros"]:
-                    table.add_row("Erro", erro, style="red")
-                    
-            if result["warnings"]:
-                for warn in result["warnings"]:
-                    table.add_row("Warning", warn, style="yellow")
-                    
-            if result["sugestões"]:
-                for sug in result["sugestões"]:
-                    table.add_row("Sugestão", sug, style="blue")
-                    
-            table.add_row("Score", f"{result['score']}/10", 
-                         style="green" if result['score'] >= 7 else "yellow")
+            # Vários arquivos são validados em lotes concorrentes
+            codes = [file_path.read_text() for file_path in file_paths]
+            if len(codes) == 1:
+                results = [self.lm_studio.validate_code(codes[0])]
+            else:
+                results = self.lm_studio.validate_codes(codes)
             
-            self.console.print(table)
+            for file_path, result in zip(file_paths, results):
+                self._mostrar_validacao(file_path, result)
             
         except Exception as e:
             self.console.print(f"[red]Erro: {str(e)}[/red]")
     
+    def _mostrar_validacao(self, file_path: Path, result: dict):
+        """Mostra o resultado da validação de um arquivo."""
+        table = Table(title=f"Validação de {file_path.name}")
+        table.add_column("Tipo")
+        table.add_column("Detalhes")
+        
+        if result["erros"]:
+            for erro in result["erros"]:
+                table.add_row("Erro", erro, style="red")
+                
+        if result["warnings"]:
+            for warn in result["warnings"]:
+                table.add_row("Warning", warn, style="yellow")
+                
+        if result["sugestões"]:
+            for sug in result["sugestões"]:
+                table.add_row("Sugestão", sug, style="blue")
+                
+        table.add_row("Score", f"{result['score']}/10", 
+                     style="green" if result['score'] >= 7 else "yellow")
+        
+        self.console.print(table)
+    
     def do_explicar(self, arg):
         """Gera explicação detalhada do código.
         
@@ -144,13 +154,20 @@ class AICLI(cmd.Cmd):
                 return
                 
             code = file_path.read_text()
-            explanation = self.lm_studio.explain_code(code)
             
-            self.console.print(Panel(
-                Markdown(explanation),
-                title=f"Explicação de {file_path.name}",
-                border_style="blue"
-            ))
+            # Mostra os tokens conforme o modelo os gera
+            explanation = ""
+            with Live(console=self.console, refresh_per_second=8) as live:
+                for token in self.lm_studio.explain_code_stream(code):
+                    explanation += token
+                    live.update(Panel(
+                        Markdown(explanation),
+                        title=f"Explicação de {file_path.name}",
+                        border_style="blue"
+                    ))
+            
+            if not explanation:
+                self.console.print("[red]Erro ao gerar explicação[/red]")
             
         except Exception as e:
             self.console.print(f"[red]Erro: {str(e)}[/red]")
@@ -0,0 +1,242 @@
+import json
+import logging
+import threading
+from typing import Dict, Iterator, AsyncIterator, List, Optional, Union
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+def _completion_payload(prompt: Union[str, List[str]], max_tokens: int, temperature: float,
+                        top_p: float, stream: bool) -> Dict:
+    return {
+        "prompt": prompt,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "top_p": top_p,
+        "stream": stream
+    }
+
+class BatchingNotSupported(Exception):
+    """O servidor não aceita ``prompt`` como lista."""
+
+# Marcador de fim do stream SSE
+_DONE = object()
+
+def _parse_sse_line(line: str):
+    """Extrai o texto de uma linha SSE da API de completions.
+
+    Retorna None para linhas sem conteúdo e ``_DONE`` no marcador ``[DONE]``.
+    """
+    if not line.startswith("data:"):
+        return None
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return _DONE
+    try:
+        return json.loads(data)["choices"][0].get("text") or None
+    except (ValueError, KeyError, IndexError):
+        return None
+
+class LLMClient:
+    """Cliente HTTP compartilhado para servidores compatíveis com a API OpenAI.
+
+    Mantém um ``requests.Session`` com pool de conexões keep-alive, evitando
+    um novo handshake TCP a cada completion.
+    """
+
+    def __init__(self, base_url: str, pool_size: int = 10, timeout: float = 120):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def complete(self,
+                 prompt: str,
+                 max_tokens: int = 2000,
+                 temperature: float = 0.7,
+                 top_p: float = 0.95,
+                 timeout: float = None) -> Optional[str]:
+        """Gera a completion inteira de uma vez."""
+        try:
+            response = self.session.post(
+                f"{self.base_url}/completions",
+                json=_completion_payload(prompt, max_tokens, temperature, top_p, False),
+                timeout=timeout or self.timeout
+            )
+
+            if response.status_code == 200:
+                return response.json()["choices"][0]["text"]
+            else:
+                logger.error(f"Erro na API do LLM: {response.status_code}")
+                return None
+
+        except Exception as e:
+            logger.error(f"Erro ao gerar completion: {str(e)}")
+            return None
+
+    def stream(self,
+               prompt: str,
+               max_tokens: int = 2000,
+               temperature: float = 0.7,
+               top_p: float = 0.95,
+               timeout: float = None) -> Iterator[str]:
+        """Gera a completion token a token via SSE."""
+        try:
+            with self.session.post(
+                f"{self.base_url}/completions",
+                json=_completion_payload(prompt, max_tokens, temperature, top_p, True),
+                timeout=timeout or self.timeout,
+                stream=True
+            ) as response:
+                if response.status_code != 200:
+                    logger.error(f"Erro na API do LLM: {response.status_code}")
+                    return
+
+                for line in response.iter_lines(decode_unicode=True):
+                    text = _parse_sse_line(line or "")
+                    if text is _DONE:
+                        return
+                    if text:
+                        yield text
+
+        except Exception as e:
+            logger.error(f"Erro no streaming da completion: {str(e)}")
+
+    def list_models(self, timeout: float = 5) -> List[str]:
+        """Ids dos modelos carregados no servidor (vazio se indisponível)."""
+        try:
+            response = self.session.get(f"{self.base_url}/models", timeout=timeout)
+            if response.status_code == 200:
+                return [model["id"] for model in response.json().get("data", [])]
+            logger.error(f"Erro na API do LLM: {response.status_code}")
+        except Exception as e:
+            logger.error(f"Erro ao listar modelos: {str(e)}")
+        return []
+
+    def close(self):
+        self.session.close()
+
+class AsyncLLMClient:
+    """Variante asyncio do cliente, sobre ``aiohttp`` com conexões reutilizadas."""
+
+    def __init__(self, base_url: str, pool_size: int = 10, timeout: float = 120):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._session = None
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def complete(self,
+                       prompt: str,
+                       max_tokens: int = 2000,
+                       temperature: float = 0.7,
+                       top_p: float = 0.95) -> Optional[str]:
+        """Gera a completion inteira de uma vez."""
+        try:
+            session = await self._get_session()
+            async with session.post(
+                f"{self.base_url}/completions",
+                json=_completion_payload(prompt, max_tokens, temperature, top_p, False)
+            ) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    return result["choices"][0]["text"]
+                else:
+                    logger.error(f"Erro na API do LLM: {response.status}")
+                    return None
+
+        except Exception as e:
+            logger.error(f"Erro ao gerar completion: {str(e)}")
+            return None
+
+    async def complete_batch(self,
+                             prompts: List[str],
+                             max_tokens: int = 2000,
+                             temperature: float = 0.7,
+                             top_p: float = 0.95) -> List[Optional[str]]:
+        """Gera várias completions em uma chamada (``prompt`` como lista).
+
+        Levanta ``BatchingNotSupported`` se o servidor recusar o lote.
+        """
+        try:
+            session = await self._get_session()
+            async with session.post(
+                f"{self.base_url}/completions",
+                json=_completion_payload(prompts, max_tokens, temperature, top_p, False)
+            ) as response:
+                if 400 <= response.status < 500 and response.status not in (408, 429):
+                    raise BatchingNotSupported(f"Lote recusado pelo servidor: {response.status}")
+                if response.status != 200:
+                    logger.error(f"Erro na API do LLM: {response.status}")
+                    return [None] * len(prompts)
+
+                result = await response.json()
+                if len(result.get("choices", [])) < len(prompts):
+                    # O servidor tratou a lista como um único prompt
+                    raise BatchingNotSupported("Resposta com menos escolhas que prompts")
+                texts = [None] * len(prompts)
+                for position, choice in enumerate(result["choices"]):
+                    index = choice.get("index", position)
+                    if index < len(texts):
+                        texts[index] = choice["text"]
+                return texts
+
+        except BatchingNotSupported:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao gerar completions em lote: {str(e)}")
+            return [None] * len(prompts)
+
+    async def stream(self,
+                     prompt: str,
+                     max_tokens: int = 2000,
+                     temperature: float = 0.7,
+                     top_p: float = 0.95) -> AsyncIterator[str]:
+        """Gera a completion token a token via SSE."""
+        try:
+            session = await self._get_session()
+            async with session.post(
+                f"{self.base_url}/completions",
+                json=_completion_payload(prompt, max_tokens, temperature, top_p, True)
+            ) as response:
+                if response.status != 200:
+                    logger.error(f"Erro na API do LLM: {response.status}")
+                    return
+
+                async for raw_line in response.content:
+                    text = _parse_sse_line(raw_line.decode("utf-8").strip())
+                    if text is _DONE:
+                        return
+                    if text:
+                        yield text
+
+        except Exception as e:
+            logger.error(f"Erro no streaming da completion: {str(e)}")
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+_clients: Dict[str, LLMClient] = {}
+_clients_lock = threading.Lock()
+
+def get_client(base_url: str) -> LLMClient:
+    """Retorna o cliente compartilhado do processo para a URL informada."""
+    with _clients_lock:
+        client = _clients.get(base_url)
+        if client is None:
+            client = _clients[base_url] = LLMClient(base_url)
+        return client
@@ -0,0 +1,157 @@
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path("ai_engine/cache/completions.sqlite3")
+
+class CompletionCache:
+    """Cache persistente de completions, limitado por bytes e entradas.
+
+    As chaves são o sha256 dos parâmetros que determinam a resposta
+    (modelo, prompt, max_tokens, temperature, top_p), estáveis entre
+    execuções. Ao exceder os limites, as entradas acessadas há mais tempo
+    são removidas.
+    """
+
+    def __init__(self,
+                 path: Path = DEFAULT_CACHE_PATH,
+                 max_bytes: int = 256 * 1024 * 1024,
+                 max_entries: int = 10000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_completions_access
+                ON completions (last_access);
+        """)
+        self._total_bytes, self._entries = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM completions"
+        ).fetchone()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, max_tokens: int,
+                 temperature: float, top_p: float) -> str:
+        """Gera a chave estável de uma requisição."""
+        data = json.dumps({
+            "model": model,
+            "prompt": prompt,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": top_p
+        }, sort_keys=True)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    @staticmethod
+    def should_cache(temperature: float, cache: Optional[bool] = None) -> bool:
+        """Só requisições determinísticas ou explicitamente marcadas são cacheadas."""
+        if cache is not None:
+            return cache
+        return temperature == 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Recupera uma completion, atualizando o horário de acesso."""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT response FROM completions WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                self._conn.execute(
+                    "UPDATE completions SET last_access = ? WHERE key = ?",
+                    (time.time(), key)
+                )
+                self._conn.commit()
+                return row[0]
+
+        except Exception as e:
+            logger.error(f"Erro ao ler cache de completions: {str(e)}")
+            return None
+
+    def set(self, key: str, response: str, model: str = None):
+        """Armazena uma completion e aplica os limites de tamanho."""
+        try:
+            size = len(response.encode())
+            now = time.time()
+            with self._lock:
+                previous = self._conn.execute(
+                    "SELECT size FROM completions WHERE key = ?", (key,)
+                ).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO completions "
+                    "(key, model, response, size, created, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, response, size, now, now)
+                )
+                if previous is not None:
+                    self._total_bytes -= previous[0]
+                    self._entries -= 1
+                self._total_bytes += size
+                self._entries += 1
+                self._evict()
+                self._conn.commit()
+
+        except Exception as e:
+            logger.error(f"Erro ao gravar cache de completions: {str(e)}")
+
+    def _evict(self):
+        """Remove as entradas menos usadas até respeitar os limites."""
+        while self._entries > self.max_entries or self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM completions ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self._entries <= self.max_entries and self._total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self._entries -= 1
+
+    def clear(self):
+        """Remove todas as completions."""
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._conn.commit()
+            self._total_bytes = 0
+            self._entries = 0
+
+    def get_stats(self) -> Dict:
+        """Retorna estatísticas do cache."""
+        return {
+            "entries": self._entries,
+            "total_bytes": self._total_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes
+        }
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+def get_completion_cache() -> CompletionCache:
+    """Retorna o cache de completions compartilhado do processo."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = CompletionCache()
+        return _default_cache
@@ -1,18 +1,61 @@
 import os
 import json
+import hashlib
 import logging
-import requests
-from typing import Dict, List, Optional, Union
-from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Union
+from dataclasses import dataclass, field
+from datetime import datetime
 from pathlib import Path
 import subprocess
 import tempfile
 import shutil
+import sys
+import time
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .client import get_client
+from .dispatcher import get_dispatcher
+from .completion_cache import CompletionCache, get_completion_cache
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Abaixo disso a checagem sintática roda em série (criar processos custa mais)
+PARALLEL_SYNTAX_MIN_FILES = 8
+
+# Unidades de código guardadas na knowledge base para reuso
+MAX_STORED_UNITS = 500
+
+# Segundos que o id do modelo consultado no servidor vale (e, após uma
+# falha, até a próxima consulta)
+MODEL_ID_TTL = 60
+MODEL_ID_RETRY = 5
+
+# Tempo máximo de cada processo pytest e intervalo entre verificações
+TEST_FILE_TIMEOUT = 300
+TEST_POLL_INTERVAL = 0.05
+
+_syntax_pool = None
+_syntax_pool_lock = threading.Lock()
+
+def _get_syntax_pool(max_workers: int = None) -> ProcessPoolExecutor:
+    """Pool de processos da checagem sintática, compartilhado pelo processo."""
+    global _syntax_pool
+    with _syntax_pool_lock:
+        if _syntax_pool is None:
+            _syntax_pool = ProcessPoolExecutor(max_workers=max_workers)
+        return _syntax_pool
+
+def _compile_source(path: str, content: str) -> Optional[str]:
+    """Compila um arquivo Python e retorna a mensagem de erro, se houver."""
+    try:
+        compile(content, path, "exec", dont_inherit=True)
+        return None
+    except (SyntaxError, ValueError) as e:
+        return f"{path}: {e}"
+
 @dataclass
 class ProjectSpec:
     name: str
@@ -30,10 +73,18 @@ class CodeGenResult:
     dependencies: Dict[str, str]  # name -> version
     build_steps: List[str]
     validation_results: Dict[str, bool]
+    units: Dict[str, str] = field(default_factory=dict)  # hash da unidade -> nome
 
 class AIEngine:
-    def __init__(self, lm_studio_url: str = "http://localhost:1234/v1"):
+    def __init__(self, lm_studio_url: str = "http://localhost:1234/v1", model: str = "default"):
         self.lm_studio_url = lm_studio_url
+        self.model = model
+        self._model_id = None
+        self._model_id_expires = 0.0
+        self.completion_cache = get_completion_cache()
+        self.client = get_client(lm_studio_url)
+        # Completions passam pelo dispatcher do backend (limite de chamadas e rodízio por usuário)
+        self.dispatcher = get_dispatcher(lm_studio_url)
         self.cache_dir = Path("ai_engine/cache")
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.knowledge_base = self._load_knowledge_base()
@@ -42,36 +93,75 @@ class AIEngine:
         kb_path = self.cache_dir / "knowledge_base.json"
         if kb_path.exists():
             return json.loads(kb_path.read_text())
-        return {"decisions": [], "corrections": [], "patterns": []}
+        return {"decisions": [], "corrections": [], "patterns": [], "units": {}}
     
     def _save_knowledge_base(self):
         kb_path = self.cache_dir / "knowledge_base.json"
         kb_path.write_text(json.dumps(self.knowledge_base, indent=2))
     
-    def _generate_completion(self, prompt: str, max_tokens: int = 2000) -> str:
-        """Gera completions usando LM Studio local."""
-        try:
-            response = requests.post(
-                f"{self.lm_studio_url}/completions",
-                json={
-                    "prompt": prompt,
-                    "max_tokens": max_tokens,
-                    "temperature": 0.7,
-                    "top_p": 0.95,
-                    "stream": False
-                },
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return response.json()["choices"][0]["text"]
-            else:
-                logger.error(f"Erro na API do LM Studio: {response.status_code}")
-                return None
-        except Exception as e:
-            logger.error(f"Erro ao gerar completion: {str(e)}")
-            return None
-    
+    @property
+    def model_id(self) -> str:
+        """Identificador do modelo nas chaves do cache de completions.
+
+        É o nome do arquivo do modelo, o mesmo de ``LMStudioInterface.model_name``,
+        para que as duas classes compartilhem as entradas. Com ``model="default"``
+        o modelo carregado é consultado no servidor a cada ``MODEL_ID_TTL``
+        segundos, para acompanhar a troca de modelo no LM Studio; com o
+        servidor indisponível, ``"default"`` vale por ``MODEL_ID_RETRY``.
+        """
+        if self.model != "default":
+            return Path(self.model).name
+
+        now = time.monotonic()
+        if self._model_id is None or now >= self._model_id_expires:
+            models = self.client.list_models()
+            self._model_id = Path(models[0]).name if models else self.model
+            self._model_id_expires = now + (MODEL_ID_TTL if models else MODEL_ID_RETRY)
+        return self._model_id
+
+    def _generate_completion(self, prompt: str, max_tokens: int = 2000,
+                             temperature: float = 0.7, cache: Optional[bool] = None,
+                             user: str = "anon", refresh: bool = False) -> str:
+        """Gera completions usando LM Studio local.
+
+        Só respostas com ``temperature`` 0 (ou ``cache=True``) entram no
+        cache de completions; a especificação e o código pedem temperatura 0
+        para serem determinísticos. Com ``refresh=True`` a resposta guardada
+        é ignorada e substituída pela nova.
+        """
+        cache_key = None
+        if CompletionCache.should_cache(temperature, cache):
+            cache_key = CompletionCache.make_key(self.model_id, prompt, max_tokens, temperature, 0.95)
+            cached = None if refresh else self.completion_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        result = self.dispatcher.submit_sync(
+            prompt,
+            user,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=0.95
+        )
+
+        if result is not None and cache_key:
+            self.completion_cache.set(cache_key, result, model=self.model_id)
+        return result
+
+    def stream_completion(self, prompt: str, max_tokens: int = 2000, user: str = "anon") -> Iterator[str]:
+        """Gera a completion em streaming, token a token (usado pelo chat da interface web).
+
+        Passa pelo dispatcher compartilhado do backend, que aplica o rodízio
+        entre usuários e o limite de chamadas simultâneas.
+        """
+        return self.dispatcher.stream_sync(
+            prompt,
+            user,
+            max_tokens=max_tokens,
+            temperature=0.7,
+            top_p=0.95
+        )
+
     def parse_requirements(self, prompt: str) -> ProjectSpec:
         """Converte requisitos em linguagem natural para especificação técnica."""
         system_prompt = """Você é um especialista em arquitetura de software.
@@ -79,7 +169,7 @@ class AIEngine:
         Inclua: plataforma alvo, linguagem, dependências, features e arquitetura."""
         
         full_prompt = f"{system_prompt}\n\nRequisitos:\n{prompt}\n\nEspecificação:"
-        result = self._generate_completion(full_prompt)
+        result = self._generate_completion(full_prompt, temperature=0.0)
         
         try:
             spec_dict = json.loads(result)
@@ -88,23 +178,156 @@ class AIEngine:
             logger.error(f"Erro ao parsear especificação: {str(e)}")
             return None
     
-    def generate_code(self, spec: ProjectSpec) -> CodeGenResult:
-        """Gera código baseado na especificação."""
+    def _split_units(self, spec: ProjectSpec) -> List[Dict]:
+        """Divide a especificação em unidades geradas de forma independente.
+
+        Usa os módulos declarados em ``architecture['modules']`` quando
+        existirem; caso contrário, uma unidade por feature.
+        """
+        modules = (spec.architecture or {}).get("modules")
+        if isinstance(modules, dict):
+            return [{"name": name, "description": desc} for name, desc in modules.items()]
+        if isinstance(modules, list) and modules:
+            return [
+                module if isinstance(module, dict) else {"name": str(module), "description": str(module)}
+                for module in modules
+            ]
+        return [{"name": feature, "description": feature} for feature in spec.features]
+
+    def _unit_prompt(self, spec: ProjectSpec, unit: Dict) -> str:
+        """Prompt que gera o código de uma única unidade."""
         system_prompt = """Você é um expert em desenvolvimento de software.
-        Gere código completo baseado na especificação, incluindo testes."""
-        
-        full_prompt = f"{system_prompt}\n\nEspecificação:\n{json.dumps(spec.__dict__)}\n\nCódigo:"
-        result = self._generate_completion(full_prompt)
-        
+        Gere apenas o código do módulo indicado, incluindo testes.
+        Retorne um JSON com: files, tests, dependencies e build_steps."""
+
+        context = {
+            "name": spec.name,
+            "description": spec.description,
+            "platform": spec.platform,
+            "language": spec.language,
+            "dependencies": spec.dependencies
+        }
+        return (
+            f"{system_prompt}\n\nProjeto:\n{json.dumps(context, sort_keys=True)}"
+            f"\n\nMódulo:\n{json.dumps(unit, sort_keys=True)}\n\nCódigo:"
+        )
+
+    def _unit_hash(self, spec: ProjectSpec, unit: Dict) -> str:
+        """Hash das entradas que determinam o código de uma unidade.
+
+        Cobre o prompt inteiro, de modo que qualquer campo enviado ao modelo
+        (inclusive a descrição do projeto) invalida a unidade guardada.
+        """
+        data = json.dumps({
+            "model": self.model_id,
+            "prompt": self._unit_prompt(spec, unit)
+        }, sort_keys=True)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def _generate_unit(self, spec: ProjectSpec, unit: Dict, refresh: bool = False) -> Optional[Dict]:
+        """Pede ao modelo o código de uma única unidade.
+
+        ``refresh=True`` não reaproveita a completion em cache, para que uma
+        unidade reprovada não receba de volta a mesma resposta.
+        """
+        result = self._generate_completion(self._unit_prompt(spec, unit), temperature=0.0, refresh=refresh)
+
         try:
             code_dict = json.loads(result)
-            return CodeGenResult(**code_dict)
+            return {
+                "files": code_dict.get("files", {}),
+                "tests": code_dict.get("tests", {}),
+                "dependencies": code_dict.get("dependencies", {}),
+                "build_steps": code_dict.get("build_steps", [])
+            }
         except Exception as e:
-            logger.error(f"Erro ao gerar código: {str(e)}")
+            logger.error(f"Erro ao gerar módulo {unit.get('name')}: {str(e)}")
             return None
+
+    def _evict_units(self, stored_units: Dict[str, Dict], keep: Dict[str, str]):
+        """Mantém no máximo ``MAX_STORED_UNITS`` unidades na knowledge base.
+
+        Descarta primeiro as não validadas e, entre elas, as usadas há mais
+        tempo; as unidades em ``keep`` (o resultado atual) são preservadas.
+        """
+        excess = len(stored_units) - MAX_STORED_UNITS
+        if excess <= 0:
+            return
+        candidates = sorted(
+            (unit_hash for unit_hash in stored_units if unit_hash not in keep),
+            key=lambda unit_hash: (bool(stored_units[unit_hash].get("validated")),
+                                   stored_units[unit_hash].get("last_used", 0))
+        )
+        for unit_hash in candidates[:excess]:
+            del stored_units[unit_hash]
+
+    def generate_code(self, spec: ProjectSpec) -> CodeGenResult:
+        """Gera código baseado na especificação.
+
+        Cada unidade (módulo ou feature) é identificada pelo hash das suas
+        entradas; unidades já geradas e validadas são reaproveitadas da
+        knowledge base e só as alteradas voltam ao modelo.
+        """
+        result = CodeGenResult(
+            files={}, tests={}, dependencies={}, build_steps=[], validation_results={}
+        )
+        stored_units = self.knowledge_base.setdefault("units", {})
+        reused = 0
+
+        for unit in self._split_units(spec):
+            unit_hash = self._unit_hash(spec, unit)
+            stored = stored_units.get(unit_hash)
+            if stored and stored.get("validated"):
+                code = stored
+                reused += 1
+            else:
+                # Uma unidade guardada sem validação é gerada de novo fora do cache
+                code = self._generate_unit(spec, unit, refresh=stored is not None)
+                if code is None:
+                    return None
+                stored_units[unit_hash] = code = dict(code, name=unit.get("name"), validated=False)
+            code["last_used"] = time.time()
+
+            result.files.update(code["files"])
+            result.tests.update(code["tests"])
+            result.dependencies.update(code["dependencies"])
+            result.build_steps.extend(
+                step for step in code["build_steps"] if step not in result.build_steps
+            )
+            result.units[unit_hash] = unit.get("name")
+
+        logger.info(f"Unidades reaproveitadas: {reused}/{len(result.units)}")
+        self._evict_units(stored_units, result.units)
+        self._save_knowledge_base()
+        return result
+
+    def _mark_units_validated(self, result: CodeGenResult):
+        """Marca as unidades do resultado como validadas para reuso futuro."""
+        stored_units = self.knowledge_base.setdefault("units", {})
+        for unit_hash in result.units:
+            if unit_hash in stored_units:
+                stored_units[unit_hash]["validated"] = True
+        self._save_knowledge_base()
     
-    def validate_code(self, result: CodeGenResult) -> bool:
-        """Valida o código gerado usando análise estática e testes."""
+    def validate_code(self, result: CodeGenResult, max_workers: int = None) -> bool:
+        """Valida o código gerado usando análise estática e testes.
+
+        A checagem sintática roda por arquivo em um pool de processos e
+        interrompe na primeira falha; os testes rodam um processo pytest por
+        arquivo de teste, em paralelo.
+        """
+        sources = {
+            path: content
+            for path, content in {**result.files, **result.tests}.items()
+            if path.endswith(".py")
+        }
+        error = self._check_syntax(sources, max_workers)
+        result.validation_results["syntax"] = error is None
+        if error:
+            logger.error(f"Erro de sintaxe no código gerado: {error}")
+            result.validation_results["tests"] = False
+            return False
+
         with tempfile.TemporaryDirectory() as tmpdir:
             # Cria estrutura de arquivos temporária
             tmp_path = Path(tmpdir)
@@ -119,16 +342,77 @@ class AIEngine:
                 full_path.parent.mkdir(parents=True, exist_ok=True)
                 full_path.write_text(test_content)
             
-            try:
-                # Executa testes no ambiente virtual
-                subprocess.run(
-                    ["python", "-m", "pytest", str(tmp_path)],
-                    check=True,
-                    capture_output=True
-                )
-                return True
-            except subprocess.CalledProcessError:
-                return False
+            passed = self._run_tests(tmp_path, list(result.tests), max_workers)
+            result.validation_results["tests"] = passed
+            return passed
+
+    def _check_syntax(self, sources: Dict[str, str], max_workers: int = None) -> Optional[str]:
+        """Compila cada arquivo e retorna a primeira falha encontrada."""
+        if len(sources) < PARALLEL_SYNTAX_MIN_FILES:
+            for path, content in sources.items():
+                error = _compile_source(path, content)
+                if error:
+                    return error
+            return None
+
+        futures = [
+            _get_syntax_pool(max_workers).submit(_compile_source, path, content)
+            for path, content in sources.items()
+        ]
+        try:
+            for future in as_completed(futures):
+                error = future.result()
+                if error:
+                    return error
+            return None
+        finally:
+            # Descarta o que ainda não começou após a primeira falha
+            for future in futures:
+                future.cancel()
+
+    def _run_tests(self, tmp_path: Path, test_paths: List[str], max_workers: int = None,
+                   timeout: float = TEST_FILE_TIMEOUT) -> bool:
+        """Executa um pytest por arquivo de teste, em paralelo.
+
+        Na primeira falha (ou estouro de ``timeout`` segundos de um arquivo)
+        os processos ainda em execução são encerrados antes do retorno, já
+        que o diretório temporário é apagado logo em seguida.
+        """
+        pending = deque(test_paths or [str(tmp_path)])
+        limit = max_workers or os.cpu_count() or 1
+        running: Dict[subprocess.Popen, tuple] = {}
+        try:
+            while pending or running:
+                while pending and len(running) < limit:
+                    target = pending.popleft()
+                    process = subprocess.Popen(
+                        [sys.executable, "-m", "pytest", "-q", target],
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL,
+                        cwd=str(tmp_path)
+                    )
+                    running[process] = (target, time.monotonic() + timeout)
+
+                for process, (target, deadline) in list(running.items()):
+                    returncode = process.poll()
+                    if returncode is None:
+                        if time.monotonic() > deadline:
+                            logger.error(f"Testes de {target} excederam {timeout}s")
+                            return False
+                        continue
+                    del running[process]
+                    if returncode != 0:
+                        logger.error(f"Testes de {target} falharam")
+                        return False
+
+                if running:
+                    time.sleep(TEST_POLL_INTERVAL)
+            return True
+        finally:
+            for process in running:
+                process.kill()
+            for process in running:
+                process.wait()
     
     def deploy_project(self, result: CodeGenResult, output_dir: str):
         """Deploy do projeto para o diretório especificado."""
@@ -175,6 +459,7 @@ class AIEngine:
             # 3. Validação
             if not self.validate_code(result):
                 return False
+            self._mark_units_validated(result)
             
             # 4. Deploy
             self.deploy_project(result, output_dir)
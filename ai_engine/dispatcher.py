@@ -0,0 +1,264 @@
+import queue
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Deque, Dict, Iterator, List, Optional
+
+from config.system_config import LLM_DISPATCH_CONFIG
+from .client import AsyncLLMClient, BatchingNotSupported
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class _PendingRequest:
+    prompt: str
+    user: str
+    params: tuple  # (max_tokens, temperature, top_p)
+    future: asyncio.Future = field(repr=False)
+    stream: bool = False
+
+class LLMDispatcher:
+    """Despachante de prompts para um backend local (LM Studio/Ollama).
+
+    Agrupa prompts concorrentes com os mesmos parâmetros em uma única
+    chamada quando o servidor aceita ``prompt`` como lista, limita o número
+    de chamadas simultâneas ao backend e atende os usuários em rodízio, para
+    que um usuário com muitas requisições não bloqueie os demais.
+
+    Com ``supports_batching=None`` o suporte a lotes é detectado no primeiro
+    lote: se o servidor o recusar, os prompts são reenviados um a um e os
+    lotes ficam desativados. Streams ocupam uma vaga no backend do início ao
+    fim e entram no mesmo rodízio.
+    """
+
+    def __init__(self,
+                 base_url: str,
+                 max_in_flight: int = 2,
+                 max_batch_size: int = 8,
+                 batch_window: float = 0.01,
+                 supports_batching: Optional[bool] = None,
+                 client: AsyncLLMClient = None):
+        self.client = client or AsyncLLMClient(base_url)
+        self.supports_batching = supports_batching
+        self.max_batch_size = max_batch_size if supports_batching is not False else 1
+        self.batch_window = batch_window
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._queues: 'OrderedDict[str, Deque[_PendingRequest]]' = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._tasks = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _enqueue(self, prompt: str, user: str, params: tuple, stream: bool = False) -> asyncio.Future:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        request = _PendingRequest(prompt, user, params, future, stream)
+        self._queues.setdefault(user, deque()).append(request)
+        self._wakeup.set()
+        return future
+
+    async def submit(self,
+                     prompt: str,
+                     user: str = "anon",
+                     max_tokens: int = 2000,
+                     temperature: float = 0.7,
+                     top_p: float = 0.95) -> Optional[str]:
+        """Enfileira um prompt e aguarda a completion."""
+        return await self._enqueue(prompt, user, (max_tokens, temperature, top_p))
+
+    async def stream(self,
+                     prompt: str,
+                     user: str = "anon",
+                     max_tokens: int = 2000,
+                     temperature: float = 0.7,
+                     top_p: float = 0.95) -> AsyncIterator[str]:
+        """Aguarda a vez do usuário e gera a completion token a token."""
+        future = self._enqueue(prompt, user, (max_tokens, temperature, top_p), stream=True)
+        try:
+            release = await future
+        except asyncio.CancelledError:
+            # A vaga pode ter sido entregue enquanto o pedido era cancelado
+            if future.done() and not future.cancelled():
+                future.result()()
+            raise
+
+        try:
+            async for text in self.client.stream(prompt, max_tokens, temperature, top_p):
+                yield text
+        finally:
+            release()
+
+    def _next_batch(self) -> List[_PendingRequest]:
+        """Monta um lote em rodízio entre usuários, com parâmetros iguais.
+
+        Um stream é sempre despachado sozinho.
+        """
+        batch = []
+        params = None
+        progressed = True
+        while len(batch) < self.max_batch_size and progressed:
+            progressed = False
+            for user in list(self._queues):
+                queue = self._queues[user]
+                head = queue[0]
+                if head.stream and batch:
+                    continue
+                if params is None:
+                    params = head.params
+                if head.params != params:
+                    continue
+                batch.append(queue.popleft())
+                progressed = True
+
+                # O usuário atendido vai para o fim da fila de rodízio
+                self._queues.move_to_end(user)
+                if not queue:
+                    del self._queues[user]
+                if head.stream or len(batch) >= self.max_batch_size:
+                    return batch
+        return batch
+
+    async def _run(self):
+        """Laço que forma lotes e os envia respeitando o limite de concorrência."""
+        while True:
+            await self._wakeup.wait()
+
+            # Janela curta para coalescer requisições concorrentes
+            if self.batch_window:
+                await asyncio.sleep(self.batch_window)
+
+            while self._queues:
+                await self._semaphore.acquire()
+                batch = self._next_batch()
+                task = asyncio.ensure_future(self._dispatch(batch))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+            self._wakeup.clear()
+
+    async def _dispatch(self, batch: List[_PendingRequest]):
+        """Envia um lote ao backend e resolve os futures de cada requisição."""
+        if batch[0].stream:
+            # A vaga passa para quem faz o streaming, que a libera ao terminar
+            if batch[0].future.done():
+                self._semaphore.release()
+            else:
+                batch[0].future.set_result(self._semaphore.release)
+            return
+
+        try:
+            max_tokens, temperature, top_p = batch[0].params
+            results = None
+            if len(batch) > 1:
+                try:
+                    results = await self.client.complete_batch(
+                        [request.prompt for request in batch], max_tokens, temperature, top_p
+                    )
+                    self.supports_batching = True
+                except BatchingNotSupported as e:
+                    logger.warning(f"Backend não aceita lotes ({str(e)}); enviando um prompt por vez")
+                    self.supports_batching = False
+                    self.max_batch_size = 1
+
+            if results is None:
+                results = [
+                    await self.client.complete(request.prompt, max_tokens, temperature, top_p)
+                    for request in batch
+                ]
+
+            for request, result in zip(batch, results):
+                if not request.future.done():
+                    request.future.set_result(result)
+
+        except Exception as e:
+            logger.error(f"Erro ao despachar lote: {str(e)}")
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+        finally:
+            self._semaphore.release()
+
+    def pending(self) -> Dict[str, int]:
+        """Número de requisições na fila por usuário."""
+        return {user: len(queue) for user, queue in self._queues.items()}
+
+    def submit_threadsafe(self, prompt: str, user: str = "anon", max_tokens: int = 2000,
+                          temperature: float = 0.7, top_p: float = 0.95) -> concurrent.futures.Future:
+        """Enfileira um prompt a partir de outra thread (dispatcher com ``_loop`` próprio)."""
+        return asyncio.run_coroutine_threadsafe(
+            self.submit(prompt, user, max_tokens, temperature, top_p), self._loop
+        )
+
+    def submit_sync(self, prompt: str, user: str = "anon", max_tokens: int = 2000,
+                    temperature: float = 0.7, top_p: float = 0.95,
+                    timeout: float = None) -> Optional[str]:
+        """Versão bloqueante de ``submit``, para código síncrono (Flask, CLI)."""
+        return self.submit_threadsafe(prompt, user, max_tokens, temperature, top_p).result(timeout)
+
+    def stream_sync(self, prompt: str, user: str = "anon", max_tokens: int = 2000,
+                    temperature: float = 0.7, top_p: float = 0.95) -> Iterator[str]:
+        """Versão bloqueante de ``stream``; parar a iteração cancela o stream."""
+        tokens = queue.Queue()
+        end = object()
+
+        async def pump():
+            try:
+                async for text in self.stream(prompt, user, max_tokens, temperature, top_p):
+                    tokens.put(text)
+            finally:
+                tokens.put(end)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._loop)
+        try:
+            while True:
+                text = tokens.get()
+                if text is end:
+                    break
+                yield text
+            future.result()
+        finally:
+            future.cancel()
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+        await self.client.close()
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_dispatchers: Dict[str, LLMDispatcher] = {}
+_dispatchers_lock = threading.Lock()
+
+def _shared_loop() -> asyncio.AbstractEventLoop:
+    """Laço de eventos em segundo plano onde vivem os dispatchers compartilhados."""
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        threading.Thread(target=_loop.run_forever, name='LLMDispatcher', daemon=True).start()
+    return _loop
+
+def get_dispatcher(base_url: str, **kwargs) -> LLMDispatcher:
+    """Retorna o dispatcher do processo para o backend informado.
+
+    Todos os chamadores do mesmo backend compartilham a fila, o rodízio por
+    usuário e o limite de chamadas simultâneas. Os argumentos só valem na
+    criação do dispatcher; os omitidos vêm de ``LLM_DISPATCH_CONFIG``.
+    """
+    with _dispatchers_lock:
+        dispatcher = _dispatchers.get(base_url)
+        if dispatcher is None:
+            loop = _shared_loop()
+            # Criado dentro do laço para que as primitivas asyncio fiquem associadas a ele
+            options = dict(LLM_DISPATCH_CONFIG, **kwargs)
+            dispatcher = asyncio.run_coroutine_threadsafe(_create(base_url, options), loop).result()
+            dispatcher._loop = loop
+            _dispatchers[base_url] = dispatcher
+        return dispatcher
+
+async def _create(base_url: str, kwargs: Dict) -> LLMDispatcher:
+    return LLMDispatcher(base_url, **kwargs)
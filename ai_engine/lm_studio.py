@@ -1,11 +1,13 @@
 import os
 import json
 import logging
-import requests
 import subprocess
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Optional, Dict, Iterator, List
 import time
+from .client import get_client
+from .completion_cache import CompletionCache, get_completion_cache
+from .dispatcher import get_dispatcher
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
@@ -15,9 +17,15 @@ class LMStudioInterface:
     def __init__(self, model_path: str = None):
         self.model_path = model_path or self._get_default_model()
         self.api_url = "http://localhost:1234/v1"
+        self.client = get_client(self.api_url)
         self.process = None
-        self.cache = {}
+        self.cache = get_completion_cache()
         
+    @property
+    def model_name(self) -> str:
+        """Identificador do modelo usado nas chaves de cache."""
+        return Path(self.model_path).name if self.model_path else "default"
+
     def _get_default_model(self) -> str:
         """Retorna o caminho do modelo DeepSeek-Coder."""
         models_dir = Path.home() / "AppData/Local/nomic.ai/LM Studio/models"
@@ -35,7 +43,7 @@ class LMStudioInterface:
         try:
             # Verifica se o LM Studio já está rodando
             try:
-                response = requests.get(f"{self.api_url}/models")
+                response = self.client.session.get(f"{self.api_url}/models")
                 if response.status_code == 200:
                     logger.info("LM Studio já está rodando")
                     return True
@@ -58,7 +66,7 @@ class LMStudioInterface:
             max_retries = 30
             for i in range(max_retries):
                 try:
-                    response = requests.get(f"{self.api_url}/models")
+                    response = self.client.session.get(f"{self.api_url}/models")
                     if response.status_code == 200:
                         logger.info("LM Studio iniciado com sucesso")
                         return True
@@ -83,43 +91,57 @@ class LMStudioInterface:
                 max_tokens: int = 2000,
                 temperature: float = 0.7,
                 top_p: float = 0.95,
-                cache_key: str = None) -> Optional[str]:
-        """Gera texto usando o LM Studio."""
+                cache: Optional[bool] = None,
+                user: str = "cli") -> Optional[str]:
+        """Gera texto usando o LM Studio.
+
+        Respostas com ``temperature`` 0 são cacheadas em disco; ``cache``
+        força ou desativa o cache para a chamada. A chamada passa pelo
+        dispatcher compartilhado do backend, como ``validate_codes``.
+        """
         # Verifica cache
-        if cache_key and cache_key in self.cache:
-            return self.cache[cache_key]
-            
-        try:
-            response = requests.post(
-                f"{self.api_url}/completions",
-                json={
-                    "prompt": prompt,
-                    "max_tokens": max_tokens,
-                    "temperature": temperature,
-                    "top_p": top_p,
-                    "stream": False
-                },
-                timeout=120  # Timeout maior para gerações longas
+        cache_key = None
+        if CompletionCache.should_cache(temperature, cache):
+            cache_key = CompletionCache.make_key(
+                self.model_name, prompt, max_tokens, temperature, top_p
             )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
             
-            if response.status_code == 200:
-                result = response.json()["choices"][0]["text"]
-                
-                # Salva no cache
-                if cache_key:
-                    self.cache[cache_key] = result
-                    
-                return result
-            else:
-                logger.error(f"Erro na API do LM Studio: {response.status_code}")
-                return None
-                
-        except Exception as e:
-            logger.error(f"Erro ao gerar texto: {str(e)}")
-            return None
-    
-    def validate_code(self, code: str) -> Dict[str, any]:
-        """Valida código usando o modelo."""
+        result = get_dispatcher(self.api_url).submit_sync(
+            prompt,
+            user,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p
+        )
+
+        # Salva no cache
+        if result is not None and cache_key:
+            self.cache.set(cache_key, result, model=self.model_name)
+
+        return result
+
+    def generate_stream(self,
+                        prompt: str,
+                        max_tokens: int = 2000,
+                        temperature: float = 0.7,
+                        top_p: float = 0.95,
+                        user: str = "cli") -> Iterator[str]:
+        """Gera texto em streaming, entregando os tokens conforme chegam.
+
+        O stream ocupa uma vaga do dispatcher do backend até terminar.
+        """
+        return get_dispatcher(self.api_url).stream_sync(
+            prompt,
+            user,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p
+        )
+
+    def _validation_prompt(self, code: str) -> str:
         system_prompt = """Você é um expert em revisão de código.
         Analise o código a seguir e retorne um JSON com:
         - erros: lista de erros encontrados
@@ -127,9 +149,9 @@ class LMStudioInterface:
         - score: nota de 0 a 10
         - sugestões: lista de melhorias"""
         
-        prompt = f"{system_prompt}\n\nCódigo:\n```\n{code}\n```\n\nAnálise:"
-        result = self.generate(prompt, cache_key=f"validate_{hash(code)}")
-        
+        return f"{system_prompt}\n\nCódigo:\n```\n{code}\n```\n\nAnálise:"
+
+    def _parse_validation(self, result: Optional[str]) -> Dict[str, any]:
         try:
             return json.loads(result)
         except:
@@ -139,10 +161,44 @@ class LMStudioInterface:
                 "score": 0,
                 "sugestões": []
             }
+
+    def validate_code(self, code: str) -> Dict[str, any]:
+        """Valida código usando o modelo."""
+        result = self.generate(self._validation_prompt(code), cache=True)
+        return self._parse_validation(result)
+
+    def validate_codes(self, codes: List[str], user: str = "cli") -> List[Dict[str, any]]:
+        """Valida vários códigos, enviando os não cacheados pelo dispatcher compartilhado.
+
+        O dispatcher do processo agrupa os prompts em lotes quando o servidor
+        aceita e aplica o limite de chamadas simultâneas junto com os demais
+        usuários do mesmo backend.
+        """
+        max_tokens, temperature, top_p = 2000, 0.7, 0.95
+        prompts = [self._validation_prompt(code) for code in codes]
+        keys = [
+            CompletionCache.make_key(self.model_name, prompt, max_tokens, temperature, top_p)
+            for prompt in prompts
+        ]
+        results = [self.cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+
+        if missing:
+            dispatcher = get_dispatcher(self.api_url)
+            futures = [
+                dispatcher.submit_threadsafe(prompts[i], user, max_tokens, temperature, top_p)
+                for i in missing
+            ]
+            for i, future in zip(missing, futures):
+                result = future.result()
+                results[i] = result
+                if result is not None:
+                    self.cache.set(keys[i], result, model=self.model_name)
+
+        return [self._parse_validation(result) for result in results]
     
-    def explain_code(self, code: str) -> str:
-        """Gera explicação detalhada do código."""
-        prompt = f"""Explique o seguinte código em detalhes:
+    def _explain_prompt(self, code: str) -> str:
+        return f"""Explique o seguinte código em detalhes:
         
         ```
         {code}
@@ -153,8 +209,14 @@ class LMStudioInterface:
         2. Explicação de cada parte importante
         3. Possíveis problemas ou limitações
         4. Sugestões de melhoria"""
-        
-        return self.generate(prompt, cache_key=f"explain_{hash(code)}")
+
+    def explain_code(self, code: str) -> str:
+        """Gera explicação detalhada do código."""
+        return self.generate(self._explain_prompt(code), cache=True)
+
+    def explain_code_stream(self, code: str) -> Iterator[str]:
+        """Gera a explicação do código em streaming."""
+        return self.generate_stream(self._explain_prompt(code))
     
     def suggest_tests(self, code: str) -> List[str]:
         """Sugere casos de teste para o código."""
@@ -169,7 +231,7 @@ class LMStudioInterface:
         - código: o código do teste
         - tipo: unit/integration/e2e"""
         
-        result = self.generate(prompt, cache_key=f"tests_{hash(code)}")
+        result = self.generate(prompt, cache=True)
         
         try:
             return json.loads(result)
@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, make_response, send_from_directory, send_file, Response
+from flask import Flask, render_template, request, jsonify, redirect, url_for, make_response, send_from_directory, send_file, Response, stream_with_context
 from functools import wraps
 import json
 import os
@@ -7,6 +7,8 @@ from datetime import datetime
 import requests
 from pathlib import Path
 from simple_image_generator import SimpleImageGenerator
+from core.cache_metrics import cache_metrics
+from ai_engine.core import AIEngine
 import subprocess
 import sys
 import threading
@@ -78,6 +80,17 @@ SYSTEM_PROMPTS = {
 
 ide_process = None
 
+# Servidor local compatível com a API OpenAI (LM Studio/Ollama)
+LM_STUDIO_URL = os.environ.get('LM_STUDIO_URL', 'http://localhost:1234/v1')
+_ai_engine = None
+
+def get_ai_engine() -> AIEngine:
+    """Retorna o AIEngine do processo, criado no primeiro uso."""
+    global _ai_engine
+    if _ai_engine is None:
+        _ai_engine = AIEngine(LM_STUDIO_URL)
+    return _ai_engine
+
 def check_auth():
     user = request.cookies.get('user')
     return user and user in USERS
@@ -299,6 +312,42 @@ def chat():
             'response': 'Erro ao processar sua mensagem'
         })
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Responde mensagens de texto em streaming (Server-Sent Events).
+
+    Cada evento traz ``{"text": ...}`` com os tokens gerados e o fim é
+    marcado por ``[DONE]``. Se o servidor do modelo não responder, envia a
+    resposta padrão do modo de uma só vez.
+    """
+    if not check_auth():
+        return jsonify({'success': False, 'error': 'Não autorizado'}), 401
+
+    data = request.json
+    message = data.get('message', '')
+    mode = data.get('model', 'chat')
+    prompt = f"{SYSTEM_PROMPTS.get(mode, SYSTEM_PROMPTS['chat'])}\n\nUsuário: {message}\nAssistente:"
+    user = request.cookies.get('user')
+
+    def events():
+        sent = False
+        try:
+            for text in get_ai_engine().stream_completion(prompt, max_tokens=1000, user=user):
+                sent = True
+                yield f"data: {json.dumps({'text': text}, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            logger.error(f"Erro no streaming do chat: {str(e)}")
+        if not sent:
+            fallback = get_ai_response(mode, message)['text']
+            yield f"data: {json.dumps({'text': fallback}, ensure_ascii=False)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/history', methods=['GET'])
 def get_history():
     if not check_auth():
@@ -351,5 +400,13 @@ def start_ide():
             'error': str(e)
         })
 
+@app.route('/metrics')
+def metrics():
+    """Exporta as métricas do cache para o Prometheus."""
+    return Response(
+        cache_metrics.render_prometheus(),
+        mimetype='text/plain; version=0.0.4; charset=utf-8'
+    )
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000) 
\ No newline at end of file
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""Compara latência, memória e fidelidade dos backends de inferência dos modelos de texto.
+
+Exemplo:
+    python benchmark_inference.py --model dialogpt --backends pytorch int8 onnx
+"""
+import json
+import argparse
+import logging
+
+from core.inference_backends import BACKENDS, TEXT_MODELS, compare_backends
+
+PROMPTS_PADRAO = {
+    "dialogpt": [
+        "Olá, tudo bem?",
+        "Qual é a melhor forma de aprender Python?",
+        "Pode me ajudar a organizar minha semana?"
+    ],
+    "gpt2_medium": [
+        "Crie um prompt para uma paisagem de montanha ao pôr do sol",
+        "Descreva um personagem para um jogo de aventura",
+        "Explique o que é um workflow de geração de imagens"
+    ],
+    "t5_base": [
+        "summarize: O ComfyUI executa workflows de geração de imagens compostos por nós. "
+        "Cada nó recebe entradas, como o checkpoint e o prompt, e produz saídas usadas pelos "
+        "nós seguintes, até que as imagens finais sejam salvas em disco.",
+        "summarize: O assistente mantém uma base de conhecimento com fatos, regras e contexto, "
+        "e usa modelos de linguagem locais para responder perguntas e resumir textos longos."
+    ]
+}
+
+def formatar(valor, casas=1):
+    return "-" if valor is None else f"{valor:.{casas}f}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos backends de inferência")
+    parser.add_argument("--model", choices=sorted(TEXT_MODELS), default="dialogpt", help="Modelo a comparar")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS),
+                        help="Backends a comparar; o primeiro é a referência de fidelidade")
+    parser.add_argument("--prompts", help="Arquivo com um prompt por linha")
+    parser.add_argument("--max-new-tokens", type=int, default=40)
+    parser.add_argument("--repeats", type=int, default=3, help="Execuções medidas por prompt")
+    parser.add_argument("--json", help="Salva os resultados neste arquivo")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.prompts:
+        with open(args.prompts, 'r', encoding='utf-8') as f:
+            prompts = [linha.strip() for linha in f if linha.strip()]
+    else:
+        prompts = PROMPTS_PADRAO[args.model]
+
+    resultados = compare_backends(args.model, prompts, args.backends,
+                                  max_new_tokens=args.max_new_tokens, repeats=args.repeats)
+
+    print(f"\n{'backend':<12}{'efetivo':<12}{'carga (s)':>10}{'média (ms)':>12}{'p95 (ms)':>10}"
+          f"{'RAM (MB)':>10}{'tokens iguais':>15}{'idênticas':>11}")
+    for backend, r in resultados.items():
+        print(f"{backend:<12}{r['backend']:<12}{formatar(r['load_s']):>10}"
+              f"{formatar(r['latency_mean_ms']):>12}{formatar(r['latency_p95_ms']):>10}"
+              f"{formatar(r['memory_mb'], 0):>10}{formatar(r['token_agreement'], 3):>15}"
+              f"{formatar(r['exact_match'], 2):>11}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"model": args.model, "prompts": prompts, "results": resultados}, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 import gradio as gr
-from transformers import pipeline, AutoModelForCausalLM, AutoTokenizer
 import torch
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+import asyncio
 import logging
 
+from core.model_registry import get_model_registry, causal_lm_loader
+from ai_engine.dispatcher import get_dispatcher
+
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,35 +20,32 @@ CORS(app)
 MODELS = {
     'programacao': {
         'name': 'deepseek-coder/deepseek-coder-1.3b-instruct',
-        'task': 'text-generation',
-        'model': None,
-        'tokenizer': None
+        'task': 'text-generation'
     },
     'assistente': {
         'name': 'microsoft/phi-2',
-        'task': 'text-generation',
-        'model': None,
-        'tokenizer': None
+        'task': 'text-generation'
     }
 }
 
+# Os modelos ficam no registro compartilhado do processo, que os carrega
+# no primeiro uso e descarrega os ociosos
+registry = get_model_registry()
+for model_type, config in MODELS.items():
+    registry.register(f"colab_{model_type}", causal_lm_loader(
+        config['name'],
+        torch_dtype=torch.float16,
+        device_map='auto'
+    ))
+
 def load_model(model_type):
     """Carrega um modelo específico se ainda não estiver carregado."""
-    if MODELS[model_type]['model'] is None:
-        try:
-            logger.info(f"Carregando modelo {MODELS[model_type]['name']}...")
-            MODELS[model_type]['tokenizer'] = AutoTokenizer.from_pretrained(MODELS[model_type]['name'])
-            MODELS[model_type]['model'] = AutoModelForCausalLM.from_pretrained(
-                MODELS[model_type]['name'],
-                torch_dtype=torch.float16,
-                device_map='auto'
-            )
-            logger.info(f"Modelo {MODELS[model_type]['name']} carregado com sucesso!")
-            return True
-        except Exception as e:
-            logger.error(f"Erro ao carregar modelo {MODELS[model_type]['name']}: {str(e)}")
-            return False
-    return True
+    try:
+        registry.get(f"colab_{model_type}")
+        return True
+    except Exception as e:
+        logger.error(f"Erro ao carregar modelo {MODELS[model_type]['name']}: {str(e)}")
+        return False
 
 def generate_response(text, model_type='assistente'):
     """Gera uma resposta usando o modelo especificado."""
@@ -53,31 +53,65 @@ def generate_response(text, model_type='assistente'):
         return "Desculpe, não foi possível carregar o modelo necessário."
     
     try:
-        inputs = MODELS[model_type]['tokenizer'](
+        loaded = registry.get(f"colab_{model_type}")
+        tokenizer = loaded['tokenizer']
+        inputs = tokenizer(
             text,
             return_tensors="pt",
             max_length=512,
             truncation=True
         ).to('cuda' if torch.cuda.is_available() else 'cpu')
         
-        outputs = MODELS[model_type]['model'].generate(
+        outputs = loaded['model'].generate(
             **inputs,
             max_length=1024,
             num_return_sequences=1,
             temperature=0.7,
             do_sample=True,
-            pad_token_id=MODELS[model_type]['tokenizer'].eos_token_id
+            pad_token_id=tokenizer.eos_token_id
         )
         
-        response = MODELS[model_type]['tokenizer'].decode(outputs[0], skip_special_tokens=True)
+        response = tokenizer.decode(outputs[0], skip_special_tokens=True)
         return response
     except Exception as e:
         logger.error(f"Erro ao gerar resposta: {str(e)}")
         return f"Erro ao gerar resposta: {str(e)}"
 
+class LocalModelClient:
+    """Adapta os modelos locais à interface de cliente do ``LLMDispatcher``.
+
+    A geração roda numa thread; como o modelo atende um prompt por vez, o
+    dispatcher é criado sem lotes.
+    """
+
+    def __init__(self, model_type):
+        self.model_type = model_type
+
+    async def complete(self, prompt, max_tokens, temperature, top_p):
+        return await asyncio.to_thread(generate_response, prompt, self.model_type)
+
+    async def close(self):
+        pass
+
+def get_model_dispatcher(model_type):
+    """Dispatcher compartilhado do modelo: fila justa por usuário e uma geração por vez."""
+    return get_dispatcher(
+        f"local://{model_type}",
+        client=LocalModelClient(model_type),
+        max_in_flight=1,
+        supports_batching=False
+    )
+
+def dispatch_response(text, model_type='assistente', user='anon'):
+    """Gera a resposta passando pelo dispatcher do modelo."""
+    if model_type not in MODELS:
+        model_type = 'assistente'
+    return get_model_dispatcher(model_type).submit_sync(text, user)
+
 # Interface Gradio
-def gradio_interface(message, task_type="assistente"):
-    return generate_response(message, task_type)
+def gradio_interface(message, task_type="assistente", request: gr.Request = None):
+    user = request.client.host if request is not None and request.client else 'gradio'
+    return dispatch_response(message, task_type, user)
 
 demo = gr.Interface(
     fn=gradio_interface,
@@ -101,7 +135,7 @@ def chat():
         if not message:
             return jsonify({'error': 'Mensagem vazia'})
         
-        response = generate_response(message, task_type)
+        response = dispatch_response(message, task_type, request.remote_addr or 'anon')
         return jsonify({'response': response})
     
     except Exception as e:
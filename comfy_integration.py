@@ -1,16 +1,169 @@
 import os
 import sys
 import json
+import time
+import uuid
+import threading
 import requests
 import subprocess
+from concurrent.futures import Future
 from pathlib import Path
-from typing import Dict, Optional, List, Union
+from typing import Callable, Dict, Optional, List, Union
+from websockets.sync.client import connect as ws_connect
+from workflow_generator import ImageBatcher, ImageRequest, WorkflowGenerator
+
+# Eventos de prompt_ids ainda não registrados: validade (s) e máximo de jobs guardados
+ORPHAN_TTL = 300
+MAX_ORPHANS = 256
+
+class ComfyJobTracker:
+    """Acompanha jobs do ComfyUI por uma única conexão ao stream ``/ws``.
+
+    Os eventos são separados por ``prompt_id`` e entregues ao future de
+    cada job; os outputs vêm dos eventos ``executed``, sem consultar o
+    histórico. Se a conexão cair, reconecta e confere em ``/history/<id>``
+    apenas os jobs pendentes.
+
+    Eventos que chegam antes de ``track`` ficam guardados por até
+    ``ORPHAN_TTL`` segundos e são reaplicados no registro, em ordem e antes
+    de qualquer evento novo do mesmo job.
+    """
+
+    def __init__(self, api_url: str):
+        self.api_url = api_url
+        self.ws_url = api_url.replace("http", "ws", 1) + "/ws"
+        self.client_id = str(uuid.uuid4())
+        self._jobs: Dict[str, Dict] = {}
+        self._orphans: Dict[str, tuple] = {}  # prompt_id -> (recebido em, eventos)
+        self._lock = threading.Lock()
+        # Serializa a entrega de eventos entre a thread de leitura e o reenvio em track
+        self._delivery_lock = threading.RLock()
+        self._thread = None
+        self._connected = threading.Event()
+        self._stop = threading.Event()
+
+    def start(self, timeout: float = 10) -> bool:
+        """Inicia a thread de leitura e aguarda a conexão."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ComfyJobTracker", daemon=True)
+            self._thread.start()
+        return self._connected.wait(timeout)
+
+    def stop(self):
+        self._stop.set()
+
+    def track(self, prompt_id: str,
+              on_progress: Optional[Callable[[str, str, int, int], None]] = None) -> Future:
+        """Registra um job e retorna o future resolvido com os outputs."""
+        future = Future()
+        with self._delivery_lock:
+            with self._lock:
+                self._jobs[prompt_id] = {"future": future, "outputs": {}, "on_progress": on_progress}
+                # Eventos que chegaram antes do registro
+                _, early = self._orphans.pop(prompt_id, (None, []))
+            for message in early:
+                self._deliver(message)
+        return future
+
+    def untrack(self, prompt_id: str):
+        """Esquece um job que não será mais aguardado (ex.: após timeout)."""
+        with self._lock:
+            self._jobs.pop(prompt_id, None)
+
+    def _run(self):
+        """Laço de leitura com reconexão."""
+        delay = 1
+        while not self._stop.is_set():
+            try:
+                with ws_connect(f"{self.ws_url}?clientId={self.client_id}") as ws:
+                    self._connected.set()
+                    delay = 1
+                    self._resync()
+                    while not self._stop.is_set():
+                        try:
+                            raw = ws.recv(timeout=1)
+                        except TimeoutError:
+                            continue
+                        if isinstance(raw, str):
+                            self._handle(json.loads(raw))
+            except Exception as e:
+                print(f"Conexão com o ComfyUI perdida: {str(e)}")
+            self._connected.clear()
+            self._stop.wait(delay)
+            delay = min(delay * 2, 30)
+
+    def _resync(self):
+        """Após (re)conectar, resolve jobs que terminaram sem eventos recebidos."""
+        with self._lock:
+            pending = list(self._jobs)
+        for prompt_id in pending:
+            try:
+                history = requests.get(f"{self.api_url}/history/{prompt_id}", timeout=10).json()
+            except Exception:
+                continue
+            if prompt_id in history:
+                self._finish(prompt_id, outputs=history[prompt_id].get("outputs", {}))
+
+    def _handle(self, message: Dict):
+        """Encaminha um evento ao job correspondente."""
+        with self._delivery_lock:
+            self._deliver(message)
+
+    def _deliver(self, message: Dict):
+        data = message.get("data") or {}
+        prompt_id = data.get("prompt_id")
+        if not prompt_id:
+            return
+
+        with self._lock:
+            job = self._jobs.get(prompt_id)
+            if job is None:
+                self._keep_orphan(prompt_id, message)
+                return
+
+        kind = message.get("type")
+        if kind == "executed":
+            job["outputs"][data.get("node")] = data.get("output") or {}
+        elif kind == "progress" and job["on_progress"]:
+            job["on_progress"](prompt_id, data.get("node"), data.get("value", 0), data.get("max", 0))
+        elif kind == "execution_error":
+            self._finish(prompt_id, error=data.get("exception_message", "Erro desconhecido"))
+        elif kind == "executing" and data.get("node") is None:
+            self._finish(prompt_id)
+
+    def _keep_orphan(self, prompt_id: str, message: Dict):
+        """Guarda um evento sem job registrado, descartando os antigos (com ``_lock``)."""
+        now = time.monotonic()
+        for orphan_id, (received, _) in list(self._orphans.items()):
+            # Em ordem de chegada: o primeiro ainda válido encerra a varredura
+            if now - received < ORPHAN_TTL:
+                break
+            del self._orphans[orphan_id]
+
+        if prompt_id not in self._orphans:
+            if len(self._orphans) >= MAX_ORPHANS:
+                del self._orphans[next(iter(self._orphans))]
+            self._orphans[prompt_id] = (now, [])
+        self._orphans[prompt_id][1].append(message)
+
+    def _finish(self, prompt_id: str, outputs: Dict = None, error: str = None):
+        with self._lock:
+            job = self._jobs.pop(prompt_id, None)
+        if job is None or job["future"].done():
+            return
+        if error:
+            job["future"].set_exception(RuntimeError(error))
+        else:
+            job["future"].set_result(outputs if outputs is not None else job["outputs"])
 
 class ComfyUIIntegration:
     def __init__(self):
         self.comfy_path = Path("ComfyUI").resolve()
         self.api_url = "http://127.0.0.1:8188"
         self.process = None
+        self.tracker = ComfyJobTracker(self.api_url)
+        self._workflow_generator = None
         self.workflows_path = self.comfy_path / "workflows"
         self.workflows_path.mkdir(exist_ok=True)
         
@@ -53,6 +206,7 @@ class ComfyUIIntegration:
             
     def stop_server(self):
         """Para o servidor ComfyUI."""
+        self.tracker.stop()
         if self.process:
             self.process.terminate()
             self.process = None
@@ -141,13 +295,20 @@ class ComfyUIIntegration:
         }
         return workflow
         
-    def execute_workflow(self, workflow: Dict) -> Optional[str]:
-        """Executa um workflow e retorna o caminho da imagem gerada."""
+    def _run_workflow(self,
+                      workflow: Dict,
+                      timeout: float = None,
+                      on_progress: Optional[Callable[[str, str, int, int], None]] = None) -> Optional[Dict]:
+        """Envia um workflow e retorna os outputs por nó (None em caso de erro)."""
         try:
+            if not self.tracker.start():
+                print("Não foi possível conectar ao WebSocket do ComfyUI")
+                return None
+
             # Envia o workflow
             response = requests.post(
                 f"{self.api_url}/prompt",
-                json={"prompt": workflow}
+                json={"prompt": workflow, "client_id": self.tracker.client_id}
             )
             
             if response.status_code != 200:
@@ -156,26 +317,37 @@ class ComfyUIIntegration:
                 
             prompt_id = response.json()["prompt_id"]
             
-            # Espera a execução completar
-            while True:
-                history = requests.get(f"{self.api_url}/history").json()
-                if prompt_id in history:
-                    outputs = history[prompt_id]["outputs"]
-                    if outputs:
-                        # Pega o caminho da última imagem gerada
-                        for node_id, node_output in outputs.items():
-                            if "images" in node_output:
-                                image_path = node_output["images"][0]["filename"]
-                                return os.path.join(self.comfy_path, "output", image_path)
-                    break
-                    
-                import time
-                time.sleep(1)
+            # Espera a execução completar pelos eventos do WebSocket
+            try:
+                return self.tracker.track(prompt_id, on_progress).result(timeout)
+            finally:
+                # Num timeout o job continuaria registrado e consultado a cada reconexão
+                self.tracker.untrack(prompt_id)
                 
         except Exception as e:
             print(f"Erro ao executar workflow: {str(e)}")
             
         return None
+
+    def _image_path(self, image: Dict) -> str:
+        """Caminho local de uma imagem listada nos outputs do ComfyUI."""
+        return os.path.join(self.comfy_path, "output", image.get("subfolder", ""), image["filename"])
+
+    def execute_workflow(self,
+                         workflow: Dict,
+                         timeout: float = None,
+                         on_progress: Optional[Callable[[str, str, int, int], None]] = None) -> Optional[str]:
+        """Executa um workflow e retorna o caminho da imagem gerada.
+
+        ``on_progress(prompt_id, node, value, max)`` recebe o progresso por nó.
+        """
+        outputs = self._run_workflow(workflow, timeout, on_progress) or {}
+        
+        # Pega o caminho da primeira imagem gerada
+        for node_id, node_output in outputs.items():
+            if node_output.get("images"):
+                return self._image_path(node_output["images"][0])
+        return None
         
     def generate_image(self, prompt: str) -> Optional[str]:
         """Gera uma imagem a partir de um prompt."""
@@ -184,6 +356,32 @@ class ComfyUIIntegration:
             
         workflow = self.create_image_workflow(prompt)
         return self.execute_workflow(workflow)
+
+    def generate_images(self,
+                        image_requests: List[Union[str, ImageRequest]],
+                        max_batch_size: int = 8,
+                        timeout: float = None) -> List[Optional[str]]:
+        """Gera várias imagens agrupando os pedidos compatíveis.
+
+        Pedidos com o mesmo checkpoint, sampler, passos e tamanho vão ao
+        ComfyUI num único workflow (ver ``ImageBatcher``). Retorna o caminho
+        de cada imagem na ordem dos pedidos.
+        """
+        image_requests = [ImageRequest(r) if isinstance(r, str) else r for r in image_requests]
+        if not image_requests or not self.start_server():
+            return [None] * len(image_requests)
+
+        if self._workflow_generator is None:
+            self._workflow_generator = WorkflowGenerator()
+        batcher = ImageBatcher(self._workflow_generator, max_batch_size)
+        for request in image_requests:
+            batcher.add(request)
+
+        images = batcher.run(lambda workflow: self._run_workflow(workflow, timeout))
+        return [
+            self._image_path(images[request.request_id]) if images.get(request.request_id) else None
+            for request in image_requests
+        ]
         
     def __del__(self):
         """Garante que o servidor seja desligado quando o objeto é destruído."""
@@ -14,6 +14,8 @@ MODELS_DIR = BASE_DIR / "models"
 CACHE_DIR = BASE_DIR / "cache"
 LOGS_DIR = BASE_DIR / "logs"
 OUTPUT_DIR = BASE_DIR / "outputs"
+WORKFLOWS_DIR = BASE_DIR / "workflows"
+DATA_DIR = BASE_DIR / "data"
 
 # Configurações do ComfyUI
 COMFYUI_CONFIG = {
@@ -22,7 +24,20 @@ COMFYUI_CONFIG = {
     "api_url": "http://localhost:8188/api",
     "websocket_url": "ws://localhost:8188/ws",
     "models_dir": str(MODELS_DIR),
-    "output_dir": str(OUTPUT_DIR)
+    "output_dir": str(OUTPUT_DIR),
+    "download_concurrency": 4,  # downloads simultâneos de outputs
+    "download_chunk_size": 1024 * 1024,  # 1MB
+    "orphan_ttl": 300,  # segundos que mensagens de prompts não aguardados ficam guardadas
+    "max_orphans": 256,  # prompt_ids sem workflow registrado guardados no máximo
+    # Instâncias do pool; vazio usa apenas api_url/websocket_url acima.
+    # Ex.: {"api_url": "http://localhost:8189/api",
+    #       "websocket_url": "ws://localhost:8189/ws", "port": 8189}
+    "instances": [],
+    "health_interval": 10,  # segundos entre leituras de /queue
+    "max_failures": 3,  # falhas seguidas antes de reiniciar um worker
+    "restart_backoff": 5,  # segundos até nova tentativa de reiniciar um worker (dobra a cada falha)
+    "max_restart_backoff": 300,
+    "model_switch_cost": 2  # posições de fila equivalentes a trocar de checkpoint
 }
 
 # Configurações de IA
@@ -36,6 +51,13 @@ AI_CONFIG = {
     "presence_penalty": 0.0
 }
 
+# Despacho de prompts aos servidores de LLM (LM Studio/Ollama), por backend
+LLM_DISPATCH_CONFIG = {
+    "max_in_flight": 2,  # chamadas simultâneas a cada backend
+    "max_batch_size": 8,  # prompts agrupados numa chamada quando o servidor aceita
+    "batch_window": 0.01  # segundos aguardando prompts concorrentes para agrupar
+}
+
 # Configurações de Segurança
 SECURITY_CONFIG = {
     "require_auth": True,
@@ -50,7 +72,17 @@ CACHE_CONFIG = {
     "enabled": True,
     "max_size": 1024 * 1024 * 1024,  # 1GB
     "ttl": 3600,  # 1 hora
-    "dir": str(CACHE_DIR)
+    "dir": str(CACHE_DIR),
+    "memory_max_size": 64 * 1024 * 1024,  # 64MB na camada em memória
+    "write_back": True,
+    "journal_compact_threshold": 1000,  # registros no journal antes de compactar
+    "codec": "auto",  # auto, json, pickle, msgpack ou raw
+    "compression": None,  # None, zlib ou zstd
+    "compress_min_size": 4096,
+    "mmap_min_size": 1024 * 1024,  # 1MB
+    "shard_depth": 2,
+    "eviction_policy": "lru",  # lru, lfu ou gdsf
+    "expiry_interval": 60  # segundos entre varreduras de TTL (0 desativa)
 }
 
 # Configurações de Log
@@ -79,7 +111,60 @@ WORKFLOW_CONFIG = {
     "max_concurrent": 5,
     "timeout": 300,  # 5 minutos
     "auto_retry": True,
-    "max_retries": 3
+    "max_retries": 3,  # novas tentativas após a primeira execução
+    "retry_backoff": 2,  # segundos antes da 1ª nova tentativa (dobra a cada falha)
+    "max_backoff": 60,
+    "queue_db": str(WORKFLOWS_DIR / "queue.sqlite3")
+}
+
+# Registro de modelos carregados sob demanda
+MODEL_REGISTRY_CONFIG = {
+    "idle_timeout": 900,  # segundos sem uso antes de poder descarregar
+    "max_memory_mb": None,  # RSS a partir do qual modelos ociosos são descarregados (None: só inatividade)
+    "check_interval": 60  # segundos entre verificações (0 desativa)
+}
+
+# Executores para trabalho bloqueante nas gerações
+EXECUTOR_CONFIG = {
+    "io_workers": 8,  # threads para disco e rede
+    "cpu_workers": 2  # processos para codificação de imagens (0 usa threads)
+}
+
+# Classificador de intenções em dois estágios (modelo leve + zero-shot)
+INTENT_CLASSIFIER_CONFIG = {
+    "enabled": True,
+    "confidence_threshold": 0.85,  # confiança mínima para aceitar o modelo leve
+    "min_training_confidence": 0.5,  # classificações do zero-shot usadas como exemplo
+    "min_examples": 50,  # exemplos necessários para o primeiro treino
+    "retrain_every": 200,  # novos exemplos entre treinos (0 desativa o retreino automático)
+    "n_features": 2 ** 14,  # dimensões do TF-IDF com hashing
+    "model_path": str(DATA_DIR / "intent_model.npz"),
+    "log_path": str(DATA_DIR / "intencoes.jsonl"),
+    "max_log_examples": 5000  # exemplos mais recentes mantidos no log de treino
+}
+
+# Índice vetorial da base de conhecimento e das conversas
+VECTOR_INDEX_CONFIG = {
+    "path": "data/indice_vetorial",
+    "approximate": False,  # busca aproximada (HNSW) se o faiss estiver instalado
+    "approximate_min_size": 10000,  # documentos a partir dos quais a busca aproximada é usada
+    "hnsw_m": 32,
+    "index_conversations": True,  # indexa as mensagens recebidas em gerar_resposta
+    "conversation_batch_size": 16,  # mensagens acumuladas antes de cada escrita no índice
+    "max_conversations": 5000,  # mensagens de conversa mantidas no índice
+    "conversation_ttl": 30 * 24 * 3600,  # segundos até uma mensagem sair do índice
+    "cache_size": 2048  # vetores de textos mantidos em memória
+}
+
+# Backends de inferência dos modelos de texto locais (CPU)
+INFERENCE_CONFIG = {
+    # pytorch, int8 (quantização dinâmica), onnx ou onnx-int8 (requer optimum[onnxruntime])
+    "models": {
+        "dialogpt": "pytorch",
+        "t5_base": "pytorch",
+        "gpt2_medium": "pytorch"
+    },
+    "onnx_dir": MODELS_DIR / "onnx"  # exportações ONNX reaproveitadas entre execuções
 }
 
 # Configurações de Auto-otimização
@@ -110,5 +195,5 @@ DEV_CONFIG = {
 }
 
 # Cria diretórios necessários
-for directory in [WORKSPACE_DIR, TEMPLATES_DIR, MODELS_DIR, CACHE_DIR, LOGS_DIR, OUTPUT_DIR]:
+for directory in [WORKSPACE_DIR, TEMPLATES_DIR, MODELS_DIR, CACHE_DIR, LOGS_DIR, OUTPUT_DIR, WORKFLOWS_DIR]:
     directory.mkdir(exist_ok=True) 
\ No newline at end of file
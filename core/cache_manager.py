@@ -1,160 +1,629 @@
 import os
 import json
+import mmap
 import time
+import zlib
+import atexit
+import heapq
+import pickle
+import shutil
 import hashlib
-from typing import Dict, Any, Optional
+import weakref
+import threading
+from collections import OrderedDict, Counter
+from typing import Dict, Any, Optional, List, Tuple
 from pathlib import Path
 import logging
 
 from config.system_config import CACHE_CONFIG
+from .cache_metrics import cache_metrics
+from .cache_policies import create_policy
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Codecs de serialização: nome -> (codificar, decodificar)
+_CODECS = {
+    'json': (lambda value: json.dumps(value).encode(), json.loads),
+    'pickle': (lambda value: pickle.dumps(value, protocol=5), pickle.loads),
+    'raw': (bytes, bytes)
+}
+if msgpack is not None:
+    _CODECS['msgpack'] = (
+        lambda value: msgpack.packb(value, use_bin_type=True),
+        lambda payload: msgpack.unpackb(payload, raw=False)
+    )
+
+# Compressores: nome -> (comprimir, descomprimir)
+_COMPRESSORS = {
+    'zlib': (zlib.compress, zlib.decompress)
+}
+if zstandard is not None:
+    _COMPRESSORS['zstd'] = (
+        lambda data: zstandard.ZstdCompressor().compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data)
+    )
+
+class _MemoryTier:
+    """Camada LRU em memória, limitada pelo total de bytes das entradas."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: 'OrderedDict[str, Dict]' = OrderedDict()
+
+    def __contains__(self, cache_key: str) -> bool:
+        return cache_key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, cache_key: str) -> Optional[Dict]:
+        """Retorna a entrada e a marca como usada mais recentemente."""
+        entry = self._entries.get(cache_key)
+        if entry is not None:
+            self._entries.move_to_end(cache_key)
+        return entry
+
+    def peek(self, cache_key: str) -> Optional[Dict]:
+        """Retorna a entrada sem alterar a ordem de uso."""
+        return self._entries.get(cache_key)
+
+    def put(self, cache_key: str, entry: Dict) -> List[Tuple[str, Dict]]:
+        """Insere uma entrada e retorna as entradas despejadas pelo limite de bytes."""
+        self.pop(cache_key)
+        self._entries[cache_key] = entry
+        self.size += entry['size']
+
+        evicted = []
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            old_key, old_entry = self._entries.popitem(last=False)
+            self.size -= old_entry['size']
+            evicted.append((old_key, old_entry))
+        return evicted
+
+    def pop(self, cache_key: str) -> Optional[Dict]:
+        """Remove uma entrada, se existir."""
+        entry = self._entries.pop(cache_key, None)
+        if entry is not None:
+            self.size -= entry['size']
+        return entry
+
+    def dirty_items(self) -> List[Tuple[str, Dict]]:
+        """Entradas ainda não gravadas em disco."""
+        return [(k, e) for k, e in self._entries.items() if e['dirty']]
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+# Gerenciadores abertos, fechados uma única vez ao encerrar o processo
+_open_managers = weakref.WeakSet()
+
+@atexit.register
+def _close_open_managers():
+    for manager in list(_open_managers):
+        manager.close()
+
+def _expiry_loop(manager_ref, stop_event: threading.Event, interval: float):
+    """Laço da thread de expiração; termina quando o gerenciador é fechado ou coletado."""
+    while not stop_event.wait(interval):
+        manager = manager_ref()
+        if manager is None:
+            return
+        try:
+            manager.purge_expired()
+        except Exception as e:
+            manager.logger.error(f"Erro ao expirar entradas do cache: {str(e)}")
+        del manager
 
 class CacheManager:
-    """Gerenciador de cache para otimizar o desempenho."""
-    
-    def __init__(self):
+    """Gerenciador de cache para otimizar o desempenho.
+
+    Usa duas camadas: uma LRU em memória (limitada por bytes) na frente do
+    cache em disco. Leituras passam pela memória e só vão ao disco em chaves
+    frias; com ``write_back`` as escritas ficam em memória e só são gravadas
+    quando despejadas da camada quente ou em ``flush()``.
+
+    No disco os valores são blobs endereçados pelo conteúdo (sha256 do
+    payload), distribuídos em subdiretórios por prefixo. Valores idênticos
+    compartilham o mesmo blob, liberado quando a última chave é removida.
+
+    O despejo do disco segue ``eviction_policy`` (lru, lfu ou gdsf), com os
+    acertos das duas camadas alimentando a política. Entradas com TTL vencido
+    são removidas em segundo plano a cada ``expiry_interval`` segundos.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, namespace: str = 'default'):
         self.logger = logging.getLogger('CacheManager')
-        self.cache_dir = Path(CACHE_CONFIG.get('dir', 'cache'))
+        self.namespace = namespace
+        self.cache_dir = Path(cache_dir or CACHE_CONFIG.get('dir', 'cache'))
         self.max_size = CACHE_CONFIG.get('max_size', 1024 * 1024 * 1024)  # 1GB
         self.ttl = CACHE_CONFIG.get('ttl', 3600)  # 1 hora
-        
+        self.write_back = CACHE_CONFIG.get('write_back', True)
+        self.codec = CACHE_CONFIG.get('codec', 'auto')
+        self.compression = CACHE_CONFIG.get('compression')
+        self.compress_min_size = CACHE_CONFIG.get('compress_min_size', 4096)
+        self.mmap_min_size = CACHE_CONFIG.get('mmap_min_size', 1024 * 1024)  # 1MB
+        self.shard_depth = CACHE_CONFIG.get('shard_depth', 2)
+
         # Cria diretório de cache
         self.cache_dir.mkdir(exist_ok=True)
-        
+        self.blobs_dir = self.cache_dir / 'blobs'
+
         # Carrega metadados do cache
+        self.compact_threshold = CACHE_CONFIG.get('journal_compact_threshold', 1000)
         self.metadata = self._load_metadata()
-    
+        self._blob_refs = Counter(
+            entry['blob'] for entry in self.metadata.values() if 'blob' in entry
+        )
+        self.current_size = self._disk_usage()
+
+        # Política de despejo, semeada na ordem de gravação das entradas
+        self.policy = create_policy(CACHE_CONFIG.get('eviction_policy', 'lru'))
+        self._expiry_heap = []
+        for cache_key, entry in sorted(self.metadata.items(), key=lambda x: x[1]['timestamp']):
+            self.policy.record_insert(cache_key, entry['size'])
+            self._expiry_heap.append((entry['timestamp'], cache_key))
+        if self._journal_records or self._journal_torn:
+            # Compacta na abertura; com uma linha truncada no fim, mesmo sem
+            # outros registros, o próximo append seria colado a ela e perdido
+            self._save_metadata()
+
+        # Camada quente em memória
+        self.memory = _MemoryTier(CACHE_CONFIG.get('memory_max_size', 64 * 1024 * 1024))  # 64MB
+        self._lock = threading.RLock()
+
+        # Métricas de acerto, latência e tamanho
+        cache_metrics.register(namespace, self)
+
+        # Expiração em segundo plano
+        self.expiry_interval = CACHE_CONFIG.get('expiry_interval', 60)
+        self._stop_event = threading.Event()
+        self._expiry_thread = None
+        if self.expiry_interval:
+            # A thread só guarda uma referência fraca: instâncias descartadas
+            # são coletadas e a thread termina junto
+            self._expiry_thread = threading.Thread(
+                target=_expiry_loop,
+                args=(weakref.ref(self), self._stop_event, self.expiry_interval),
+                name='CacheExpiry', daemon=True
+            )
+            self._expiry_thread.start()
+        weakref.finalize(self, self._stop_event.set)
+
+        # Garante que entradas pendentes sejam gravadas ao encerrar
+        _open_managers.add(self)
+
     def _load_metadata(self) -> Dict:
-        """Carrega metadados do cache."""
+        """Carrega metadados do cache (snapshot + reaplicação do journal)."""
+        metadata = {}
         metadata_path = self.cache_dir / 'metadata.json'
         if metadata_path.exists():
             try:
                 with open(metadata_path, 'r') as f:
-                    return json.load(f)
+                    metadata = json.load(f)
             except:
-                return {}
-        return {}
-    
+                metadata = {}
+
+        self._journal_records = 0
+        self._journal_torn = False
+        journal_path = self.cache_dir / 'metadata.log'
+        if journal_path.exists():
+            with open(journal_path, 'r') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        # Última linha sem quebra: a escrita foi interrompida
+                        self._journal_torn = True
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Linha truncada por uma falha no meio da escrita
+                        continue
+                    self._journal_records += 1
+                    if record.get('op') == 'set':
+                        metadata[record['key']] = {
+                            k: v for k, v in record.items() if k not in ('op', 'key')
+                        }
+                    elif record.get('op') == 'del':
+                        metadata.pop(record['key'], None)
+
+        return metadata
+
+    def _append_journal(self, records: List[Dict]):
+        """Acrescenta operações ao journal de metadados, compactando quando necessário."""
+        journal_path = self.cache_dir / 'metadata.log'
+        with open(journal_path, 'a') as f:
+            f.write(''.join(json.dumps(r, separators=(',', ':')) + '\n' for r in records))
+        self._journal_records += len(records)
+
+        # Compacta quando o journal fica muito maior que o índice vivo
+        if self._journal_records > max(self.compact_threshold, 2 * len(self.metadata)):
+            self._save_metadata()
+
     def _save_metadata(self):
-        """Salva metadados do cache."""
+        """Grava um snapshot atômico dos metadados e zera o journal."""
         metadata_path = self.cache_dir / 'metadata.json'
-        with open(metadata_path, 'w') as f:
-            json.dump(self.metadata, f, indent=2)
-    
+        tmp_path = self.cache_dir / 'metadata.json.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.metadata, f)
+        os.replace(tmp_path, metadata_path)
+
+        # O snapshot já contém tudo o que estava no journal
+        with open(self.cache_dir / 'metadata.log', 'w'):
+            pass
+        self._journal_records = 0
+
     def _generate_key(self, data: Any) -> str:
         """Gera uma chave única para os dados."""
         if isinstance(data, dict):
             # Ordena o dicionário para garantir consistência
             data = json.dumps(data, sort_keys=True)
         return hashlib.sha256(str(data).encode()).hexdigest()
-    
+
+    def _is_expired(self, timestamp: float) -> bool:
+        return time.time() - timestamp > self.ttl
+
+    def _disk_usage(self) -> int:
+        """Soma o tamanho em disco, contando cada blob compartilhado uma vez."""
+        blobs = {}
+        legacy = 0
+        for entry in self.metadata.values():
+            if 'blob' in entry:
+                blobs[entry['blob']] = entry['size']
+            else:
+                legacy += entry['size']
+        return legacy + sum(blobs.values())
+
+    def _blob_path(self, cache_key: str, meta: Dict) -> Path:
+        """Caminho do arquivo de uma entrada (blobs fragmentados por prefixo)."""
+        if 'blob' not in meta:
+            # Entradas gravadas antes do armazenamento por conteúdo
+            return self.cache_dir / f"{cache_key}.json"
+        blob = meta['blob']
+        shards = [blob[i * 2:i * 2 + 2] for i in range(self.shard_depth)]
+        return self.blobs_dir.joinpath(*shards, blob)
+
+    def _encode(self, value: Any, codec: Optional[str] = None,
+                compression: Optional[str] = None) -> Tuple[bytes, Dict]:
+        """Serializa e opcionalmente comprime um valor."""
+        codec = codec or self.codec
+        if codec == 'auto':
+            if isinstance(value, (bytes, bytearray, memoryview)):
+                codec = 'raw'
+                payload = bytes(value)
+            else:
+                # JSON quando possível, pickle para o restante
+                try:
+                    payload = _CODECS['json'][0](value)
+                    codec = 'json'
+                except (TypeError, ValueError):
+                    codec = 'pickle'
+                    payload = _CODECS['pickle'][0](value)
+        elif codec in _CODECS:
+            payload = _CODECS[codec][0](value)
+        else:
+            raise ValueError(f"Codec indisponível: {codec}")
+
+        compression = compression or self.compression
+        if compression and len(payload) >= self.compress_min_size:
+            if compression not in _COMPRESSORS:
+                raise ValueError(f"Compressão indisponível: {compression}")
+            compressed = _COMPRESSORS[compression][0](payload)
+            if len(compressed) < len(payload):
+                payload = compressed
+            else:
+                compression = None
+        else:
+            compression = None
+
+        return payload, {
+            'codec': codec,
+            'compression': compression,
+            'blob': hashlib.sha256(payload).hexdigest(),
+            'size': len(payload)
+        }
+
+    def _decode(self, payload: bytes, meta: Dict) -> Any:
+        """Descomprime e desserializa um payload."""
+        if meta.get('compression'):
+            payload = _COMPRESSORS[meta['compression']][1](payload)
+        return _CODECS[meta.get('codec', 'json')][1](payload)
+
     def get(self, key: Any) -> Optional[Any]:
         """Recupera dados do cache."""
+        start = time.perf_counter()
         try:
             cache_key = self._generate_key(key)
-            
-            # Verifica se existe no cache
-            if cache_key not in self.metadata:
-                return None
-            
-            # Verifica TTL
-            entry = self.metadata[cache_key]
-            if time.time() - entry['timestamp'] > self.ttl:
-                self._remove_entry(cache_key)
-                return None
-            
-            # Carrega dados
-            cache_path = self.cache_dir / f"{cache_key}.json"
-            if not cache_path.exists():
-                self._remove_entry(cache_key)
-                return None
-            
-            with open(cache_path, 'r') as f:
-                return json.load(f)
-            
+
+            with self._lock:
+                value, outcome = self._lookup(cache_key)
+            cache_metrics.inc(self.namespace, outcome)
+            return value
+
         except Exception as e:
+            cache_metrics.inc(self.namespace, 'errors')
             self.logger.error(f"Erro ao recuperar do cache: {str(e)}")
             return None
-    
-    def set(self, key: Any, value: Any) -> bool:
-        """Armazena dados no cache."""
+
+        finally:
+            cache_metrics.observe(self.namespace, 'get', time.perf_counter() - start)
+
+    def _lookup(self, cache_key: str) -> Tuple[Optional[Any], str]:
+        """Busca nas duas camadas e retorna o valor e o contador a incrementar."""
+        # Camada quente
+        entry = self.memory.get(cache_key)
+        if entry is not None:
+            if self._is_expired(entry['timestamp']):
+                self._expire(cache_key)
+                return None, 'misses'
+            self.policy.record_access(cache_key)
+            return entry['value'], 'hits_memory'
+
+        # Verifica se existe no cache em disco
+        if cache_key not in self.metadata:
+            return None, 'misses'
+
+        # Verifica TTL
+        meta = self.metadata[cache_key]
+        if self._is_expired(meta['timestamp']):
+            self._expire(cache_key)
+            return None, 'misses'
+
+        # Carrega dados
+        cache_path = self._blob_path(cache_key, meta)
+        if not cache_path.exists():
+            self._remove_entry(cache_key)
+            return None, 'misses'
+
+        with open(cache_path, 'rb') as f:
+            payload = f.read()
+        value = self._decode(payload, meta)
+        self.policy.record_access(cache_key)
+
+        # Promove para a camada quente (já persistida, não suja)
+        if meta['size'] <= self.memory.max_bytes:
+            self._put_memory(cache_key, dict(
+                meta, value=value, payload=None, dirty=False
+            ))
+        return value, 'hits_disk'
+
+    def _expire(self, cache_key: str):
+        """Remove uma entrada vencida."""
+        self._remove_entry(cache_key)
+        cache_metrics.inc(self.namespace, 'expirations')
+
+    def get_buffer(self, key: Any) -> Optional[memoryview]:
+        """Recupera um valor binário como memoryview.
+
+        Blobs brutos e não comprimidos acima de ``mmap_min_size`` são
+        mapeados do disco sem cópia.
+        """
         try:
             cache_key = self._generate_key(key)
-            
-            # Verifica tamanho do cache
-            self._ensure_cache_size()
-            
-            # Salva dados
-            cache_path = self.cache_dir / f"{cache_key}.json"
-            with open(cache_path, 'w') as f:
-                json.dump(value, f)
-            
-            # Atualiza metadados
-            self.metadata[cache_key] = {
-                'timestamp': time.time(),
-                'size': cache_path.stat().st_size
-            }
-            self._save_metadata()
-            
+
+            with self._lock:
+                meta = self.metadata.get(cache_key)
+                if (cache_key not in self.memory and meta is not None
+                        and not self._is_expired(meta['timestamp'])
+                        and meta.get('codec') == 'raw'
+                        and not meta.get('compression')
+                        and meta['size'] >= self.mmap_min_size):
+                    self.policy.record_access(cache_key)
+                    cache_metrics.inc(self.namespace, 'hits_disk')
+                    with open(self._blob_path(cache_key, meta), 'rb') as f:
+                        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+            value = self.get(key)
+            if isinstance(value, (bytes, bytearray, memoryview)):
+                return memoryview(value)
+            return None
+
+        except Exception as e:
+            cache_metrics.inc(self.namespace, 'errors')
+            self.logger.error(f"Erro ao mapear entrada do cache: {str(e)}")
+            return None
+
+    def set(self, key: Any, value: Any, codec: Optional[str] = None,
+            compression: Optional[str] = None) -> bool:
+        """Armazena dados no cache.
+
+        ``codec`` pode ser 'json', 'pickle', 'msgpack' ou 'raw' (bytes); por
+        padrão é escolhido pelo tipo do valor. ``compression`` aceita 'zlib'
+        ou 'zstd'.
+        """
+        start = time.perf_counter()
+        try:
+            cache_key = self._generate_key(key)
+            payload, info = self._encode(value, codec, compression)
+            if info['codec'] == 'raw' and not isinstance(value, bytes):
+                value = bytes(value)
+            entry = dict(
+                info,
+                value=value,
+                payload=payload,
+                timestamp=time.time(),
+                dirty=True
+            )
+
+            with self._lock:
+                heapq.heappush(self._expiry_heap, (entry['timestamp'], cache_key))
+
+                # Entradas maiores que a camada quente vão direto para o disco
+                if not self.write_back or entry['size'] > self.memory.max_bytes:
+                    self._write_entries([(cache_key, entry)])
+                    entry['dirty'] = False
+                    entry['payload'] = None
+
+                if entry['size'] <= self.memory.max_bytes:
+                    self._put_memory(cache_key, entry)
+                else:
+                    self.memory.pop(cache_key)
+
+            cache_metrics.inc(self.namespace, 'sets')
             return True
-            
+
         except Exception as e:
+            cache_metrics.inc(self.namespace, 'errors')
             self.logger.error(f"Erro ao armazenar no cache: {str(e)}")
             return False
-    
-    def _ensure_cache_size(self):
+
+        finally:
+            cache_metrics.observe(self.namespace, 'set', time.perf_counter() - start)
+
+    def _put_memory(self, cache_key: str, entry: Dict):
+        """Insere na camada quente, gravando em disco as entradas sujas despejadas."""
+        evicted = self.memory.put(cache_key, entry)
+        dirty = [(k, e) for k, e in evicted if e['dirty']]
+        if dirty:
+            self._write_entries(dirty)
+
+    def _write_entries(self, entries: List[Tuple[str, Dict]]):
+        """Grava entradas em disco e registra os metadados no journal."""
+        # Verifica tamanho do cache
+        self._ensure_cache_size(sum(entry['size'] for _, entry in entries))
+
+        records = []
+        for cache_key, entry in entries:
+            meta = {
+                'timestamp': entry['timestamp'],
+                'size': entry['size'],
+                'blob': entry['blob'],
+                'codec': entry['codec'],
+                'compression': entry['compression']
+            }
+
+            # Blobs idênticos são gravados uma única vez
+            if self._blob_refs[meta['blob']] == 0:
+                cache_path = self._blob_path(cache_key, meta)
+                if not cache_path.exists():
+                    cache_path.parent.mkdir(parents=True, exist_ok=True)
+                    tmp_path = cache_path.with_suffix('.tmp')
+                    with open(tmp_path, 'wb') as f:
+                        f.write(entry['payload'])
+                    os.replace(tmp_path, cache_path)
+                self.current_size += meta['size']
+            self._blob_refs[meta['blob']] += 1
+
+            # Atualiza metadados
+            previous = self.metadata.get(cache_key)
+            self.metadata[cache_key] = meta
+            if previous is not None:
+                self._release_blob(cache_key, previous)
+            self.policy.record_insert(cache_key, meta['size'])
+            records.append(dict(meta, op='set', key=cache_key))
+            entry['dirty'] = False
+            entry['payload'] = None
+
+        self._append_journal(records)
+
+    def flush(self):
+        """Grava em disco todas as entradas pendentes da camada quente."""
+        try:
+            with self._lock:
+                dirty = self.memory.dirty_items()
+                if dirty:
+                    self._write_entries(dirty)
+        except Exception as e:
+            self.logger.error(f"Erro ao gravar cache em disco: {str(e)}")
+
+    def _ensure_cache_size(self, incoming: int = 0):
         """Garante que o cache não exceda o tamanho máximo."""
-        current_size = sum(entry['size'] for entry in self.metadata.values())
-        
-        if current_size > self.max_size:
-            # Remove entradas antigas até atingir 80% do tamanho máximo
+        if self.current_size + incoming > self.max_size:
+            # Remove entradas até atingir 80% do tamanho máximo
             target_size = self.max_size * 0.8
-            
-            # Ordena por timestamp
-            entries = sorted(
-                self.metadata.items(),
-                key=lambda x: x[1]['timestamp']
-            )
-            
-            for cache_key, _ in entries:
-                self._remove_entry(cache_key)
-                current_size = sum(entry['size'] for entry in self.metadata.values())
-                if current_size <= target_size:
+
+            while self.current_size + incoming > target_size:
+                cache_key = self.policy.pop_victim()
+                if cache_key is None:
                     break
-    
+                self._remove_entry(cache_key)
+                cache_metrics.inc(self.namespace, 'evictions')
+
+    def purge_expired(self) -> int:
+        """Remove as entradas com TTL vencido e retorna quantas foram removidas."""
+        removed = 0
+        with self._lock:
+            deadline = time.time() - self.ttl
+            while self._expiry_heap and self._expiry_heap[0][0] < deadline:
+                timestamp, cache_key = heapq.heappop(self._expiry_heap)
+
+                # Ignora registros de versões já substituídas da entrada
+                entry = self.memory.peek(cache_key) or self.metadata.get(cache_key)
+                if entry is not None and entry['timestamp'] == timestamp:
+                    self._remove_entry(cache_key)
+                    removed += 1
+        if removed:
+            cache_metrics.inc(self.namespace, 'expirations', removed)
+        return removed
+
+    def close(self):
+        """Para a expiração em segundo plano e grava as entradas pendentes."""
+        self._stop_event.set()
+        _open_managers.discard(self)
+        self.flush()
+
+    def _release_blob(self, cache_key: str, meta: Dict):
+        """Libera a referência de uma entrada ao seu arquivo, removendo-o se órfão."""
+        if 'blob' in meta:
+            self._blob_refs[meta['blob']] -= 1
+            if self._blob_refs[meta['blob']] > 0:
+                return
+            del self._blob_refs[meta['blob']]
+
+        cache_path = self._blob_path(cache_key, meta)
+        if cache_path.exists():
+            cache_path.unlink()
+        self.current_size -= meta['size']
+
     def _remove_entry(self, cache_key: str):
         """Remove uma entrada do cache."""
         try:
-            # Remove arquivo
-            cache_path = self.cache_dir / f"{cache_key}.json"
-            if cache_path.exists():
-                cache_path.unlink()
-            
-            # Remove dos metadados
-            if cache_key in self.metadata:
-                del self.metadata[cache_key]
-                self._save_metadata()
-                
+            with self._lock:
+                self.memory.pop(cache_key)
+                self.policy.remove(cache_key)
+
+                # Remove dos metadados e o arquivo, se não for compartilhado
+                if cache_key in self.metadata:
+                    self._release_blob(cache_key, self.metadata.pop(cache_key))
+                    self._append_journal([{'op': 'del', 'key': cache_key}])
+
         except Exception as e:
             self.logger.error(f"Erro ao remover entrada do cache: {str(e)}")
-    
+
     def clear(self):
         """Limpa todo o cache."""
         try:
-            # Remove todos os arquivos
-            for file in self.cache_dir.glob('*.json'):
-                file.unlink()
-            
-            # Limpa metadados
-            self.metadata = {}
-            self._save_metadata()
-            
+            with self._lock:
+                self.memory.clear()
+
+                # Remove todos os arquivos
+                shutil.rmtree(self.blobs_dir, ignore_errors=True)
+                for file in self.cache_dir.glob('*.json'):
+                    file.unlink()
+
+                # Limpa metadados
+                self.metadata = {}
+                self._blob_refs.clear()
+                self.policy.clear()
+                self._expiry_heap = []
+                self.current_size = 0
+                self._save_metadata()
+
         except Exception as e:
             self.logger.error(f"Erro ao limpar cache: {str(e)}")
-    
+
     def get_stats(self) -> Dict:
         """Retorna estatísticas do cache."""
         try:
-            total_size = sum(entry['size'] for entry in self.metadata.values())
+            total_size = self.current_size
             total_entries = len(self.metadata)
             oldest_entry = min(
                 entry['timestamp'] for entry in self.metadata.values()
@@ -162,7 +631,7 @@ class CacheManager:
             newest_entry = max(
                 entry['timestamp'] for entry in self.metadata.values()
             ) if self.metadata else 0
-            
+
             return {
                 'total_size': total_size,
                 'total_entries': total_entries,
@@ -170,9 +639,16 @@ class CacheManager:
                 'ttl': self.ttl,
                 'oldest_entry': oldest_entry,
                 'newest_entry': newest_entry,
-                'usage_percent': (total_size / self.max_size) * 100
+                'usage_percent': (total_size / self.max_size) * 100,
+                'memory_size': self.memory.size,
+                'memory_entries': len(self.memory),
+                'memory_size_limit': self.memory.max_bytes,
+                'pending_writes': len(self.memory.dirty_items()),
+                'journal_records': self._journal_records,
+                'eviction_policy': self.policy.name,
+                **cache_metrics.snapshot(self.namespace)
             }
-            
+
         except Exception as e:
             self.logger.error(f"Erro ao obter estatísticas do cache: {str(e)}")
-            return {} 
\ No newline at end of file
+            return {}
@@ -0,0 +1,119 @@
+import bisect
+import threading
+import weakref
+from collections import defaultdict
+from typing import Dict, List
+
+class CacheMetrics:
+    """Contadores e histogramas de latência do cache, por namespace.
+
+    Os gerenciadores registram-se pelo namespace para que os tamanhos atuais
+    sejam lidos no momento da coleta, sem custo nas operações.
+    """
+
+    LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+    COUNTERS = {
+        'hits_memory': 'Acertos na camada em memória',
+        'hits_disk': 'Acertos na camada em disco',
+        'misses': 'Chaves não encontradas ou expiradas',
+        'sets': 'Escritas no cache',
+        'evictions': 'Entradas despejadas por limite de tamanho',
+        'expirations': 'Entradas removidas por TTL',
+        'errors': 'Erros em operações do cache'
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._latency: Dict[tuple, List] = {}
+        self._managers = weakref.WeakValueDictionary()
+
+    def register(self, namespace: str, manager):
+        """Associa um gerenciador ao namespace para os gauges de tamanho."""
+        self._managers[namespace] = manager
+
+    def inc(self, namespace: str, name: str, amount: int = 1):
+        """Incrementa um contador."""
+        with self._lock:
+            self._counters[namespace][name] += amount
+
+    def observe(self, namespace: str, operation: str, seconds: float):
+        """Registra a duração de uma operação."""
+        with self._lock:
+            histogram = self._latency.get((namespace, operation))
+            if histogram is None:
+                histogram = self._latency[(namespace, operation)] = [
+                    [0] * (len(self.LATENCY_BUCKETS) + 1), 0.0, 0
+                ]
+            histogram[0][bisect.bisect_left(self.LATENCY_BUCKETS, seconds)] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def snapshot(self, namespace: str) -> Dict:
+        """Retorna contadores e taxa de acerto de um namespace."""
+        with self._lock:
+            counters = {name: self._counters[namespace][name] for name in self.COUNTERS}
+            latency = {
+                operation: {'count': h[2], 'avg_seconds': h[1] / h[2] if h[2] else 0.0}
+                for (ns, operation), h in self._latency.items() if ns == namespace
+            }
+
+        hits = counters['hits_memory'] + counters['hits_disk']
+        lookups = hits + counters['misses']
+        return dict(
+            counters,
+            hits=hits,
+            hit_rate=hits / lookups if lookups else 0.0,
+            miss_rate=counters['misses'] / lookups if lookups else 0.0,
+            latency=latency
+        )
+
+    def reset(self):
+        """Zera todas as métricas."""
+        with self._lock:
+            self._counters.clear()
+            self._latency.clear()
+
+    def render_prometheus(self) -> str:
+        """Exporta as métricas no formato de texto do Prometheus."""
+        lines = []
+        with self._lock:
+            counters = {ns: dict(values) for ns, values in self._counters.items()}
+            latency = {key: [list(h[0]), h[1], h[2]] for key, h in self._latency.items()}
+
+        for name, description in self.COUNTERS.items():
+            metric = f'cache_{name}_total'
+            lines.append(f'# HELP {metric} {description}')
+            lines.append(f'# TYPE {metric} counter')
+            for namespace, values in sorted(counters.items()):
+                lines.append(f'{metric}{{namespace="{namespace}"}} {values.get(name, 0)}')
+
+        lines.append('# HELP cache_operation_duration_seconds Duração das operações do cache')
+        lines.append('# TYPE cache_operation_duration_seconds histogram')
+        for (namespace, operation), (buckets, total, count) in sorted(latency.items()):
+            labels = f'namespace="{namespace}",operation="{operation}"'
+            cumulative = 0
+            for bound, value in zip(self.LATENCY_BUCKETS, buckets):
+                cumulative += value
+                lines.append(f'cache_operation_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'cache_operation_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'cache_operation_duration_seconds_sum{{{labels}}} {total}')
+            lines.append(f'cache_operation_duration_seconds_count{{{labels}}} {count}')
+
+        managers = sorted(self._managers.items())
+        lines.append('# HELP cache_size_bytes Tamanho atual do cache')
+        lines.append('# TYPE cache_size_bytes gauge')
+        for namespace, manager in managers:
+            lines.append(f'cache_size_bytes{{namespace="{namespace}",tier="memory"}} {manager.memory.size}')
+            lines.append(f'cache_size_bytes{{namespace="{namespace}",tier="disk"}} {manager.current_size}')
+        lines.append('# HELP cache_entries Número de entradas no cache')
+        lines.append('# TYPE cache_entries gauge')
+        for namespace, manager in managers:
+            lines.append(f'cache_entries{{namespace="{namespace}",tier="memory"}} {len(manager.memory)}')
+            lines.append(f'cache_entries{{namespace="{namespace}",tier="disk"}} {len(manager.metadata)}')
+
+        return '\n'.join(lines) + '\n'
+
+# Registro global compartilhado por todos os gerenciadores de cache
+cache_metrics = CacheMetrics()
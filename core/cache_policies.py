@@ -0,0 +1,152 @@
+import heapq
+import itertools
+from typing import Dict, List, Optional, Tuple
+
+class EvictionPolicy:
+    """Política de despejo baseada em heap com invalidação preguiçosa.
+
+    Cada chave tem uma prioridade; a de menor prioridade é a próxima vítima.
+    Atualizações empurram uma nova tupla no heap e as antigas são
+    descartadas ao chegar ao topo, mantendo inserção, acesso e despejo em
+    O(log n).
+    """
+
+    name = 'base'
+
+    def __init__(self):
+        self._heap: List[Tuple] = []
+        self._priorities: Dict[str, Tuple] = {}
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._priorities)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._priorities
+
+    def _priority(self, key: str, size: int, hit: bool) -> Tuple:
+        raise NotImplementedError
+
+    def _push(self, key: str, priority: Tuple):
+        self._priorities[key] = priority
+        heapq.heappush(self._heap, (priority, key))
+
+        # Reconstrói o heap quando as tuplas obsoletas dominam
+        if len(self._heap) > 2 * len(self._priorities) + 64:
+            self._heap = [(p, k) for k, p in self._priorities.items()]
+            heapq.heapify(self._heap)
+
+    def record_insert(self, key: str, size: int):
+        """Registra a inserção (ou substituição) de uma chave."""
+        self._push(key, self._priority(key, size, hit=False))
+
+    def record_access(self, key: str):
+        """Registra um acerto na chave."""
+        if key in self._priorities:
+            self._push(key, self._priority(key, None, hit=True))
+
+    def remove(self, key: str):
+        """Esquece uma chave removida por outro caminho."""
+        self._priorities.pop(key, None)
+
+    def pop_victim(self) -> Optional[str]:
+        """Retira e retorna a chave que deve ser despejada."""
+        while self._heap:
+            priority, key = heapq.heappop(self._heap)
+            if self._priorities.get(key) == priority:
+                del self._priorities[key]
+                self._on_evict(priority)
+                return key
+        return None
+
+    def _on_evict(self, priority: Tuple):
+        pass
+
+    def clear(self):
+        self._heap.clear()
+        self._priorities.clear()
+
+class LRUPolicy(EvictionPolicy):
+    """Despeja a chave acessada há mais tempo."""
+
+    name = 'lru'
+
+    def _priority(self, key: str, size: int, hit: bool) -> Tuple:
+        return (next(self._counter),)
+
+class LFUPolicy(EvictionPolicy):
+    """Despeja a chave menos acessada; empates pela menos recente."""
+
+    name = 'lfu'
+
+    def __init__(self):
+        super().__init__()
+        self._hits: Dict[str, int] = {}
+
+    def _priority(self, key: str, size: int, hit: bool) -> Tuple:
+        self._hits[key] = self._hits.get(key, 0) + 1 if hit else 1
+        return (self._hits[key], next(self._counter))
+
+    def remove(self, key: str):
+        super().remove(key)
+        self._hits.pop(key, None)
+
+    def pop_victim(self) -> Optional[str]:
+        key = super().pop_victim()
+        if key is not None:
+            self._hits.pop(key, None)
+        return key
+
+    def clear(self):
+        super().clear()
+        self._hits.clear()
+
+class GDSFPolicy(EvictionPolicy):
+    """Greedy-Dual-Size-Frequency: favorece entradas pequenas e frequentes.
+
+    Prioridade = L + frequência * custo / tamanho, onde L é a prioridade da
+    última vítima (envelhecimento) e o custo é constante.
+    """
+
+    name = 'gdsf'
+
+    def __init__(self):
+        super().__init__()
+        self._inflation = 0.0
+        self._stats: Dict[str, List[int]] = {}  # chave -> [frequência, tamanho]
+
+    def _priority(self, key: str, size: int, hit: bool) -> Tuple:
+        stats = self._stats.get(key)
+        if hit and stats is not None:
+            stats[0] += 1
+        else:
+            stats = self._stats[key] = [1, max(size or 1, 1)]
+        return (self._inflation + stats[0] / stats[1], next(self._counter))
+
+    def _on_evict(self, priority: Tuple):
+        self._inflation = priority[0]
+
+    def remove(self, key: str):
+        super().remove(key)
+        self._stats.pop(key, None)
+
+    def pop_victim(self) -> Optional[str]:
+        key = super().pop_victim()
+        if key is not None:
+            self._stats.pop(key, None)
+        return key
+
+    def clear(self):
+        super().clear()
+        self._stats.clear()
+        self._inflation = 0.0
+
+POLICIES = {
+    policy.name: policy for policy in (LRUPolicy, LFUPolicy, GDSFPolicy)
+}
+
+def create_policy(name: str) -> EvictionPolicy:
+    """Cria a política de despejo pelo nome ('lru', 'lfu' ou 'gdsf')."""
+    if name not in POLICIES:
+        raise ValueError(f"Política de despejo desconhecida: {name}")
+    return POLICIES[name]()
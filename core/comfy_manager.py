@@ -1,5 +1,7 @@
 import os
 import json
+import time
+import uuid
 import asyncio
 import aiohttp
 import websockets
@@ -7,18 +9,45 @@ import logging
 import subprocess
 from typing import Dict, Optional
 from pathlib import Path
+from urllib.parse import urlparse, parse_qs
 
-from config.system_config import COMFY_CONFIG
+from config.system_config import COMFYUI_CONFIG as COMFY_CONFIG
+
+class ComfyHTTPError(RuntimeError):
+    """Resposta HTTP de erro da API do ComfyUI."""
+    
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
 
 class ComfyUIManager:
-    """Gerenciador para interação com o ComfyUI."""
+    """Gerenciador para interação com o ComfyUI.
+
+    Uma tarefa de leitura em segundo plano consome o WebSocket e encaminha
+    cada mensagem, pelo ``prompt_id``, ao future de quem aguarda aquele
+    workflow. Assim vários workflows rodam ao mesmo tempo sobre uma única
+    conexão. Se a conexão cair, ela é refeita e os jobs pendentes são
+    conferidos no histórico.
+    """
     
-    def __init__(self):
+    def __init__(self,
+                 api_url: str = None,
+                 websocket_url: str = None,
+                 port: int = None,
+                 launch: bool = True):
         self.logger = logging.getLogger('ComfyUIManager')
+        self.api_url = api_url or COMFY_CONFIG['api_url']
+        self.websocket_url = websocket_url or COMFY_CONFIG['websocket_url']
+        self.port = port
+        self.launch = launch
         self.process = None
         self.ws = None
         self.session = None
         self.running = False
+        self.client_id = str(uuid.uuid4())
+        self._reader_task = None
+        self._waiters: Dict[str, Dict] = {}
+        self._orphans: Dict[str, tuple] = {}  # prompt_id -> (recebido em, mensagens)
     
     async def start_async(self) -> bool:
         """Inicia o ComfyUI em modo assíncrono."""
@@ -26,18 +55,21 @@ class ComfyUIManager:
             if self.running:
                 return True
             
-            # Inicia processo do ComfyUI
-            comfy_path = Path(COMFY_CONFIG.get('path', 'ComfyUI'))
-            if not comfy_path.exists():
-                raise FileNotFoundError("Diretório do ComfyUI não encontrado")
-            
-            cmd = ['python', str(comfy_path / 'main.py')]
-            self.process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                cwd=str(comfy_path)
-            )
+            # Inicia processo do ComfyUI (instâncias externas já estão rodando)
+            if self.launch:
+                comfy_path = Path(COMFY_CONFIG.get('path', 'ComfyUI'))
+                if not comfy_path.exists():
+                    raise FileNotFoundError("Diretório do ComfyUI não encontrado")
+                
+                cmd = ['python', str(comfy_path / 'main.py')]
+                if self.port:
+                    cmd += ['--port', str(self.port)]
+                self.process = subprocess.Popen(
+                    cmd,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    cwd=str(comfy_path)
+                )
             
             # Aguarda ComfyUI iniciar
             await self._wait_for_startup()
@@ -49,6 +81,7 @@ class ComfyUIManager:
             await self._connect_websocket()
             
             self.running = True
+            self._reader_task = asyncio.create_task(self._read_loop())
             self.logger.info("ComfyUI iniciado com sucesso")
             return True
             
@@ -63,7 +96,7 @@ class ComfyUIManager:
         while True:
             try:
                 async with aiohttp.ClientSession() as session:
-                    async with session.get(COMFY_CONFIG['api_url']) as response:
+                    async with session.get(self.api_url) as response:
                         if response.status == 200:
                             return
             except:
@@ -74,7 +107,9 @@ class ComfyUIManager:
     async def _connect_websocket(self):
         """Conecta ao WebSocket do ComfyUI."""
         try:
-            self.ws = await websockets.connect(COMFY_CONFIG['ws_url'])
+            self.ws = await websockets.connect(
+                f"{self.websocket_url}?clientId={self.client_id}"
+            )
             self.logger.info("Conectado ao WebSocket do ComfyUI")
         except Exception as e:
             self.logger.error(f"Erro ao conectar ao WebSocket: {str(e)}")
@@ -90,13 +125,15 @@ class ComfyUIManager:
             with open(workflow_path, 'r') as f:
                 workflow = json.load(f)
             
-            # Envia workflow para execução
+            # Envia workflow para execução, identificando esta conexão
+            payload = workflow if 'prompt' in workflow else {'prompt': workflow}
+            payload = dict(payload, client_id=self.client_id)
             async with self.session.post(
-                f"{COMFY_CONFIG['api_url']}/prompt",
-                json=workflow
+                f"{self.api_url}/prompt",
+                json=payload
             ) as response:
                 if response.status != 200:
-                    raise RuntimeError(f"Erro ao enviar workflow: {await response.text()}")
+                    raise ComfyHTTPError(f"Erro ao enviar workflow: {await response.text()}", response.status)
                 
                 prompt_id = (await response.json())['prompt_id']
             
@@ -116,57 +153,249 @@ class ComfyUIManager:
             self.logger.error(f"Erro ao executar workflow: {str(e)}")
             raise
     
-    async def _wait_for_execution(self, prompt_id: str) -> Dict:
+    async def _wait_for_execution(self, prompt_id: str, timeout: float = None) -> Dict:
         """Aguarda a conclusão da execução de um workflow."""
         try:
-            while True:
-                msg = await self.ws.recv()
-                data = json.loads(msg)
-                
-                if data.get('type') == 'executing':
-                    if data.get('data', {}).get('node') is None:
-                        # Execução concluída
-                        return {
-                            'success': True,
-                            'outputs': data.get('data', {}).get('outputs', {})
-                        }
-                elif data.get('type') == 'error':
-                    return {
-                        'success': False,
-                        'error': data.get('message', 'Erro desconhecido')
-                    }
-                
-                await asyncio.sleep(0.1)
+            future = asyncio.get_running_loop().create_future()
+            self._waiters[prompt_id] = {'future': future, 'outputs': {}}
+            
+            # Mensagens recebidas antes do registro
+            _, early = self._orphans.pop(prompt_id, (None, []))
+            for data in early:
+                self._route(data)
+            
+            return await asyncio.wait_for(future, timeout)
                 
         except Exception as e:
             self.logger.error(f"Erro aguardando execução: {str(e)}")
             raise
+        
+        finally:
+            self._waiters.pop(prompt_id, None)
+    
+    async def _read_loop(self):
+        """Lê o WebSocket e encaminha as mensagens, reconectando se cair."""
+        delay = 1
+        while self.running:
+            try:
+                async for msg in self.ws:
+                    if isinstance(msg, str):
+                        self._route(json.loads(msg))
+                
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Erro na leitura do WebSocket: {str(e)}")
+            
+            if not self.running:
+                break
+            
+            # Reconecta e ressincroniza os jobs pendentes
+            try:
+                await asyncio.sleep(delay)
+                await self._connect_websocket()
+                await self._resync_pending()
+                delay = 1
+            except Exception:
+                delay = min(delay * 2, 30)
+    
+    async def _resync_pending(self):
+        """Resolve jobs que terminaram enquanto a conexão estava fora."""
+        for prompt_id in list(self._waiters):
+            try:
+                async with self.session.get(
+                    f"{self.api_url}/history/{prompt_id}"
+                ) as response:
+                    history = await response.json()
+            except Exception:
+                continue
+            
+            if prompt_id in history:
+                self._resolve(prompt_id, {
+                    'success': True,
+                    'outputs': history[prompt_id].get('outputs', {})
+                })
+    
+    def _route(self, data: Dict):
+        """Encaminha uma mensagem ao workflow de mesmo prompt_id."""
+        message = data.get('data') or {}
+        prompt_id = message.get('prompt_id')
+        if not prompt_id:
+            return
+        
+        waiter = self._waiters.get(prompt_id)
+        if waiter is None:
+            self._keep_orphan(prompt_id, data)
+            return
+        
+        if data.get('type') == 'executed':
+            waiter['outputs'][message.get('node')] = message.get('output') or {}
+        elif data.get('type') == 'executing' and message.get('node') is None:
+            # Execução concluída
+            self._resolve(prompt_id, {
+                'success': True,
+                'outputs': waiter['outputs']
+            })
+        elif data.get('type') == 'execution_error':
+            self._resolve(prompt_id, {
+                'success': False,
+                'error': message.get('exception_message', 'Erro desconhecido')
+            })
+    
+    def _keep_orphan(self, prompt_id: str, data: Dict):
+        """Guarda uma mensagem sem workflow registrado, descartando as antigas.
+
+        Mensagens de prompts de outros clientes ou que nunca serão aguardados
+        expiram após ``orphan_ttl`` segundos; no máximo ``max_orphans``
+        prompt_ids ficam guardados.
+        """
+        now = time.monotonic()
+        ttl = COMFY_CONFIG.get('orphan_ttl', 300)
+        for orphan_id, (received, _) in list(self._orphans.items()):
+            # Em ordem de chegada: o primeiro ainda válido encerra a varredura
+            if now - received < ttl:
+                break
+            del self._orphans[orphan_id]
+        
+        if prompt_id not in self._orphans:
+            if len(self._orphans) >= COMFY_CONFIG.get('max_orphans', 256):
+                del self._orphans[next(iter(self._orphans))]
+            self._orphans[prompt_id] = (now, [])
+        self._orphans[prompt_id][1].append(data)
+    
+    def _resolve(self, prompt_id: str, result: Dict):
+        waiter = self._waiters.get(prompt_id)
+        if waiter and not waiter['future'].done():
+            waiter['future'].set_result(result)
     
     async def _save_outputs(self, outputs: Dict, output_dir: Path) -> Dict:
-        """Salva os outputs do workflow."""
+        """Salva os outputs do workflow.
+
+        Os arquivos são baixados em paralelo (limitados por
+        ``download_concurrency``), gravados em blocos numa thread auxiliar e
+        retomados a partir do ``.part`` se a conexão cair.
+        """
         saved_files = {}
+        semaphore = asyncio.Semaphore(COMFY_CONFIG.get('download_concurrency', 4))
+        
+        async def save(key: str, url: str, filepath: Path):
+            async with semaphore:
+                if await self._download(url, filepath):
+                    saved_files[key] = str(filepath)
         
         try:
+            downloads = []
             for node_id, node_outputs in outputs.items():
                 for output_name, output_data in node_outputs.items():
                     if isinstance(output_data, str) and output_data.startswith('http'):
                         # Download do arquivo
-                        filename = f"{node_id}_{output_name}.png"
+                        filename = f"{node_id}_{output_name}{self._output_suffix(output_data)}"
                         filepath = output_dir / filename
-                        
-                        async with self.session.get(output_data) as response:
-                            if response.status == 200:
-                                content = await response.read()
-                                with open(filepath, 'wb') as f:
-                                    f.write(content)
-                                saved_files[f"{node_id}_{output_name}"] = str(filepath)
+                        downloads.append(save(f"{node_id}_{output_name}", output_data, filepath))
             
+            await asyncio.gather(*downloads)
             return saved_files
             
         except Exception as e:
             self.logger.error(f"Erro ao salvar outputs: {str(e)}")
             raise
     
+    @staticmethod
+    def _output_suffix(url: str) -> str:
+        """Extensão do arquivo de saída (``/view?filename=...`` ou caminho da URL)."""
+        parsed = urlparse(url)
+        filename = parse_qs(parsed.query).get('filename', [parsed.path])[0]
+        return Path(filename).suffix or '.png'
+    
+    async def _download(self, url: str, filepath: Path, retries: int = 3) -> bool:
+        """Baixa um arquivo em streaming, retomando downloads parciais.
+
+        O ComfyUI não envia checksum; a integridade é conferida pelo tamanho
+        final (Content-Range/Content-Length ou, sem eles, um HEAD em ``url``).
+        Um ``.part`` maior que o arquivo remoto é descartado.
+        """
+        part_path = filepath.with_name(filepath.name + '.part')
+        chunk_size = COMFY_CONFIG.get('download_chunk_size', 1024 * 1024)
+        
+        for attempt in range(retries):
+            try:
+                offset = part_path.stat().st_size if part_path.exists() else 0
+                headers = {'Range': f'bytes={offset}-'} if offset else {}
+                
+                async with self.session.get(url, headers=headers) as response:
+                    if response.status == 416:
+                        # O .part já está completo (ou não corresponde ao arquivo remoto)
+                        total = self._expected_size(response, None)
+                    elif response.status in (200, 206):
+                        if response.status == 200:
+                            # Servidor sem suporte a Range: recomeça
+                            offset = 0
+                        total = self._expected_size(response, offset)
+                        
+                        f = await asyncio.to_thread(open, part_path, 'ab' if offset else 'wb')
+                        try:
+                            async for chunk in response.content.iter_chunked(chunk_size):
+                                await asyncio.to_thread(f.write, chunk)
+                        finally:
+                            await asyncio.to_thread(f.close)
+                    else:
+                        self.logger.error(f"Erro ao baixar {url}: HTTP {response.status}")
+                        return False
+                
+                if total is None:
+                    total = await self._remote_size(url)
+                
+                size = part_path.stat().st_size
+                if total is not None and size != total:
+                    if size > total:
+                        part_path.unlink()
+                    raise IOError(f"Download incompleto: {size} de {total} bytes")
+                
+                await asyncio.to_thread(os.replace, part_path, filepath)
+                return True
+                
+            except Exception as e:
+                self.logger.warning(
+                    f"Falha no download de {url} (tentativa {attempt + 1}/{retries}): {str(e)}"
+                )
+                if attempt < retries - 1:
+                    await asyncio.sleep(2 ** attempt)
+        
+        return False
+    
+    @staticmethod
+    def _expected_size(response, offset: Optional[int]) -> Optional[int]:
+        """Tamanho final esperado a partir de Content-Range/Content-Length.
+
+        Com ``offset=None`` só o Content-Range é considerado (respostas 416).
+        """
+        content_range = response.headers.get('Content-Range')
+        if content_range and '/' in content_range:
+            total = content_range.rsplit('/', 1)[1]
+            if total.isdigit():
+                return int(total)
+        if offset is not None and response.content_length is not None:
+            return offset + response.content_length
+        return None
+    
+    async def _remote_size(self, url: str) -> Optional[int]:
+        """Tamanho do arquivo remoto via HEAD (None se o servidor não informar)."""
+        try:
+            async with self.session.head(url) as response:
+                if response.status == 200:
+                    return response.content_length
+        except Exception as e:
+            self.logger.warning(f"Não foi possível consultar o tamanho de {url}: {str(e)}")
+        return None
+    
+    async def queue_depth(self) -> int:
+        """Número de prompts em execução ou pendentes na fila do ComfyUI."""
+        async with self.session.get(f"{self.api_url}/queue") as response:
+            if response.status != 200:
+                raise ComfyHTTPError(f"Erro ao consultar fila: HTTP {response.status}", response.status)
+            queue = await response.json()
+        return len(queue.get('queue_running', [])) + len(queue.get('queue_pending', []))
+    
     async def stop_workflow(self, workflow_id: str):
         """Para a execução de um workflow."""
         try:
@@ -174,11 +403,11 @@ class ComfyUIManager:
                 return
             
             async with self.session.post(
-                f"{COMFY_CONFIG['api_url']}/interrupt",
+                f"{self.api_url}/interrupt",
                 json={'prompt_id': workflow_id}
             ) as response:
                 if response.status != 200:
-                    raise RuntimeError(f"Erro ao parar workflow: {await response.text()}")
+                    raise ComfyHTTPError(f"Erro ao parar workflow: {await response.text()}", response.status)
                 
         except Exception as e:
             self.logger.error(f"Erro ao parar workflow: {str(e)}")
@@ -189,6 +418,13 @@ class ComfyUIManager:
         try:
             self.running = False
             
+            # Para a leitura e libera quem ainda aguarda
+            if self._reader_task:
+                self._reader_task.cancel()
+                self._reader_task = None
+            for prompt_id in list(self._waiters):
+                self._resolve(prompt_id, {'success': False, 'error': 'ComfyUI parado'})
+            
             # Fecha WebSocket
             if self.ws:
                 await self.ws.close()
@@ -0,0 +1,244 @@
+import json
+import asyncio
+import logging
+import aiohttp
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+from pathlib import Path
+
+from config.system_config import COMFYUI_CONFIG as COMFY_CONFIG
+from .comfy_manager import ComfyUIManager, ComfyHTTPError
+
+@dataclass
+class _Worker:
+    name: str
+    manager: ComfyUIManager
+    queue_depth: int = 0
+    in_flight: int = 0
+    checkpoint: Optional[str] = None
+    healthy: bool = True
+    failures: int = 0
+    jobs: Set[str] = field(default_factory=set)
+    restarting: bool = False
+    restart_failures: int = 0
+    retry_at: float = 0.0
+
+    @property
+    def load(self) -> int:
+        # A fila do servidor só é lida periodicamente; somamos o que foi
+        # enviado desde então para não concentrar rajadas num só worker
+        return max(self.queue_depth, self.in_flight)
+
+class ComfyUIPool:
+    """Pool de instâncias do ComfyUI com a mesma interface do ComfyUIManager.
+
+    Cada workflow vai para o worker saudável com menor fila, preferindo
+    o que já tem o checkpoint necessário carregado (trocar de modelo custa
+    ``model_switch_cost`` posições de fila). A fila é lida de ``/queue``
+    periodicamente; workers que falham seguidamente são drenados e
+    reiniciados, e os que não voltam são tentados de novo com backoff.
+    Só falhas do servidor (conexão, timeout, HTTP 5xx) contam: um workflow
+    rejeitado (4xx) não tira o worker de rotação.
+    """
+
+    def __init__(self, instances: List[Dict] = None, managers: List[ComfyUIManager] = None):
+        self.logger = logging.getLogger('ComfyUIPool')
+        self.health_interval = COMFY_CONFIG.get('health_interval', 10)
+        self.max_failures = COMFY_CONFIG.get('max_failures', 3)
+        self.model_switch_cost = COMFY_CONFIG.get('model_switch_cost', 2)
+        self.restart_backoff = COMFY_CONFIG.get('restart_backoff', 5)
+        self.max_restart_backoff = COMFY_CONFIG.get('max_restart_backoff', 300)
+
+        if managers is None:
+            instances = instances or COMFY_CONFIG.get('instances') or [{}]
+            managers = [
+                ComfyUIManager(
+                    api_url=instance.get('api_url'),
+                    websocket_url=instance.get('websocket_url'),
+                    port=instance.get('port'),
+                    launch=instance.get('launch', True)
+                )
+                for instance in instances
+            ]
+
+        self.workers = [
+            _Worker(name=getattr(manager, 'api_url', str(index)), manager=manager)
+            for index, manager in enumerate(managers)
+        ]
+        self.running = False
+        self._monitor_task = None
+
+    async def start_async(self) -> bool:
+        """Inicia todas as instâncias; basta uma subir para o pool funcionar."""
+        results = await asyncio.gather(
+            *(worker.manager.start_async() for worker in self.workers),
+            return_exceptions=True
+        )
+
+        for worker, result in zip(self.workers, results):
+            worker.healthy = result is True
+            if not worker.healthy:
+                self.logger.error(f"Falha ao iniciar worker {worker.name}: {result}")
+                self._schedule_retry(worker)
+
+        self.running = any(worker.healthy for worker in self.workers)
+        if self.running:
+            self._monitor_task = asyncio.create_task(self._monitor_loop())
+        return self.running
+
+    @staticmethod
+    def _required_checkpoint(workflow: Dict) -> Optional[str]:
+        """Checkpoint carregado pelo workflow (nó CheckpointLoader*)."""
+        nodes = workflow.get('prompt', workflow)
+        for node in nodes.values():
+            if isinstance(node, dict) and str(node.get('class_type', '')).startswith('CheckpointLoader'):
+                return node.get('inputs', {}).get('ckpt_name')
+        return None
+
+    def _select_worker(self, checkpoint: Optional[str]) -> _Worker:
+        """Escolhe o worker saudável de menor custo para o checkpoint."""
+        candidates = [worker for worker in self.workers if worker.healthy]
+        if not candidates:
+            raise RuntimeError("Nenhum worker do ComfyUI disponível")
+
+        def cost(worker: _Worker):
+            switch = 0 if checkpoint is None or worker.checkpoint == checkpoint else self.model_switch_cost
+            return worker.load + switch
+
+        return min(candidates, key=cost)
+
+    async def execute_workflow(self, workflow_path: str, output_dir: Path) -> Dict:
+        """Executa um workflow no worker mais adequado."""
+        if not self.running:
+            raise RuntimeError("ComfyUI não está rodando")
+
+        with open(workflow_path, 'r') as f:
+            checkpoint = self._required_checkpoint(json.load(f))
+
+        worker = self._select_worker(checkpoint)
+        job_id = Path(workflow_path).stem
+        worker.in_flight += 1
+        worker.jobs.add(job_id)
+        try:
+            result = await worker.manager.execute_workflow(workflow_path, output_dir)
+            worker.failures = 0
+            if checkpoint and result.get('success'):
+                # O ComfyUI mantém o último modelo carregado na memória
+                worker.checkpoint = checkpoint
+            result['worker'] = worker.name
+            return result
+
+        except Exception as e:
+            if self._is_worker_failure(e):
+                await self._record_failure(worker)
+            raise
+
+        finally:
+            worker.in_flight -= 1
+            worker.jobs.discard(job_id)
+
+    async def stop_workflow(self, workflow_id: str):
+        """Interrompe o workflow no worker que o está executando."""
+        for worker in self.workers:
+            if workflow_id in worker.jobs:
+                await worker.manager.stop_workflow(workflow_id)
+
+    async def _monitor_loop(self):
+        """Atualiza periodicamente a fila de cada worker, detecta falhas e
+        tenta reiniciar os workers fora de rotação."""
+        while self.running:
+            await self.refresh()
+            self._retry_unhealthy()
+            await asyncio.sleep(self.health_interval)
+    
+    def _retry_unhealthy(self):
+        """Reinicia os workers fora de rotação cujo backoff já passou."""
+        now = asyncio.get_running_loop().time()
+        for worker in self.workers:
+            if not worker.healthy and not worker.restarting and now >= worker.retry_at:
+                asyncio.create_task(self._restart(worker))
+
+    async def refresh(self):
+        """Lê ``/queue`` de todos os workers saudáveis."""
+        async def poll(worker: _Worker):
+            try:
+                worker.queue_depth = await worker.manager.queue_depth()
+                worker.failures = 0
+            except Exception as e:
+                self.logger.warning(f"Worker {worker.name} não respondeu: {str(e)}")
+                if self._is_worker_failure(e):
+                    await self._record_failure(worker)
+
+        await asyncio.gather(*(poll(worker) for worker in self.workers if worker.healthy))
+
+    @staticmethod
+    def _is_worker_failure(error: Exception) -> bool:
+        """Indica se o erro é do servidor (conexão, timeout, 5xx), e não do workflow."""
+        if isinstance(error, ComfyHTTPError):
+            return error.status >= 500
+        return isinstance(error, (ConnectionError, asyncio.TimeoutError, aiohttp.ClientError))
+
+    async def _record_failure(self, worker: _Worker):
+        worker.failures += 1
+        if worker.healthy and worker.failures >= self.max_failures:
+            worker.healthy = False
+            asyncio.create_task(self._restart(worker))
+
+    def _schedule_retry(self, worker: _Worker):
+        """Agenda a próxima tentativa de reinício com backoff exponencial."""
+        worker.restart_failures += 1
+        delay = min(self.restart_backoff * 2 ** (worker.restart_failures - 1), self.max_restart_backoff)
+        worker.retry_at = asyncio.get_running_loop().time() + delay
+
+    async def _restart(self, worker: _Worker, drain_timeout: float = 60):
+        """Drena um worker com falhas (sem novos jobs) e o reinicia."""
+        if worker.restarting:
+            return
+        worker.restarting = True
+        self.logger.warning(f"Drenando e reiniciando worker {worker.name}")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + drain_timeout
+        while worker.in_flight and loop.time() < deadline:
+            await asyncio.sleep(1)
+
+        try:
+            await worker.manager.stop()
+            worker.healthy = await worker.manager.start_async() is True
+        except Exception as e:
+            self.logger.error(f"Erro ao reiniciar worker {worker.name}: {str(e)}")
+            worker.healthy = False
+        finally:
+            worker.restarting = False
+
+        if worker.healthy:
+            worker.restart_failures = 0
+        else:
+            self._schedule_retry(worker)
+        worker.failures = 0
+        worker.queue_depth = 0
+        worker.checkpoint = None
+
+    def get_stats(self) -> List[Dict]:
+        """Estado atual de cada worker."""
+        return [
+            {
+                'name': worker.name,
+                'healthy': worker.healthy,
+                'queue_depth': worker.queue_depth,
+                'in_flight': worker.in_flight,
+                'checkpoint': worker.checkpoint
+            }
+            for worker in self.workers
+        ]
+
+    async def stop(self):
+        """Para todas as instâncias."""
+        self.running = False
+        if self._monitor_task:
+            self._monitor_task.cancel()
+            self._monitor_task = None
+
+        await asyncio.gather(
+            *(worker.manager.stop() for worker in self.workers),
+            return_exceptions=True
+        )
@@ -0,0 +1,117 @@
+import json
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, List
+
+from .cache_manager import CacheManager
+
+class DAGExecutor:
+    """Executa etapas com dependências como um grafo acíclico.
+
+    Cada etapa é um dicionário com ``name``, ``type``, ``config`` e
+    ``depends_on``. Etapas sem dependência pendente rodam em paralelo e
+    recebem as saídas das etapas das quais dependem. A saída de cada etapa
+    é guardada no cache pelo hash das suas entradas (tipo, config,
+    parâmetros e saídas das dependências), então repetir um workflow que
+    falhou no meio reaproveita as etapas já concluídas.
+    """
+
+    def __init__(self,
+                 run_step: Callable[[Dict, Dict, Dict[str, Any]], Awaitable[Any]],
+                 cache: CacheManager = None,
+                 is_valid: Callable[[Any], bool] = None):
+        self.logger = logging.getLogger('DAGExecutor')
+        self.run_step = run_step
+        self.cache = cache
+        self.is_valid = is_valid or (lambda output: True)
+
+    @staticmethod
+    def topological_order(steps: List[Dict]) -> List[List[str]]:
+        """Ordena as etapas em níveis; as de um mesmo nível são independentes."""
+        names = {step['name'] for step in steps}
+        pending = {}
+        for step in steps:
+            missing = set(step.get('depends_on', [])) - names
+            if missing:
+                raise ValueError(f"Etapa '{step['name']}' depende de etapas inexistentes: {sorted(missing)}")
+            pending[step['name']] = set(step.get('depends_on', []))
+
+        levels = []
+        while pending:
+            ready = sorted(name for name, deps in pending.items() if not deps)
+            if not ready:
+                raise ValueError(f"Ciclo de dependências entre as etapas: {sorted(pending)}")
+            levels.append(ready)
+            for name in ready:
+                del pending[name]
+            for deps in pending.values():
+                deps.difference_update(ready)
+        return levels
+
+    @staticmethod
+    def _step_key(step: Dict, params: Dict, inputs: Dict[str, Any]) -> str:
+        data = json.dumps({
+            'type': step.get('type'),
+            'config': step.get('config'),
+            'params': params,
+            'inputs': inputs
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    async def run(self, steps: List[Dict], params: Dict) -> Dict[str, Any]:
+        """Executa o grafo e retorna as saídas, etapas em cache, falhas e puladas."""
+        by_name = {step['name']: step for step in steps}
+        order = [name for level in self.topological_order(steps) for name in level]
+
+        outputs: Dict[str, Any] = {}
+        cached: List[str] = []
+        failed: Dict[str, str] = {}
+        skipped: List[str] = []
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def execute(name: str):
+            step = by_name[name]
+            deps = step.get('depends_on', [])
+            await asyncio.gather(*(tasks[dep] for dep in deps))
+
+            if any(dep not in outputs for dep in deps):
+                skipped.append(name)
+                return
+
+            inputs = {dep: outputs[dep] for dep in deps}
+            key = self._step_key(step, params, inputs)
+            if self.cache is not None:
+                output = self.cache.get(key)
+                if output is not None and self.is_valid(output):
+                    outputs[name] = output
+                    cached.append(name)
+                    return
+
+            try:
+                output = await self.run_step(step, params, inputs)
+            except Exception as e:
+                self.logger.error(f"Erro na etapa '{name}': {str(e)}")
+                failed[name] = str(e)
+                return
+
+            outputs[name] = output
+            if self.cache is not None:
+                self.cache.set(key, output)
+
+        # As tarefas são criadas em ordem topológica, então as dependências
+        # de cada etapa já existem quando ela é criada
+        for name in order:
+            tasks[name] = asyncio.create_task(execute(name))
+        await asyncio.gather(*tasks.values())
+
+        if failed and self.cache is not None:
+            # Garante que as etapas concluídas sobrevivam até a nova tentativa
+            self.cache.flush()
+
+        return {
+            'outputs': outputs,
+            'cached': cached,
+            'failed': failed,
+            'skipped': skipped
+        }
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable
+
+from config.system_config import EXECUTOR_CONFIG
+
+class Executors:
+    """Pools para tirar trabalho bloqueante do event loop.
+
+    ``run_io`` usa threads (disco, SQLite, rede) e ``run_cpu`` usa processos
+    para trabalho que segura o GIL, como codificar PNG. As funções passadas
+    a ``run_cpu`` precisam ser definidas no nível do módulo. Os pools são
+    criados no primeiro uso.
+    """
+
+    def __init__(self, io_workers: int = None, cpu_workers: int = None):
+        self.logger = logging.getLogger('Executors')
+        self.io_workers = io_workers if io_workers is not None else EXECUTOR_CONFIG.get('io_workers', 8)
+        self.cpu_workers = cpu_workers if cpu_workers is not None else EXECUTOR_CONFIG.get('cpu_workers', 2)
+        self._io_pool = None
+        self._cpu_pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def io_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._io_pool is None:
+                self._io_pool = ThreadPoolExecutor(self.io_workers, thread_name_prefix='generation-io')
+            return self._io_pool
+
+    @property
+    def cpu_pool(self):
+        with self._lock:
+            if self._cpu_pool is None:
+                if self.cpu_workers > 0:
+                    self._cpu_pool = ProcessPoolExecutor(self.cpu_workers)
+                else:
+                    self._cpu_pool = ThreadPoolExecutor(self.io_workers, thread_name_prefix='generation-cpu')
+            return self._cpu_pool
+
+    async def run_io(self, func: Callable, *args, **kwargs) -> Any:
+        """Executa uma função de E/S numa thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_pool, partial(func, *args, **kwargs))
+
+    async def run_cpu(self, func: Callable, *args, **kwargs) -> Any:
+        """Executa uma função de CPU num processo separado."""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.cpu_pool, partial(func, *args, **kwargs))
+        except BrokenProcessPool:
+            # Um processo morreu; recria o pool e tenta mais uma vez
+            self.logger.warning("Pool de processos quebrado, recriando")
+            with self._lock:
+                self._cpu_pool = None
+            return await loop.run_in_executor(self.cpu_pool, partial(func, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            for pool in (self._io_pool, self._cpu_pool):
+                if pool is not None:
+                    pool.shutdown(wait=wait)
+            self._io_pool = None
+            self._cpu_pool = None
+
+_default_executors = None
+_default_lock = threading.Lock()
+
+def get_executors() -> Executors:
+    """Retorna os executores compartilhados do processo."""
+    global _default_executors
+    with _default_lock:
+        if _default_executors is None:
+            _default_executors = Executors()
+        return _default_executors
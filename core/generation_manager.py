@@ -1,16 +1,37 @@
+import io
 import os
 import logging
 import asyncio
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import uuid
+from pathlib import Path
 from PIL import Image
 import numpy as np
 
+from config.system_config import CACHE_DIR
+from .cache_manager import CacheManager
+from .dag_executor import DAGExecutor
+from .result_store import ResultStore
+from .executors import Executors, get_executors
+
+def _render_placeholder(width: int, height: int, seed: Optional[int] = None) -> bytes:
+    """Gera e codifica uma imagem de teste em PNG (roda num processo do pool)."""
+    rng = np.random.default_rng(seed)
+    img = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(img).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def _write_file(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
 class GenerationManager:
     """Gerenciador de geração de conteúdo usando ComfyUI."""
     
-    def __init__(self):
+    def __init__(self, executors: Executors = None):
         self.logger = logging.getLogger('GenerationManager')
+        self.executors = executors or get_executors()
         self.output_dir = "outputs"
         os.makedirs(self.output_dir, exist_ok=True)
         
@@ -22,86 +43,147 @@ class GenerationManager:
         
         for directory in [self.image_dir, self.model_dir, self.video_dir, self.code_dir]:
             os.makedirs(directory, exist_ok=True)
+        
+        self._step_cache = None
+        
+        # Artefatos gerados, deduplicados pelo hash da requisição
+        self.results = ResultStore(os.path.join(self.output_dir, "results.sqlite3"))
+        self._pending_results: Dict[str, asyncio.Future] = {}
     
-    async def generate_image(self, prompt: str, type: str = "general") -> Dict[str, Any]:
-        """Gera uma imagem baseada no prompt."""
+    async def generate_image(self, prompt: str, type: str = "general",
+                             seed: Optional[int] = None) -> Dict[str, Any]:
+        """Gera uma imagem baseada no prompt.
+
+        Com ``seed`` a geração é determinística e um pedido idêntico já
+        gerado retorna o arquivo existente.
+        """
         try:
             # Configura workflow baseado no tipo
             workflow = self._get_image_workflow(type)
             
-            # Gera ID único para o arquivo
-            image_id = str(uuid.uuid4())
-            output_path = os.path.join(self.image_dir, f"{image_id}.png")
-            
             # Executa workflow no ComfyUI
-            result = await self._execute_workflow(workflow, {
-                "prompt": prompt,
-                "output_path": output_path
-            })
+            artifact = await self._generate_artifact("image", self.image_dir, "png", workflow, {
+                "prompt": prompt
+            }, seed)
             
             return {
                 "status": "success",
-                "image_url": output_path,
-                "metadata": result.get("metadata", {})
+                "image_url": artifact["path"],
+                "cached": artifact["cached"],
+                "metadata": artifact["metadata"]
             }
             
         except Exception as e:
             self.logger.error(f"Erro na geração de imagem: {str(e)}")
             return {"status": "error", "message": str(e)}
     
-    async def generate_3d_model(self, prompt: str, type: str = "character") -> Dict[str, Any]:
+    async def generate_3d_model(self, prompt: str, type: str = "character",
+                                seed: Optional[int] = None) -> Dict[str, Any]:
         """Gera um modelo 3D baseado no prompt."""
         try:
             # Configura workflow baseado no tipo
             workflow = self._get_3d_workflow(type)
             
-            # Gera ID único para o arquivo
-            model_id = str(uuid.uuid4())
-            output_path = os.path.join(self.model_dir, f"{model_id}.glb")
-            
             # Executa workflow no ComfyUI
-            result = await self._execute_workflow(workflow, {
-                "prompt": prompt,
-                "output_path": output_path
-            })
+            artifact = await self._generate_artifact("model", self.model_dir, "glb", workflow, {
+                "prompt": prompt
+            }, seed)
             
             return {
                 "status": "success",
-                "model_url": output_path,
-                "metadata": result.get("metadata", {})
+                "model_url": artifact["path"],
+                "cached": artifact["cached"],
+                "metadata": artifact["metadata"]
             }
             
         except Exception as e:
             self.logger.error(f"Erro na geração do modelo 3D: {str(e)}")
             return {"status": "error", "message": str(e)}
     
-    async def generate_video(self, prompt: str, duration: int = 10) -> Dict[str, Any]:
+    async def generate_video(self, prompt: str, duration: int = 10,
+                             seed: Optional[int] = None) -> Dict[str, Any]:
         """Gera um vídeo baseado no prompt."""
         try:
             # Configura workflow para vídeo
             workflow = self._get_video_workflow(duration)
             
-            # Gera ID único para o arquivo
-            video_id = str(uuid.uuid4())
-            output_path = os.path.join(self.video_dir, f"{video_id}.mp4")
-            
             # Executa workflow no ComfyUI
-            result = await self._execute_workflow(workflow, {
+            artifact = await self._generate_artifact("video", self.video_dir, "mp4", workflow, {
                 "prompt": prompt,
-                "output_path": output_path,
                 "duration": duration
-            })
+            }, seed)
             
             return {
                 "status": "success",
-                "video_url": output_path,
-                "metadata": result.get("metadata", {})
+                "video_url": artifact["path"],
+                "cached": artifact["cached"],
+                "metadata": artifact["metadata"]
             }
             
         except Exception as e:
             self.logger.error(f"Erro na geração do vídeo: {str(e)}")
             return {"status": "error", "message": str(e)}
     
+    async def _generate_artifact(self, kind: str, directory: str, extension: str,
+                                 workflow: Dict[str, Any], params: Dict[str, Any],
+                                 seed: Optional[int]) -> Dict[str, Any]:
+        """Gera um artefato, reaproveitando o de um pedido determinístico idêntico.
+
+        Sem ``seed`` cada chamada gera um arquivo novo (ainda registrado no
+        ``ResultStore`` para a coleta de lixo).
+        """
+        if seed is None:
+            key = str(uuid.uuid4())
+        else:
+            key = ResultStore.make_key(workflow, params["prompt"], seed, kind=kind, params=params)
+            existing = await self.executors.run_io(self.results.acquire, key)
+            if existing is not None:
+                return {"path": existing["path"], "cached": True, "metadata": existing["metadata"]}
+            
+            # Pedido idêntico já em geração: aguarda o mesmo resultado
+            pending = self._pending_results.get(key)
+            if pending is not None:
+                artifact = await asyncio.shield(pending)
+                await self.executors.run_io(self.results.acquire, key)
+                return dict(artifact, cached=True)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._pending_results[key] = future
+        try:
+            output_path = os.path.join(directory, f"{key}.{extension}")
+            await self.executors.run_io(self.results.reserve, output_path)
+            run_params = dict(params, output_path=output_path)
+            if seed is not None:
+                run_params["seed"] = seed
+            
+            result = await self._execute_workflow(workflow, run_params)
+            metadata = result.get("metadata", {})
+            await self.executors.run_io(self.results.register, key, output_path, kind, metadata)
+            
+            artifact = {"path": output_path, "cached": False, "metadata": metadata}
+            future.set_result(artifact)
+            return artifact
+            
+        except Exception as e:
+            future.set_exception(e)
+            # Evita aviso de exceção não lida quando ninguém aguardava
+            future.exception()
+            raise
+        
+        finally:
+            self._pending_results.pop(key, None)
+    
+    def release_output(self, path: str) -> int:
+        """Libera uma referência a um artefato gerado."""
+        return self.results.release(path)
+    
+    def collect_garbage(self, grace_period: float = 3600) -> List[str]:
+        """Remove artefatos sem referências e saídas de gerações interrompidas."""
+        removed = self.results.collect_garbage(grace_period)
+        if removed:
+            self.logger.info(f"{len(removed)} arquivo(s) de saída removidos")
+        return removed
+    
     async def generate_code(self, prompt: str, language: str = "python") -> Dict[str, Any]:
         """Gera código baseado no prompt."""
         try:
@@ -137,11 +219,36 @@ class GenerationManager:
             # Gera ID único para o workflow
             workflow_id = str(uuid.uuid4())
             output_dir = os.path.join(self.output_dir, f"workflow_{workflow_id}")
-            os.makedirs(output_dir, exist_ok=True)
+            await self.executors.run_io(os.makedirs, output_dir, exist_ok=True)
             
             # Configura workflow complexo
             workflow = self._get_complex_workflow(type)
             
+            if workflow.get("steps"):
+                # Executa as etapas como grafo, reaproveitando as já concluídas
+                executor = DAGExecutor(
+                    lambda step, params, inputs: self._run_step(step, params, inputs, output_dir),
+                    cache=self._get_step_cache(),
+                    is_valid=self._step_output_exists
+                )
+                result = await executor.run(self._workflow_steps(workflow), {"prompt": prompt})
+                
+                response = {
+                    "status": "error" if result["failed"] else "success",
+                    "workflow_id": workflow_id,
+                    "outputs": result["outputs"],
+                    "metadata": {
+                        "cached_steps": result["cached"],
+                        "failed_steps": result["failed"],
+                        "skipped_steps": result["skipped"]
+                    }
+                }
+                if result["failed"]:
+                    response["message"] = "; ".join(
+                        f"{name}: {error}" for name, error in result["failed"].items()
+                    )
+                return response
+            
             # Executa workflow no ComfyUI
             result = await self._execute_workflow(workflow, {
                 "prompt": prompt,
@@ -159,6 +266,51 @@ class GenerationManager:
             self.logger.error(f"Erro na geração do workflow: {str(e)}")
             return {"status": "error", "message": str(e)}
     
+    def _get_step_cache(self) -> CacheManager:
+        """Cache das saídas das etapas de workflows complexos."""
+        if self._step_cache is None:
+            self._step_cache = CacheManager(
+                cache_dir=Path(CACHE_DIR) / "workflow_steps",
+                namespace="workflow_steps"
+            )
+        return self._step_cache
+    
+    @staticmethod
+    def _workflow_steps(workflow: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Converte ``dependencies`` (etapa -> etapas que usam sua saída) em ``depends_on``."""
+        steps = [dict(step, depends_on=[]) for step in workflow["steps"]]
+        by_name = {step["name"]: step for step in steps}
+        for producer, consumers in workflow.get("dependencies", {}).items():
+            for consumer in consumers:
+                by_name[consumer]["depends_on"].append(producer)
+        return steps
+    
+    @staticmethod
+    def _step_output_exists(output: Dict[str, Any]) -> bool:
+        """Uma saída em cache só vale se o arquivo gerado ainda existir."""
+        path = output.get("output_path")
+        return path is None or os.path.exists(path)
+    
+    async def _run_step(self, step: Dict[str, Any], params: Dict[str, Any],
+                        inputs: Dict[str, Any], output_dir: str) -> Dict[str, Any]:
+        """Executa uma etapa de um workflow complexo."""
+        step_dir = os.path.join(output_dir, step["name"])
+        await self.executors.run_io(os.makedirs, step_dir, exist_ok=True)
+        
+        step_params = dict(
+            params,
+            output_dir=step_dir,
+            # Artefatos das etapas anteriores
+            inputs={name: output.get("output_path") for name, output in inputs.items()}
+        )
+        if step["type"] in ("image", "ui"):
+            step_params["output_path"] = os.path.join(step_dir, f"{step['name']}.png")
+        
+        result = await self._execute_workflow(step["config"], step_params)
+        if "output_path" in step_params:
+            result["output_path"] = step_params["output_path"]
+        return result
+    
     def _get_image_workflow(self, type: str) -> Dict[str, Any]:
         """Retorna configuração do workflow para geração de imagem."""
         workflows = {
@@ -228,11 +380,12 @@ class GenerationManager:
         workflows = {
             "game": {
                 "steps": [
-                    {"type": "3d_model", "config": self._get_3d_workflow("character")},
-                    {"type": "image", "config": self._get_image_workflow("game_scene")},
-                    {"type": "code", "config": self._get_code_workflow("python")},
-                    {"type": "ui", "config": self._get_image_workflow("ui")}
+                    {"name": "character_model", "type": "3d_model", "config": self._get_3d_workflow("character")},
+                    {"name": "game_scene", "type": "image", "config": self._get_image_workflow("game_scene")},
+                    {"name": "game_logic", "type": "code", "config": self._get_code_workflow("python")},
+                    {"name": "ui", "type": "ui", "config": self._get_image_workflow("ui")}
                 ],
+                # Etapa -> etapas que dependem da sua saída
                 "dependencies": {
                     "character_model": ["game_logic"],
                     "game_scene": ["game_logic", "ui"],
@@ -261,9 +414,12 @@ class GenerationManager:
         await asyncio.sleep(2)  # Simula processamento
         
         if "output_path" in params:
-            # Cria uma imagem de teste
-            img = np.random.randint(0, 255, (512, 512, 3), dtype=np.uint8)
-            Image.fromarray(img).save(params["output_path"])
+            # Cria uma imagem de teste: codificação num processo e gravação
+            # numa thread, sem bloquear o event loop
+            data = await self.executors.run_cpu(
+                _render_placeholder, 512, 512, params.get("seed")
+            )
+            await self.executors.run_io(_write_file, params["output_path"], data)
         
         return {
             "status": "success",
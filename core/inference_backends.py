@@ -0,0 +1,220 @@
+import gc
+import os
+import sys
+import time
+import shutil
+import logging
+import statistics
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config.system_config import INFERENCE_CONFIG
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger('InferenceBackends')
+
+# pytorch: precisão total; int8: quantização dinâmica das camadas lineares;
+# onnx: exportado para o ONNX Runtime; onnx-int8: ONNX com pesos int8
+BACKENDS = ("pytorch", "int8", "onnx", "onnx-int8")
+
+# Modelos de texto locais: nome no Hugging Face e tipo de geração
+TEXT_MODELS = {
+    "dialogpt": ("microsoft/DialoGPT-medium", "causal"),
+    "t5_base": ("t5-base", "seq2seq"),
+    "gpt2_medium": ("gpt2-medium", "causal")
+}
+
+def backend_for(key: str) -> str:
+    """Backend configurado para o modelo (pytorch se não houver)."""
+    return INFERENCE_CONFIG.get('models', {}).get(key, 'pytorch')
+
+def load_text_model(key: str, backend: str = None) -> Dict:
+    """Carrega um modelo de texto local no backend pedido ou configurado.
+
+    Retorna ``{"model", "tokenizer", "backend"}``; os modelos de todos os
+    backends têm o mesmo ``generate``. Sem o optimum/onnxruntime
+    instalados, os backends ONNX recaem no PyTorch equivalente.
+    """
+    name, kind = TEXT_MODELS[key]
+    backend = backend or backend_for(key)
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de inferência desconhecido: {backend}")
+
+    if backend.startswith('onnx'):
+        try:
+            model, tokenizer = _load_onnx(name, kind, quantize=backend == 'onnx-int8')
+            return {"model": model, "tokenizer": tokenizer, "backend": backend}
+        except ImportError:
+            fallback = 'int8' if backend == 'onnx-int8' else 'pytorch'
+            logger.warning(f"optimum[onnxruntime] não instalado; {key} usará o backend {fallback}")
+            backend = fallback
+
+    model, tokenizer = _load_pytorch(name, kind)
+    if backend == 'int8':
+        model = quantize_dynamic_int8(model)
+    return {"model": model, "tokenizer": tokenizer, "backend": backend}
+
+def _load_pytorch(name: str, kind: str):
+    from transformers import AutoModelForCausalLM, AutoModelForSeq2SeqLM, AutoTokenizer
+    model_class = AutoModelForCausalLM if kind == 'causal' else AutoModelForSeq2SeqLM
+    model = model_class.from_pretrained(name)
+    model.eval()
+    return model, AutoTokenizer.from_pretrained(name)
+
+def quantize_dynamic_int8(model):
+    """Quantiza dinamicamente para int8 as camadas lineares do modelo (CPU)."""
+    import torch
+    # GPT-2 e DialoGPT usam Conv1D em vez de nn.Linear na atenção e no MLP;
+    # sem a conversão, a quantização dinâmica não alcançaria essas camadas
+    _conv1d_to_linear(model)
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _conv1d_to_linear(model):
+    import torch
+    from transformers.pytorch_utils import Conv1D
+
+    replacements = [
+        (parent, child_name, child)
+        for parent in model.modules()
+        for child_name, child in parent.named_children()
+        if isinstance(child, Conv1D)
+    ]
+    for parent, child_name, conv in replacements:
+        # Conv1D guarda o peso como (entrada, saída); nn.Linear como (saída, entrada)
+        linear = torch.nn.Linear(conv.weight.shape[0], conv.nf)
+        linear.weight.data = conv.weight.data.t().contiguous()
+        linear.bias.data = conv.bias.data
+        setattr(parent, child_name, linear)
+    return model
+
+def _load_onnx(name: str, kind: str, quantize: bool = False):
+    """Exporta o modelo para ONNX na primeira vez e o carrega no ONNX Runtime."""
+    from optimum.onnxruntime import ORTModelForCausalLM, ORTModelForSeq2SeqLM
+    from transformers import AutoTokenizer
+
+    model_class = ORTModelForCausalLM if kind == 'causal' else ORTModelForSeq2SeqLM
+    export_dir = Path(INFERENCE_CONFIG['onnx_dir']) / name.replace('/', '--')
+    if not (export_dir / 'config.json').exists():
+        logger.info(f"Exportando {name} para ONNX em {export_dir}...")
+        tmp_dir = export_dir.with_name(export_dir.name + '.tmp')
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        model_class.from_pretrained(name, export=True).save_pretrained(tmp_dir)
+        AutoTokenizer.from_pretrained(name).save_pretrained(tmp_dir)
+        shutil.rmtree(export_dir, ignore_errors=True)
+        os.replace(tmp_dir, export_dir)
+
+    if quantize:
+        export_dir = _quantize_onnx(export_dir)
+    return model_class.from_pretrained(export_dir), AutoTokenizer.from_pretrained(export_dir)
+
+def _quantize_onnx(export_dir: Path) -> Path:
+    """Gera, ao lado da exportação, uma cópia com os pesos quantizados em int8."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    target = export_dir.with_name(export_dir.name + '-int8')
+    if (target / 'config.json').exists():
+        return target
+
+    logger.info(f"Quantizando {export_dir.name} para int8...")
+    tmp_dir = target.with_name(target.name + '.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    shutil.copytree(export_dir, tmp_dir, ignore=shutil.ignore_patterns('*.onnx', '*.onnx_data'))
+    # Os mesmos nomes de arquivo permitem carregar a cópia com from_pretrained
+    for onnx_file in export_dir.glob('*.onnx'):
+        quantize_dynamic(str(onnx_file), str(tmp_dir / onnx_file.name), weight_type=QuantType.QInt8)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp_dir, target)
+    return target
+
+def _inference_context():
+    torch = sys.modules.get('torch')
+    return torch.inference_mode() if torch is not None else nullcontext()
+
+def _rss_mb() -> Optional[float]:
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+def _generate(loaded: Dict, kind: str, prompt: str, max_new_tokens: int, repeats: int) -> Tuple[List[int], List[float]]:
+    """Gera de forma determinística (greedy), medindo cada repetição."""
+    inputs = loaded['tokenizer'](prompt, return_tensors="pt")
+    latencies = []
+    # A primeira execução (aquecimento) não entra nas medições
+    for attempt in range(repeats + 1):
+        start = time.perf_counter()
+        with _inference_context():
+            output = loaded['model'].generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False)
+        if attempt:
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    tokens = output[0].tolist() if hasattr(output[0], 'tolist') else list(output[0])
+    if kind == 'causal':
+        tokens = tokens[len(inputs['input_ids'][0]):]
+    return tokens, latencies
+
+def token_agreement(reference: List[int], tokens: List[int]) -> float:
+    """Fração das posições em que os tokens gerados coincidem com a referência."""
+    length = max(len(reference), len(tokens))
+    if length == 0:
+        return 1.0
+    return sum(a == b for a, b in zip(reference, tokens)) / length
+
+def compare_backends(key: str,
+                     prompts: Iterable[str],
+                     backends: Iterable[str] = BACKENDS,
+                     max_new_tokens: int = 40,
+                     repeats: int = 3,
+                     loader: Callable[[str, str], Dict] = load_text_model) -> Dict[str, Dict]:
+    """Compara latência, memória e fidelidade dos backends de um modelo.
+
+    O primeiro backend é a referência: para os demais, ``token_agreement``
+    e ``exact_match`` medem o quanto a geração greedy se afasta dela.
+    """
+    kind = TEXT_MODELS[key][1]
+    prompts = list(prompts)
+    results = {}
+    reference = None
+
+    for backend in backends:
+        memory_before = _rss_mb()
+        start = time.perf_counter()
+        loaded = loader(key, backend)
+        load_time = time.perf_counter() - start
+
+        outputs, latencies = [], []
+        for prompt in prompts:
+            tokens, prompt_latencies = _generate(loaded, kind, prompt, max_new_tokens, repeats)
+            outputs.append(tokens)
+            latencies.extend(prompt_latencies)
+        memory_after = _rss_mb()
+
+        if reference is None:
+            reference = outputs
+        agreements = [token_agreement(ref, out) for ref, out in zip(reference, outputs)]
+        results[backend] = {
+            "backend": loaded.get('backend', backend),
+            "load_s": load_time,
+            "latency_mean_ms": statistics.mean(latencies) if latencies else None,
+            "latency_p95_ms": _percentile(latencies, 95),
+            "memory_mb": (memory_after - memory_before
+                          if memory_before is not None and memory_after is not None else None),
+            "token_agreement": statistics.mean(agreements) if agreements else None,
+            "exact_match": (sum(ref == out for ref, out in zip(reference, outputs)) / len(outputs)
+                            if outputs else None)
+        }
+
+        del loaded
+        gc.collect()
+    return results
+
+def _percentile(values: List[float], percentile: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(percentile / 100 * (len(ordered) - 1)))
+    return ordered[index]
@@ -0,0 +1,229 @@
+import re
+import json
+import zlib
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config.system_config import INTENT_CLASSIFIER_CONFIG
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+class IntentClassifier:
+    """Classificador de intenções leve: TF-IDF com hashing e cabeça linear.
+
+    É treinado com as classificações do modelo zero-shot registradas em
+    ``log_path`` (só as ``max_log_examples`` mais recentes são mantidas) e
+    responde em menos de um milissegundo. Quem o usa só deve
+    aceitar a resposta quando ``confianca`` passar do limiar configurado,
+    recorrendo ao zero-shot nos demais casos.
+    """
+
+    def __init__(self,
+                 model_path: Path = None,
+                 log_path: Path = None,
+                 n_features: int = None):
+        self.logger = logging.getLogger('IntentClassifier')
+        self.model_path = Path(model_path or INTENT_CLASSIFIER_CONFIG['model_path'])
+        self.log_path = Path(log_path or INTENT_CLASSIFIER_CONFIG['log_path'])
+        self.n_features = n_features or INTENT_CLASSIFIER_CONFIG.get('n_features', 2 ** 14)
+        self.labels: List[str] = []
+        self.idf: Optional[np.ndarray] = None
+        self.weights: Optional[np.ndarray] = None
+        self.bias: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._log_lines: Optional[int] = None
+        self._logged_since_training = 0
+        self._training = False
+        self.load()
+
+    @property
+    def trained(self) -> bool:
+        return self.weights is not None
+
+    def _hashed_terms(self, texto: str) -> List[int]:
+        """Índices das palavras e bigramas do texto (crc32, estável entre processos)."""
+        tokens = _TOKEN.findall(texto.lower())
+        terms = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return [zlib.crc32(term.encode()) % self.n_features for term in terms]
+
+    def _vectorize(self, textos: List[str], idf: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Vetores TF-IDF normalizados em formato esparso (linhas, índices, valores)."""
+        rows, indices, values = [], [], []
+        for row, texto in enumerate(textos):
+            terms, counts = np.unique(self._hashed_terms(texto), return_counts=True)
+            if len(terms) == 0:
+                continue
+            weights = counts * idf[terms]
+            weights /= np.linalg.norm(weights) or 1.0
+            rows.append(np.full(len(terms), row))
+            indices.append(terms)
+            values.append(weights)
+        if not rows:
+            empty = np.zeros(0)
+            return empty.astype(int), empty.astype(int), empty
+        return np.concatenate(rows), np.concatenate(indices), np.concatenate(values)
+
+    def _logits(self, n: int, rows, indices, values, weights, bias) -> np.ndarray:
+        # Produto esparso por classe; bincount é bem mais rápido que np.add.at
+        contributions = values[:, None] * weights[indices]
+        logits = np.stack([
+            np.bincount(rows, weights=contributions[:, c], minlength=n)
+            for c in range(len(bias))
+        ], axis=1)
+        return logits + bias
+
+    def predict(self, texto: str) -> Optional[Dict]:
+        """Classifica um texto; retorna None se o modelo ainda não foi treinado."""
+        with self._lock:
+            if not self.trained:
+                return None
+            labels, idf, weights, bias = self.labels, self.idf, self.weights, self.bias
+
+        rows, indices, values = self._vectorize([texto], idf)
+        logits = self._logits(1, rows, indices, values, weights, bias)[0]
+        probs = np.exp(logits - logits.max())
+        probs /= probs.sum()
+        best = int(probs.argmax())
+        return {"intencao": labels[best], "confianca": float(probs[best])}
+
+    def log(self, texto: str, intencao: str, confianca: float):
+        """Registra uma classificação do zero-shot como exemplo de treino."""
+        with self._log_lock:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            if self._log_lines is None:
+                self._log_lines = self._count_log_lines()
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"texto": texto, "intencao": intencao, "confianca": confianca},
+                                   ensure_ascii=False) + "\n")
+            self._log_lines += 1
+
+            # Reescreve o log com folga de 25%, para não copiar o arquivo a cada exemplo
+            max_examples = INTENT_CLASSIFIER_CONFIG.get('max_log_examples')
+            if max_examples and self._log_lines > max_examples * 1.25:
+                self._truncate_log(max_examples)
+
+        self._logged_since_training += 1
+        retrain_every = INTENT_CLASSIFIER_CONFIG.get('retrain_every', 200)
+        if retrain_every and self._logged_since_training >= retrain_every and not self._training:
+            self._training = True
+            threading.Thread(target=self._train_in_background, name='IntentTraining', daemon=True).start()
+
+    def _count_log_lines(self) -> int:
+        if not self.log_path.exists():
+            return 0
+        with open(self.log_path, 'rb') as f:
+            return sum(1 for _ in f)
+
+    def _truncate_log(self, keep: int):
+        """Mantém só as ``keep`` últimas linhas do log (com ``_log_lock``)."""
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            lines = deque(f, maxlen=keep)
+        tmp_path = self.log_path.with_name(self.log_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+        tmp_path.replace(self.log_path)
+        self._log_lines = len(lines)
+
+    def _train_in_background(self):
+        try:
+            self.train()
+        except Exception as e:
+            self.logger.error(f"Erro ao treinar classificador de intenções: {str(e)}")
+        finally:
+            self._training = False
+
+    def _load_examples(self) -> Tuple[List[str], List[str]]:
+        min_confidence = INTENT_CLASSIFIER_CONFIG.get('min_training_confidence', 0.5)
+        textos, intencoes = [], []
+        if not self.log_path.exists():
+            return textos, intencoes
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    example = json.loads(line)
+                except ValueError:
+                    continue
+                if example.get("confianca", 0) >= min_confidence:
+                    textos.append(example["texto"])
+                    intencoes.append(example["intencao"])
+        return textos, intencoes
+
+    def train(self, textos: Iterable[str] = None, intencoes: Iterable[str] = None,
+              epochs: int = 200, learning_rate: float = 2.0, l2: float = 1e-4) -> bool:
+        """Treina a regressão logística (softmax) com os exemplos registrados.
+
+        Retorna False se ainda não há exemplos suficientes.
+        """
+        if textos is None:
+            textos, intencoes = self._load_examples()
+        textos, intencoes = list(textos), list(intencoes)
+        labels = sorted(set(intencoes))
+        if len(textos) < INTENT_CLASSIFIER_CONFIG.get('min_examples', 50) or len(labels) < 2:
+            return False
+
+        # IDF suavizado sobre os termos com hashing
+        df = np.zeros(self.n_features)
+        for texto in textos:
+            df[np.unique(self._hashed_terms(texto))] += 1
+        idf = np.log((1 + len(textos)) / (1 + df)) + 1
+
+        n = len(textos)
+        rows, indices, values = self._vectorize(textos, idf)
+        targets = np.zeros((n, len(labels)))
+        targets[np.arange(n), [labels.index(intencao) for intencao in intencoes]] = 1
+
+        weights = np.zeros((self.n_features, len(labels)))
+        bias = np.zeros(len(labels))
+        for _ in range(epochs):
+            logits = self._logits(n, rows, indices, values, weights, bias)
+            probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probs /= probs.sum(axis=1, keepdims=True)
+            error = (probs - targets) / n
+
+            contributions = values[:, None] * error[rows]
+            gradient = l2 * weights + np.stack([
+                np.bincount(indices, weights=contributions[:, c], minlength=self.n_features)
+                for c in range(len(labels))
+            ], axis=1)
+            weights -= learning_rate * gradient
+            bias -= learning_rate * error.sum(axis=0)
+
+        with self._lock:
+            self.labels, self.idf, self.weights, self.bias = labels, idf, weights, bias
+            self._logged_since_training = 0
+        self.save()
+        self.logger.info(f"Classificador de intenções treinado com {n} exemplos")
+        return True
+
+    def save(self):
+        with self._lock:
+            if not self.trained:
+                return
+            self.model_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.model_path.with_name(self.model_path.stem + '.tmp.npz')
+            np.savez_compressed(tmp_path, labels=np.array(self.labels), idf=self.idf,
+                                weights=self.weights.astype(np.float32), bias=self.bias)
+            tmp_path.replace(self.model_path)
+
+    def load(self) -> bool:
+        if not self.model_path.exists():
+            return False
+        try:
+            with np.load(self.model_path) as data:
+                if data['idf'].shape[0] != self.n_features:
+                    return False
+                with self._lock:
+                    self.labels = [str(label) for label in data['labels']]
+                    self.idf = data['idf']
+                    self.weights = data['weights'].astype(np.float64)
+                    self.bias = data['bias']
+            return True
+        except Exception as e:
+            self.logger.error(f"Erro ao carregar classificador de intenções: {str(e)}")
+            return False
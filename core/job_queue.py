@@ -0,0 +1,162 @@
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+class JobQueue:
+    """Fila persistente de jobs com prioridade, em SQLite.
+
+    Jobs de maior ``priority`` saem primeiro e, na mesma prioridade, os mais
+    antigos. Um job que falhou volta para a fila com ``not_before`` no
+    futuro (backoff). Jobs que estavam ``running`` quando o processo caiu
+    voltam para ``pending`` em ``recover``.
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                not_before REAL NOT NULL DEFAULT 0,
+                created REAL NOT NULL,
+                updated REAL NOT NULL,
+                error TEXT,
+                result TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_ready
+                ON jobs (status, priority DESC, created);
+        """)
+
+    def enqueue(self, job_id: str, payload: Dict, priority: int = 0):
+        """Adiciona um job à fila."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs "
+                "(id, priority, status, payload, attempts, not_before, created, updated) "
+                "VALUES (?, ?, ?, ?, 0, 0, ?, ?)",
+                (job_id, priority, self.PENDING, json.dumps(payload), now, now)
+            )
+            self._conn.commit()
+
+    def claim(self) -> Optional[Dict]:
+        """Retira o próximo job pronto, marcando-o como em execução."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = ? AND not_before <= ? "
+                "ORDER BY priority DESC, created LIMIT 1",
+                (self.PENDING, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                (self.RUNNING, now, row['id'])
+            )
+            self._conn.commit()
+
+        job = self._to_dict(row)
+        job['status'] = self.RUNNING
+        job['attempts'] += 1
+        return job
+
+    def complete(self, job_id: str, result: Dict = None):
+        self._update(job_id, self.COMPLETED, result=json.dumps(result, default=str))
+
+    def fail(self, job_id: str, error: str, retry_in: float = None):
+        """Registra uma falha; com ``retry_in`` o job volta para a fila."""
+        if retry_in is None:
+            self._update(job_id, self.FAILED, error=error)
+        else:
+            self._update(job_id, self.PENDING, error=error, not_before=time.time() + retry_in)
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """Cancela um job não finalizado; retorna o status anterior."""
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row['status'] in (self.PENDING, self.RUNNING):
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, updated = ? WHERE id = ?",
+                    (self.CANCELLED, time.time(), job_id)
+                )
+                self._conn.commit()
+            return row['status']
+
+    def recover(self) -> int:
+        """Devolve à fila os jobs interrompidos por uma queda do processo."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, updated = ? WHERE status = ?",
+                (self.PENDING, time.time(), self.RUNNING)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def next_ready_in(self) -> Optional[float]:
+        """Segundos até o próximo job pendente ficar pronto (None se não há)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(not_before) FROM jobs WHERE status = ?", (self.PENDING,)
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def list(self, status: str = None) -> List[Dict]:
+        with self._lock:
+            if status:
+                rows = self._conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY priority DESC, created", (status,)
+                ).fetchall()
+            else:
+                rows = self._conn.execute("SELECT * FROM jobs ORDER BY created").fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def _update(self, job_id: str, status: str, **fields):
+        """Finaliza um job em execução (jobs cancelados não são sobrescritos)."""
+        fields['status'] = status
+        fields['updated'] = time.time()
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND status = ?",
+                (*fields.values(), job_id, self.RUNNING)
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def _to_dict(row) -> Dict:
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        if job.get('result'):
+            job['result'] = json.loads(job['result'])
+        return job
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
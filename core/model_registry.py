@@ -0,0 +1,214 @@
+import gc
+import sys
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from config.system_config import MODEL_REGISTRY_CONFIG
+
+from .inference_backends import load_text_model
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+@dataclass
+class _ModelEntry:
+    loader: Callable[[], Any]
+    instance: Any = None
+    last_used: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+class ModelRegistry:
+    """Registro de modelos do processo, carregados sob demanda.
+
+    Cada modelo é registrado com uma função de carga e só é carregado no
+    primeiro ``get``; a mesma instância é compartilhada por todos os
+    componentes. Modelos sem uso há mais de ``idle_timeout`` segundos são
+    descarregados quando a memória do processo passa de ``max_memory_mb``
+    (sem limite configurado, apenas por inatividade). Quem usa um modelo
+    deve buscá-lo no registro a cada uso, sem guardar a referência, para
+    que o descarregamento libere a memória.
+    """
+
+    def __init__(self,
+                 idle_timeout: float = None,
+                 max_memory_mb: Optional[int] = None,
+                 check_interval: float = None):
+        self.logger = logging.getLogger('ModelRegistry')
+        self.idle_timeout = idle_timeout if idle_timeout is not None else MODEL_REGISTRY_CONFIG.get('idle_timeout', 900)
+        self.max_memory_mb = max_memory_mb if max_memory_mb is not None else MODEL_REGISTRY_CONFIG.get('max_memory_mb')
+        self.check_interval = check_interval if check_interval is not None else MODEL_REGISTRY_CONFIG.get('check_interval', 60)
+        self._entries: Dict[str, _ModelEntry] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._monitor_thread = None
+
+    def register(self, name: str, loader: Callable[[], Any], replace: bool = False):
+        """Registra a função de carga de um modelo."""
+        with self._lock:
+            if name in self._entries and not replace:
+                return
+            self._entries[name] = _ModelEntry(loader)
+
+    def get(self, name: str) -> Any:
+        """Retorna o modelo, carregando-o no primeiro uso."""
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Modelo não registrado: {name}")
+
+        entry.last_used = time.monotonic()
+        if entry.instance is None:
+            with entry.lock:
+                if entry.instance is None:
+                    start = time.perf_counter()
+                    self.logger.info(f"Carregando modelo {name}...")
+                    entry.instance = entry.loader()
+                    self.logger.info(f"Modelo {name} carregado em {time.perf_counter() - start:.1f}s")
+            self._ensure_monitor()
+        return entry.instance
+
+    def is_loaded(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and entry.instance is not None
+
+    def loaded(self) -> List[str]:
+        return [name for name, entry in self._entries.items() if entry.instance is not None]
+
+    def unload(self, name: str) -> bool:
+        """Descarrega um modelo; ele volta a ser carregado no próximo uso."""
+        entry = self._entries.get(name)
+        if entry is None or entry.instance is None:
+            return False
+        with entry.lock:
+            entry.instance = None
+        gc.collect()
+        self._release_accelerator_memory()
+        self.logger.info(f"Modelo {name} descarregado")
+        return True
+
+    def unload_idle(self, max_idle: float = None) -> List[str]:
+        """Descarrega modelos sem uso há mais de ``max_idle`` segundos, do mais antigo ao mais recente."""
+        max_idle = self.idle_timeout if max_idle is None else max_idle
+        now = time.monotonic()
+        idle = sorted(
+            (entry.last_used, name) for name, entry in self._entries.items()
+            if entry.instance is not None and now - entry.last_used >= max_idle
+        )
+
+        unloaded = []
+        for _, name in idle:
+            if self.max_memory_mb is not None and not self.under_pressure():
+                break
+            if self.unload(name):
+                unloaded.append(name)
+        return unloaded
+
+    def under_pressure(self) -> bool:
+        """Indica se a memória do processo passou do limite configurado."""
+        if self.max_memory_mb is None:
+            return True
+        usage = self.memory_usage_mb()
+        # Sem como medir (psutil ausente), vale apenas a inatividade
+        return usage is None or usage > self.max_memory_mb
+
+    @staticmethod
+    def memory_usage_mb() -> Optional[float]:
+        if psutil is None:
+            return None
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+
+    @staticmethod
+    def _release_accelerator_memory():
+        torch = sys.modules.get('torch')
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def _ensure_monitor(self):
+        if not self.check_interval or (self._monitor_thread and self._monitor_thread.is_alive()):
+            return
+        self._monitor_thread = threading.Thread(
+            target=self._monitor_loop, name='ModelRegistryMonitor', daemon=True
+        )
+        self._monitor_thread.start()
+
+    def _monitor_loop(self):
+        while not self._stop_event.wait(self.check_interval):
+            try:
+                self.unload_idle()
+            except Exception as e:
+                self.logger.error(f"Erro ao descarregar modelos ociosos: {str(e)}")
+
+    def close(self):
+        self._stop_event.set()
+
+def _load_spacy_pt():
+    import spacy
+    return spacy.load("pt_core_news_lg")
+
+def _load_dialogpt():
+    return load_text_model("dialogpt")
+
+def _load_t5_base():
+    return load_text_model("t5_base")
+
+def _load_zero_shot():
+    from transformers import pipeline
+    return pipeline("zero-shot-classification")
+
+def _load_gpt2_medium():
+    from transformers import pipeline
+    loaded = load_text_model("gpt2_medium")
+    return pipeline('text-generation', model=loaded["model"], tokenizer=loaded["tokenizer"])
+
+def _load_detr():
+    from transformers import DetrImageProcessor, DetrForObjectDetection
+    return {
+        "processor": DetrImageProcessor.from_pretrained("facebook/detr-resnet-50"),
+        "model": DetrForObjectDetection.from_pretrained("facebook/detr-resnet-50")
+    }
+
+def _load_image_captioning():
+    from transformers import VisionEncoderDecoderModel, ViTImageProcessor, AutoTokenizer
+    name = "nlpconnect/vit-gpt2-image-captioning"
+    return {
+        "model": VisionEncoderDecoderModel.from_pretrained(name),
+        "feature_extractor": ViTImageProcessor.from_pretrained(name),
+        "tokenizer": AutoTokenizer.from_pretrained(name)
+    }
+
+def causal_lm_loader(name: str, **kwargs) -> Callable[[], Dict]:
+    """Cria a função de carga de um modelo causal do Hugging Face."""
+    def load():
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+        return {
+            "model": AutoModelForCausalLM.from_pretrained(name, **kwargs),
+            "tokenizer": AutoTokenizer.from_pretrained(name)
+        }
+    return load
+
+_DEFAULT_MODELS = {
+    "spacy_pt": _load_spacy_pt,
+    "dialogpt": _load_dialogpt,
+    "t5_base": _load_t5_base,
+    "zero_shot": _load_zero_shot,
+    "gpt2_medium": _load_gpt2_medium,
+    "detr": _load_detr,
+    "image_captioning": _load_image_captioning
+}
+
+_default_registry = None
+_default_lock = threading.Lock()
+
+def get_model_registry() -> ModelRegistry:
+    """Retorna o registro de modelos compartilhado do processo."""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = ModelRegistry()
+            for name, loader in _DEFAULT_MODELS.items():
+                _default_registry.register(name, loader)
+        return _default_registry
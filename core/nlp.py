@@ -1,37 +1,52 @@
-import torch
-from transformers import (
-    AutoModelForCausalLM,
-    AutoTokenizer,
-    pipeline,
-    T5ForConditionalGeneration,
-    T5Tokenizer
-)
-import spacy
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 from nltk.sentiment import SentimentIntensityAnalyzer
 import re
 import json
+import time
+import atexit
+import weakref
+from collections import OrderedDict
+from itertools import chain
 from pathlib import Path
 
+import numpy as np
+
+from config.system_config import INTENT_CLASSIFIER_CONFIG, VECTOR_INDEX_CONFIG
+
+from .model_registry import get_model_registry
+from .intent_classifier import IntentClassifier
+from .vector_index import VectorIndex
+
+def _gravar_conversas_pendentes(referencia):
+    processador = referencia()
+    if processador is not None:
+        processador.indexar_conversas()
+
 class ProcessadorLinguagem:
-    def __init__(self):
-        # Carrega modelos e recursos
-        self.nlp = spacy.load("pt_core_news_lg")
+    INTENCOES = [
+        "pergunta",
+        "comando",
+        "informação",
+        "cumprimento",
+        "despedida",
+        "agradecimento",
+        "reclamação"
+    ]
+
+    def __init__(self, modelos=None, classificador_rapido=None):
+        # Modelos pesados (spaCy, DialoGPT, T5, zero-shot) vêm do registro
+        # compartilhado e só são carregados no primeiro uso
+        self.modelos = modelos or get_model_registry()
+
+        # Primeiro estágio da classificação de intenções, treinado com as
+        # respostas do zero-shot
+        if classificador_rapido is None and INTENT_CLASSIFIER_CONFIG.get('enabled', True):
+            classificador_rapido = IntentClassifier()
+        self.classificador_rapido = classificador_rapido
         self.sentiment_analyzer = SentimentIntensityAnalyzer()
         self.stop_words = set(stopwords.words('portuguese'))
         
-        # Carrega modelo de geração de texto
-        self.modelo_conversa = self._carregar_modelo_conversa()
-        self.tokenizer_conversa = AutoTokenizer.from_pretrained("microsoft/DialoGPT-medium")
-        
-        # Modelo T5 para tarefas específicas
-        self.t5_model = T5ForConditionalGeneration.from_pretrained("t5-base")
-        self.t5_tokenizer = T5Tokenizer.from_pretrained("t5-base")
-        
-        # Pipeline de classificação de intenções
-        self.classificador_intencoes = pipeline("zero-shot-classification")
-        
         # Histórico de conversas
         self.historico = []
         self.max_historico = 10
@@ -39,13 +54,45 @@ class ProcessadorLinguagem:
         # Carrega base de conhecimento
         self.conhecimento = self._carregar_conhecimento()
 
-    def _carregar_modelo_conversa(self):
-        """Carrega o modelo de conversação"""
-        try:
-            return AutoModelForCausalLM.from_pretrained("microsoft/DialoGPT-medium")
-        except Exception as e:
-            print(f"Erro ao carregar modelo de conversação: {e}")
-            return None
+        # Índice vetorial (criado no primeiro uso) e vetores de textos já vistos
+        self._indice = None
+        self._vetores_cache = OrderedDict()
+
+        # Mensagens de conversa ainda não gravadas no índice
+        self._conversas_pendentes = []
+        atexit.register(_gravar_conversas_pendentes, weakref.ref(self))
+
+    @property
+    def nlp(self):
+        return self.modelos.get("spacy_pt")
+
+    @property
+    def modelo_conversa(self):
+        return self.modelos.get("dialogpt")["model"]
+
+    @property
+    def tokenizer_conversa(self):
+        return self.modelos.get("dialogpt")["tokenizer"]
+
+    @property
+    def t5_model(self):
+        return self.modelos.get("t5_base")["model"]
+
+    @property
+    def t5_tokenizer(self):
+        return self.modelos.get("t5_base")["tokenizer"]
+
+    @property
+    def classificador_intencoes(self):
+        return self.modelos.get("zero_shot")
+
+    @property
+    def indice(self):
+        """Índice vetorial da base de conhecimento e das conversas"""
+        if self._indice is None:
+            self._indice = VectorIndex()
+            self._indexar_conhecimento()
+        return self._indice
 
     def _carregar_conhecimento(self):
         """Carrega a base de conhecimento do assistente"""
@@ -63,20 +110,41 @@ class ProcessadorLinguagem:
         """Processa a entrada do usuário"""
         # Análise básica
         doc = self.nlp(texto)
-        
+        return self._analisar_doc(doc, self.classificar_intencao(texto))
+
+    def processar_entradas(self, textos, batch_size=32, n_process=1):
+        """Processa vários textos em lote, gerando uma análise por texto.
+
+        O spaCy processa os textos com ``nlp.pipe`` e o classificador de
+        intenções recebe cada lote de uma vez. Os resultados saem na ordem
+        de entrada, à medida que cada lote fica pronto.
+        """
+        lote = []
+        for doc in self.nlp.pipe(textos, batch_size=batch_size, n_process=n_process):
+            lote.append(doc)
+            if len(lote) >= batch_size:
+                yield from self._analisar_lote(lote, batch_size)
+                lote = []
+        if lote:
+            yield from self._analisar_lote(lote, batch_size)
+
+    def _analisar_lote(self, docs, batch_size):
+        intencoes = self.classificar_intencoes([doc.text for doc in docs], batch_size=batch_size)
+        for doc, intencao in zip(docs, intencoes):
+            yield self._analisar_doc(doc, intencao)
+
+    def _analisar_doc(self, doc, intencao):
         # Extrai informações
-        analise = {
-            "texto_original": texto,
+        return {
+            "texto_original": doc.text,
             "tokens": [token.text for token in doc],
             "entidades": [(ent.text, ent.label_) for ent in doc.ents],
-            "sentimento": self.analisar_sentimento(texto),
-            "intencao": self.classificar_intencao(texto),
+            "sentimento": self.analisar_sentimento(doc.text),
+            "intencao": intencao,
             "tempo_verbal": self._identificar_tempo_verbal(doc),
             "substantivos": [token.text for token in doc if token.pos_ == "NOUN"],
             "verbos": [token.text for token in doc if token.pos_ == "VERB"]
         }
-        
-        return analise
 
     def analisar_sentimento(self, texto):
         """Analisa o sentimento do texto"""
@@ -96,22 +164,59 @@ class ProcessadorLinguagem:
         }
 
     def classificar_intencao(self, texto):
-        """Classifica a intenção do usuário"""
-        intencoes = [
-            "pergunta",
-            "comando",
-            "informação",
-            "cumprimento",
-            "despedida",
-            "agradecimento",
-            "reclamação"
-        ]
-        
-        resultado = self.classificador_intencoes(texto, intencoes)
-        return {
+        """Classifica a intenção do usuário.
+
+        O modelo leve responde os casos em que está confiante; os demais vão
+        para o zero-shot, cujo resultado é registrado para o próximo treino.
+        """
+        rapido = self._classificar_rapido(texto)
+        if rapido is not None:
+            return rapido
+
+        resultado = self.classificador_intencoes(texto, self.INTENCOES)
+        return self._registrar_zero_shot(texto, resultado)
+
+    def classificar_intencoes(self, textos, batch_size=16):
+        """Classifica a intenção de vários textos numa só chamada ao modelo"""
+        textos = list(textos)
+        if not textos:
+            return []
+
+        classificacoes = [self._classificar_rapido(texto) for texto in textos]
+        pendentes = [i for i, classificacao in enumerate(classificacoes) if classificacao is None]
+        if pendentes:
+            resultados = self.classificador_intencoes(
+                [textos[i] for i in pendentes], self.INTENCOES, batch_size=batch_size
+            )
+            if isinstance(resultados, dict):
+                resultados = [resultados]
+            for i, resultado in zip(pendentes, resultados):
+                classificacoes[i] = self._registrar_zero_shot(textos[i], resultado)
+        return classificacoes
+
+    def _classificar_rapido(self, texto):
+        """Resposta do modelo leve, ou None se ele não estiver confiante"""
+        if self.classificador_rapido is None:
+            return None
+        classificacao = self.classificador_rapido.predict(texto)
+        if classificacao is None or classificacao["confianca"] < INTENT_CLASSIFIER_CONFIG["confidence_threshold"]:
+            return None
+        return classificacao
+
+    def _registrar_zero_shot(self, texto, resultado):
+        classificacao = {
             "intencao": resultado["labels"][0],
             "confianca": resultado["scores"][0]
         }
+        if self.classificador_rapido is not None:
+            self.classificador_rapido.log(texto, classificacao["intencao"], classificacao["confianca"])
+        return classificacao
+
+    def treinar_classificador_intencoes(self):
+        """Treina o modelo leve com as classificações registradas do zero-shot"""
+        if self.classificador_rapido is None:
+            return False
+        return self.classificador_rapido.train()
 
     def gerar_resposta(self, texto, contexto=None):
         """Gera uma resposta baseada no texto de entrada e contexto"""
@@ -119,6 +224,10 @@ class ProcessadorLinguagem:
         self.historico.append(texto)
         if len(self.historico) > self.max_historico:
             self.historico.pop(0)
+        if VECTOR_INDEX_CONFIG.get('index_conversations', True):
+            self._conversas_pendentes.append((f"conversa:{time.time_ns()}", texto, {"contexto": contexto}))
+            if len(self._conversas_pendentes) >= VECTOR_INDEX_CONFIG.get('conversation_batch_size', 16):
+                self.indexar_conversas()
         
         # Prepara o contexto
         if contexto:
@@ -158,7 +267,14 @@ class ProcessadorLinguagem:
 
     def extrair_palavras_chave(self, texto):
         """Extrai palavras-chave do texto"""
-        doc = self.nlp(texto)
+        return self._palavras_chave_doc(self.nlp(texto))
+
+    def extrair_palavras_chave_lote(self, textos, batch_size=64, n_process=1):
+        """Extrai palavras-chave de vários textos, gerando uma lista por texto"""
+        for doc in self.nlp.pipe(textos, batch_size=batch_size, n_process=n_process):
+            yield self._palavras_chave_doc(doc)
+
+    def _palavras_chave_doc(self, doc):
         palavras = []
         
         for token in doc:
@@ -198,12 +314,71 @@ class ProcessadorLinguagem:
         if tipo in self.conhecimento:
             self.conhecimento[tipo][chave] = valor
             self._salvar_conhecimento()
+            if self._indice is not None:
+                self._indice.add_many(self._entradas_conhecimento([(tipo, chave, valor)]))
             return True
         return False
 
-    def buscar_conhecimento(self, tipo, chave):
-        """Busca informação na base de conhecimento"""
-        return self.conhecimento.get(tipo, {}).get(chave)
+    def buscar_conhecimento(self, tipo, chave, semantico=False):
+        """Busca informação na base de conhecimento.
+
+        Com ``semantico``, uma chave ausente é trocada pela mais parecida
+        do mesmo tipo no índice vetorial.
+        """
+        valor = self.conhecimento.get(tipo, {}).get(chave)
+        if valor is None and semantico:
+            resultados = self.buscar_semelhantes(chave, k=1, fonte=tipo)
+            if resultados:
+                valor = self.conhecimento[tipo].get(resultados[0]["metadados"]["chave"])
+        return valor
+
+    def buscar_semelhantes(self, texto, k=5, fonte=None):
+        """Busca os ``k`` itens do conhecimento e das conversas mais parecidos com o texto.
+
+        ``fonte`` restringe a um tipo de conhecimento ou a ``"conversa"``.
+        """
+        self.indexar_conversas()
+        return self.indice.search(self._vetores([texto])[0], k=k, source=fonte)
+
+    def indexar_conversas(self):
+        """Grava no índice, numa só escrita, as mensagens de conversa pendentes.
+
+        Em seguida descarta as mensagens além de ``max_conversations`` ou
+        mais antigas que ``conversation_ttl``.
+        """
+        if not self._conversas_pendentes:
+            return
+        pendentes, self._conversas_pendentes = self._conversas_pendentes, []
+        vetores = self._vetores([texto for _, texto, _ in pendentes])
+        self.indice.add_many(
+            (doc_id, vetor, texto, "conversa", metadados)
+            for (doc_id, texto, metadados), vetor in zip(pendentes, vetores)
+        )
+        self.indice.prune("conversa",
+                          max_entries=VECTOR_INDEX_CONFIG.get('max_conversations'),
+                          max_age=VECTOR_INDEX_CONFIG.get('conversation_ttl'))
+
+    def _indexar_conhecimento(self):
+        """Indexa as entradas da base de conhecimento que ainda não estão no índice"""
+        faltando = [
+            (tipo, chave, valor)
+            for tipo, entradas in self.conhecimento.items()
+            for chave, valor in entradas.items()
+            if f"{tipo}:{chave}" not in self._indice
+        ]
+        if faltando:
+            self._indice.add_many(self._entradas_conhecimento(faltando))
+
+    def _entradas_conhecimento(self, itens):
+        textos = [
+            f"{chave}: {valor if isinstance(valor, str) else json.dumps(valor, ensure_ascii=False)}"
+            for _, chave, valor in itens
+        ]
+        vetores = self._vetores(textos)
+        return [
+            (f"{tipo}:{chave}", vetor, texto, tipo, {"chave": chave})
+            for (tipo, chave, _), texto, vetor in zip(itens, textos, vetores)
+        ]
 
     def _salvar_conhecimento(self):
         """Salva a base de conhecimento em disco"""
@@ -213,11 +388,42 @@ class ProcessadorLinguagem:
         with open(conhecimento_path, 'w', encoding='utf-8') as f:
             json.dump(self.conhecimento, f, ensure_ascii=False, indent=4)
 
+    def _vetores(self, textos, batch_size=256):
+        """Vetores normalizados dos textos, guardados em cache.
+
+        O vetor de um Doc do spaCy é a média dos vetores estáticos dos tokens,
+        então basta o tokenizador; o pipeline completo não é executado.
+        """
+        textos = list(textos)
+        faltando = list(dict.fromkeys(texto for texto in textos if texto not in self._vetores_cache))
+        if faltando:
+            docs = self.nlp.tokenizer.pipe(faltando, batch_size=batch_size)
+            for texto, vetor in zip(faltando, VectorIndex.normalize([doc.vector for doc in docs])):
+                self._vetores_cache[texto] = vetor
+        vetores = []
+        for texto in textos:
+            self._vetores_cache.move_to_end(texto)
+            vetores.append(self._vetores_cache[texto])
+
+        while len(self._vetores_cache) > VECTOR_INDEX_CONFIG.get('cache_size', 2048):
+            self._vetores_cache.popitem(last=False)
+        return np.array(vetores)
+
     def analisar_similaridade(self, texto1, texto2):
         """Calcula a similaridade entre dois textos"""
-        doc1 = self.nlp(texto1)
-        doc2 = self.nlp(texto2)
-        return doc1.similarity(doc2)
+        vetor1, vetor2 = self._vetores([texto1, texto2])
+        return float(vetor1 @ vetor2)
+
+    def analisar_similaridades(self, pares, batch_size=256):
+        """Calcula a similaridade de vários pares (texto1, texto2), gerando uma por par"""
+        vetores = self._vetores(chain.from_iterable(pares), batch_size=batch_size)
+        for similaridade in np.einsum('ij,ij->i', vetores[0::2], vetores[1::2]):
+            yield float(similaridade)
+
+    def similaridades(self, texto, textos):
+        """Similaridade do texto com cada um dos textos, num só produto matriz-vetor"""
+        vetores = self._vetores([texto, *textos])
+        return (vetores[1:] @ vetores[0]).tolist()
 
     def corrigir_texto(self, texto):
         """Corrige erros básicos no texto"""
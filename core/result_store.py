@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+class ResultStore:
+    """Registro dos artefatos gerados, endereçados pelo hash da requisição.
+
+    A chave é o sha256 de (config do workflow, prompt, seed, ...); pedidos
+    determinísticos idênticos reaproveitam o arquivo existente. Cada
+    artefato tem uma contagem de referências: ``acquire`` incrementa,
+    ``release`` decrementa e ``collect_garbage`` apaga os arquivos sem
+    referências. Caminhos reservados com ``reserve`` cuja geração nunca foi
+    registrada (interrompida ou com erro) também são apagados; arquivos que
+    o store não criou nunca são tocados.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                path TEXT NOT NULL UNIQUE,
+                kind TEXT,
+                refcount INTEGER NOT NULL DEFAULT 1,
+                metadata TEXT,
+                created REAL NOT NULL,
+                released REAL
+            );
+            CREATE TABLE IF NOT EXISTS reservations (
+                path TEXT PRIMARY KEY,
+                created REAL NOT NULL
+            );
+        """)
+
+    @staticmethod
+    def make_key(workflow: Dict, prompt: str, seed: int, **extra) -> str:
+        """Gera a chave estável de uma requisição determinística."""
+        data = json.dumps({
+            "workflow": workflow,
+            "prompt": prompt,
+            "seed": seed,
+            "extra": extra
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def acquire(self, key: str) -> Optional[Dict]:
+        """Retorna o artefato da chave, somando uma referência.
+
+        Entradas cujo arquivo sumiu do disco são descartadas.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if not os.path.exists(row['path']):
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE results SET refcount = refcount + 1, released = NULL WHERE key = ?", (key,)
+            )
+            self._conn.commit()
+        return self._to_dict(row, refcount=row['refcount'] + 1)
+
+    def reserve(self, path: str):
+        """Marca um caminho de saída antes da geração, para a coleta de lixo."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reservations (path, created) VALUES (?, ?)",
+                (str(path), time.time())
+            )
+            self._conn.commit()
+
+    def register(self, key: str, path: str, kind: str = None, metadata: Dict = None):
+        """Registra um artefato recém-gerado com uma referência.
+
+        Se a chave já existir, as referências atuais são mantidas e somadas
+        à nova.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO results (key, path, kind, refcount, metadata, created) "
+                "VALUES (?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET path = excluded.path, kind = excluded.kind, "
+                "metadata = excluded.metadata, refcount = refcount + 1, released = NULL",
+                (key, str(path), kind, json.dumps(metadata or {}, default=str), time.time())
+            )
+            self._conn.execute("DELETE FROM reservations WHERE path = ?", (str(path),))
+            self._conn.commit()
+
+    def release(self, path: str) -> int:
+        """Remove uma referência do artefato; retorna as que restam."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE results SET refcount = MAX(refcount - 1, 0), "
+                "released = CASE WHEN refcount <= 1 THEN ? ELSE released END "
+                "WHERE path = ?",
+                (time.time(), str(path))
+            )
+            self._conn.commit()
+            row = self._conn.execute(
+                "SELECT refcount FROM results WHERE path = ?", (str(path),)
+            ).fetchone()
+        return row['refcount'] if row else 0
+
+    def collect_garbage(self, grace_period: float = 3600) -> List[str]:
+        """Apaga artefatos sem referências e reservas nunca registradas.
+
+        Só são removidos arquivos sem uso (ou reservados) há mais de
+        ``grace_period`` segundos, para não apagar saídas de gerações em
+        andamento.
+        """
+        deadline = time.time() - grace_period
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, path FROM results WHERE refcount = 0 AND released < ?", (deadline,)
+            ).fetchall()
+            for row in rows:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (row['key'],))
+            abandoned = self._conn.execute(
+                "SELECT path FROM reservations WHERE created < ?", (deadline,)
+            ).fetchall()
+            self._conn.execute("DELETE FROM reservations WHERE created < ?", (deadline,))
+            self._conn.commit()
+            known = {row['path'] for row in self._conn.execute("SELECT path FROM results")}
+
+        removed = []
+        for row in [*rows, *abandoned]:
+            # Uma reserva antiga pode ter sido reaproveitada por uma entrada válida
+            if row['path'] not in known and os.path.exists(row['path']):
+                os.remove(row['path'])
+                removed.append(os.path.abspath(row['path']))
+        return removed
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            total, referenced = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(refcount > 0), 0) FROM results"
+            ).fetchone()
+        return {"entries": total, "referenced": referenced, "orphaned": total - referenced}
+
+    @staticmethod
+    def _to_dict(row, **overrides) -> Dict:
+        result = dict(row, **overrides)
+        result['metadata'] = json.loads(result['metadata'] or '{}')
+        return result
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
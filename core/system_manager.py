@@ -13,7 +13,7 @@ from config.system_config import (
     LOG_CONFIG
 )
 
-from transformers import pipeline
+from .model_registry import get_model_registry
 
 class SystemManager:
     """Gerenciador principal do sistema."""
@@ -25,7 +25,7 @@ class SystemManager:
         self.task_analyzer = None
         self.running = False
         self.tasks = {}
-        self.model = None
+        self.modelos = get_model_registry()
         self.is_running = False
         
     def _setup_logging(self) -> logging.Logger:
@@ -41,6 +41,11 @@ class SystemManager:
         
         return logger
     
+    @property
+    def model(self):
+        """Pipeline de geração de texto, compartilhado pelo registro de modelos."""
+        return self.modelos.get("gpt2_medium")
+    
     async def start(self):
         """Inicia o sistema."""
         try:
@@ -53,8 +58,7 @@ class SystemManager:
             # Inicializa gerenciadores
             await self._initialize_managers()
             
-            # Inicializa o modelo usando pipeline
-            self.model = pipeline('text-generation', model='gpt2-medium')
+            # O modelo de texto (gpt2-medium) é carregado no primeiro uso
             self.is_running = True
             
             self.logger.info("Sistema iniciado com sucesso!")
@@ -67,8 +71,8 @@ class SystemManager:
     async def _start_comfy_ui(self):
         """Inicia o ComfyUI em background."""
         try:
-            from comfy_manager import ComfyUIManager
-            self.comfy_manager = ComfyUIManager()
+            from .comfy_pool import ComfyUIPool
+            self.comfy_manager = ComfyUIPool()
             success = await self.comfy_manager.start_async()
             
             if not success:
@@ -80,10 +84,11 @@ class SystemManager:
     
     async def _initialize_managers(self):
         """Inicializa os gerenciadores do sistema."""
-        from workflow_manager import WorkflowManager
-        from task_analyzer import TaskAnalyzer
+        from .workflow_manager import WorkflowManager
+        from .task_analyzer import TaskAnalyzer
         
         self.workflow_manager = WorkflowManager(self.comfy_manager)
+        await self.workflow_manager.start()
         self.task_analyzer = TaskAnalyzer()
     
     async def process_request(self, message: str, user_id: str = "admin") -> Dict:
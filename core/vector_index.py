@@ -0,0 +1,317 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from config.system_config import VECTOR_INDEX_CONFIG
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+class VectorIndex:
+    """Índice persistente de embeddings normalizados para busca semântica.
+
+    Os vetores ficam num arquivo float32 contínuo (uma linha por documento),
+    lido com ``np.memmap``; inserções só acrescentam ao final do arquivo.
+    Id, texto, fonte e metadados de cada linha ficam em SQLite. Como os
+    vetores são normalizados, a similaridade de cosseno com todos os
+    documentos é um único produto matriz-vetor. Com ``approximate`` e o
+    faiss instalado, índices grandes usam HNSW em vez da busca exata.
+    """
+
+    def __init__(self,
+                 directory: Path = None,
+                 approximate: bool = None,
+                 approximate_min_size: int = None):
+        self.logger = logging.getLogger('VectorIndex')
+        self.directory = Path(directory or VECTOR_INDEX_CONFIG['path'])
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.directory / 'vectors.f32'
+        self.approximate = VECTOR_INDEX_CONFIG.get('approximate', False) if approximate is None else approximate
+        self.approximate_min_size = (VECTOR_INDEX_CONFIG.get('approximate_min_size', 10000)
+                                     if approximate_min_size is None else approximate_min_size)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.directory / 'entries.sqlite3'), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS entries (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                text TEXT,
+                source TEXT,
+                metadata TEXT,
+                deleted INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_id ON entries (id, deleted);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        self.dim: Optional[int] = int(row['value']) if row else None
+        self._matrix = None
+        self._ann = None
+        self._load_state()
+
+    def _load_state(self):
+        """Carrega fontes e linhas ativas, descartando escritas incompletas."""
+        self._recover_compaction()
+        rows = self._conn.execute("SELECT row, id, source, deleted FROM entries ORDER BY row").fetchall()
+        if self.dim:
+            stored = self.vectors_path.stat().st_size // (self.dim * 4) if self.vectors_path.exists() else 0
+            if stored < len(rows):
+                # Entradas cujo vetor não chegou ao disco antes de uma queda
+                self._conn.execute("DELETE FROM entries WHERE row >= ?", (stored,))
+                self._conn.commit()
+                rows = rows[:stored]
+            elif stored > len(rows):
+                with open(self.vectors_path, 'r+b') as f:
+                    f.truncate(len(rows) * self.dim * 4)
+
+        self._sources = np.array([row['source'] or '' for row in rows], dtype=object)
+        self._alive = np.array([not row['deleted'] for row in rows], dtype=bool)
+        self._rows_by_id = {row['id']: row['row'] for row in rows if not row['deleted']}
+
+    def _recover_compaction(self):
+        """Conclui ou descarta uma compactação interrompida.
+
+        O marcador ``compaction`` em ``meta`` é gravado na mesma transação que
+        renumera as entradas. Sem ele, o banco ainda corresponde ao arquivo
+        antigo e o ``.tmp`` é descartado; com ele, o ``.tmp`` completo
+        substitui o arquivo antigo (se ainda não o fez).
+        """
+        tmp_path = self.vectors_path.with_suffix('.tmp')
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'compaction'").fetchone()
+        if row is None:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            return
+
+        expected = int(row['value']) * (self.dim or 0) * 4
+        if tmp_path.exists() and tmp_path.stat().st_size == expected:
+            os.replace(tmp_path, self.vectors_path)
+            self.logger.warning("Compactação interrompida do índice vetorial concluída")
+        elif tmp_path.exists():
+            # Não deveria ocorrer: o .tmp é gravado e sincronizado antes do marcador
+            self.logger.error("Arquivo temporário da compactação incompleto; descartado")
+            tmp_path.unlink()
+        self._conn.execute("DELETE FROM meta WHERE key = 'compaction'")
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        return len(self._rows_by_id)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._rows_by_id
+
+    @staticmethod
+    def normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def add(self, doc_id: str, vector, text: str = None, source: str = None, metadata: Dict = None):
+        """Adiciona um documento, substituindo o de mesmo id."""
+        self.add_many([(doc_id, vector, text, source, metadata)])
+
+    def add_many(self, items: Iterable):
+        """Adiciona vários documentos (id, vetor, texto, fonte, metadados) numa só escrita."""
+        # Ids repetidos no lote: vale a última ocorrência
+        items = list({item[0]: item for item in items}.values())
+        if not items:
+            return
+        vectors = self.normalize([item[1] for item in items])
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('dim', ?)", (str(self.dim),))
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Dimensão {vectors.shape[1]} diferente da do índice ({self.dim})")
+
+            # O vetor vai para o disco antes da entrada; em _load_state, entradas
+            # sem vetor são descartadas
+            with open(self.vectors_path, 'ab') as f:
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            first_row = len(self._alive)
+            now = time.time()
+            for offset, (doc_id, _, text, source, metadata) in enumerate(items):
+                self._mark_deleted(doc_id)
+                self._conn.execute(
+                    "INSERT INTO entries (row, id, text, source, metadata, created) VALUES (?, ?, ?, ?, ?, ?)",
+                    (first_row + offset, doc_id, text, source, json.dumps(metadata or {}, default=str), now)
+                )
+                self._rows_by_id[doc_id] = first_row + offset
+            self._conn.commit()
+
+            self._sources = np.concatenate([self._sources, np.array([item[3] or '' for item in items], dtype=object)])
+            self._alive = np.concatenate([self._alive, np.ones(len(items), dtype=bool)])
+            self._matrix = None
+
+    def remove(self, doc_id: str) -> bool:
+        with self._lock:
+            removed = self._mark_deleted(doc_id)
+            self._conn.commit()
+        return removed
+
+    def _mark_deleted(self, doc_id: str) -> bool:
+        row = self._rows_by_id.pop(doc_id, None)
+        if row is None:
+            return False
+        self._conn.execute("UPDATE entries SET deleted = 1 WHERE row = ?", (row,))
+        self._alive[row] = False
+        return True
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Matriz (linhas × dim) mapeada do disco, incluindo linhas removidas."""
+        with self._lock:
+            if self._matrix is None:
+                rows = len(self._alive)
+                if rows == 0 or self.dim is None:
+                    self._matrix = np.zeros((0, self.dim or 0), dtype=np.float32)
+                else:
+                    self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode='r',
+                                             shape=(rows, self.dim))
+            return self._matrix
+
+    def vector(self, doc_id: str) -> Optional[np.ndarray]:
+        """Vetor normalizado armazenado para o documento."""
+        row = self._rows_by_id.get(doc_id)
+        return None if row is None else np.array(self.matrix[row])
+
+    def search(self, vector, k: int = 5, source: str = None) -> List[Dict]:
+        """Retorna os ``k`` documentos mais similares, do mais ao menos similar."""
+        if not self._rows_by_id:
+            return []
+        query = self.normalize(vector)
+        with self._lock:
+            matrix, alive, sources = self.matrix, self._alive, self._sources
+
+        mask = alive if source is None else alive & (sources == source)
+        candidates = self._search_approximate(query, k, mask)
+        if candidates is None:
+            scores = matrix @ query
+            scores[~mask] = -np.inf
+            k = min(k, int(mask.sum()))
+            if k == 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates = [(int(row), float(scores[row])) for row in top[np.argsort(-scores[top])]]
+        return self._entries(candidates)
+
+    def _search_approximate(self, query: np.ndarray, k: int, mask: np.ndarray):
+        """Busca HNSW (faiss); None quando desativada ou sem resultados suficientes."""
+        if not self.approximate or faiss is None or len(mask) < self.approximate_min_size:
+            return None
+        with self._lock:
+            if self._ann is None:
+                self._ann = faiss.IndexHNSWFlat(self.dim, VECTOR_INDEX_CONFIG.get('hnsw_m', 32),
+                                                faiss.METRIC_INNER_PRODUCT)
+            if self._ann.ntotal < len(mask):
+                self._ann.add(np.ascontiguousarray(self.matrix[self._ann.ntotal:len(mask)]))
+
+        # Busca mais vizinhos para compensar linhas removidas ou de outra fonte
+        fetch = min(len(mask), k * 4 + int((~mask).sum()))
+        scores, rows = self._ann.search(query[None, :], fetch)
+        candidates = [(int(row), float(score)) for row, score in zip(rows[0], scores[0])
+                      if row >= 0 and mask[row]][:k]
+        return candidates if len(candidates) == min(k, int(mask.sum())) else None
+
+    def _entries(self, candidates) -> List[Dict]:
+        if not candidates:
+            return []
+        rows = [row for row, _ in candidates]
+        with self._lock:
+            found = {
+                row['row']: row for row in self._conn.execute(
+                    f"SELECT * FROM entries WHERE row IN ({','.join('?' * len(rows))})", rows
+                )
+            }
+        return [{
+            "id": found[row]['id'],
+            "texto": found[row]['text'],
+            "fonte": found[row]['source'],
+            "metadados": json.loads(found[row]['metadata'] or '{}'),
+            "score": score
+        } for row, score in candidates]
+
+    def compact(self) -> int:
+        """Reescreve o arquivo sem as linhas removidas; retorna quantas foram descartadas."""
+        with self._lock:
+            keep = np.flatnonzero(self._alive)
+            removed = len(self._alive) - len(keep)
+            if removed == 0:
+                return 0
+
+            tmp_path = self.vectors_path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(np.ascontiguousarray(self.matrix[keep]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._matrix = None
+
+            self._conn.execute("DELETE FROM entries WHERE deleted = 1")
+            # Renumera em duas passadas para não violar a chave primária
+            self._conn.execute("UPDATE entries SET row = -1 - row")
+            for new_row, old_row in enumerate(keep):
+                self._conn.execute("UPDATE entries SET row = ? WHERE row = ?", (new_row, -1 - int(old_row)))
+            # O marcador entra na mesma transação: se o processo cair antes da
+            # troca dos arquivos, _load_state a conclui na próxima abertura
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('compaction', ?)", (str(len(keep)),))
+            self._conn.commit()
+
+            os.replace(tmp_path, self.vectors_path)
+            self._conn.execute("DELETE FROM meta WHERE key = 'compaction'")
+            self._conn.commit()
+
+            self._ann = None
+            self._load_state()
+        self.logger.info(f"Índice vetorial compactado: {removed} linhas removidas")
+        return removed
+
+    def prune(self, source: str, max_entries: int = None, max_age: float = None) -> int:
+        """Remove os documentos de uma fonte além dos ``max_entries`` mais
+        recentes ou com mais de ``max_age`` segundos; retorna quantos saíram.
+
+        Quando metade ou mais das linhas do arquivo estiver removida, o
+        índice é compactado.
+        """
+        with self._lock:
+            expired = []
+            if max_age is not None:
+                expired += self._conn.execute(
+                    "SELECT id FROM entries WHERE source = ? AND deleted = 0 AND created < ?",
+                    (source, time.time() - max_age)
+                ).fetchall()
+            if max_entries is not None:
+                expired += self._conn.execute(
+                    "SELECT id FROM entries WHERE source = ? AND deleted = 0 "
+                    "ORDER BY row DESC LIMIT -1 OFFSET ?",
+                    (source, max_entries)
+                ).fetchall()
+
+            removed = sum(self._mark_deleted(doc_id) for doc_id in {row['id'] for row in expired})
+            self._conn.commit()
+
+            if removed and 2 * (len(self._alive) - len(self._rows_by_id)) >= len(self._alive):
+                self.compact()
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._matrix = None
+            self._conn.close()
@@ -2,17 +2,17 @@ import cv2
 import numpy as np
 from PIL import Image
 import torch
-from transformers import DetrImageProcessor, DetrForObjectDetection
-from transformers import VisionEncoderDecoderModel, ViTImageProcessor, AutoTokenizer
 import pytesseract
 from pathlib import Path
 import mediapipe as mp
 
+from .model_registry import get_model_registry
+
 class VisaoComputacional:
-    def __init__(self):
-        # Inicializa os modelos de IA
-        self.detector_objetos = self._inicializar_detector_objetos()
-        self.descricao_imagem = self._inicializar_descricao_imagem()
+    def __init__(self, modelos=None):
+        # Detecção e descrição de imagens vêm do registro compartilhado e
+        # só são carregadas no primeiro uso
+        self.modelos = modelos or get_model_registry()
         self.face_mesh = mp.solutions.face_mesh.FaceMesh()
         self.hands = mp.solutions.hands.Hands()
         self.pose = mp.solutions.pose.Pose()
@@ -21,22 +21,15 @@ class VisaoComputacional:
         self.camera = None
         self.camera_ativa = False
         
-    def _inicializar_detector_objetos(self):
-        """Inicializa o modelo de detecção de objetos"""
-        processor = DetrImageProcessor.from_pretrained("facebook/detr-resnet-50")
-        model = DetrForObjectDetection.from_pretrained("facebook/detr-resnet-50")
-        return {"processor": processor, "model": model}
+    @property
+    def detector_objetos(self):
+        """Modelo de detecção de objetos"""
+        return self.modelos.get("detr")
     
-    def _inicializar_descricao_imagem(self):
-        """Inicializa o modelo de descrição de imagens"""
-        model = VisionEncoderDecoderModel.from_pretrained("nlpconnect/vit-gpt2-image-captioning")
-        feature_extractor = ViTImageProcessor.from_pretrained("nlpconnect/vit-gpt2-image-captioning")
-        tokenizer = AutoTokenizer.from_pretrained("nlpconnect/vit-gpt2-image-captioning")
-        return {
-            "model": model,
-            "feature_extractor": feature_extractor,
-            "tokenizer": tokenizer
-        }
+    @property
+    def descricao_imagem(self):
+        """Modelo de descrição de imagens"""
+        return self.modelos.get("image_captioning")
 
     def iniciar_camera(self, camera_id=0):
         """Inicia a câmera"""
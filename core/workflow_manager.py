@@ -1,5 +1,6 @@
 import os
 import json
+import time
 import uuid
 import asyncio
 from typing import Dict, List, Optional
@@ -12,11 +13,18 @@ from config.system_config import (
     TEMPLATES_DIR,
     OUTPUT_DIR
 )
+from .job_queue import JobQueue
 
 class WorkflowManager:
-    """Gerenciador de workflows do ComfyUI."""
+    """Gerenciador de workflows do ComfyUI.
+
+    Os workflows passam por uma fila persistente com prioridade: acima de
+    ``max_concurrent`` eles aguardam em vez de serem rejeitados. Cada
+    execução tem timeout e, com ``auto_retry``, falhas são repetidas com
+    backoff exponencial até ``max_retries`` novas tentativas.
+    """
     
-    def __init__(self, comfy_manager):
+    def __init__(self, comfy_manager, queue: JobQueue = None):
         self.logger = logging.getLogger('WorkflowManager')
         self.comfy_manager = comfy_manager
         self.active_workflows = {}
@@ -26,6 +34,13 @@ class WorkflowManager:
         WORKFLOWS_DIR.mkdir(exist_ok=True)
         TEMPLATES_DIR.mkdir(exist_ok=True)
         OUTPUT_DIR.mkdir(exist_ok=True)
+        
+        self.queue = queue or JobQueue(WORKFLOW_CONFIG.get('queue_db', WORKFLOWS_DIR / 'queue.sqlite3'))
+        self._running_jobs: Dict[str, asyncio.Task] = {}
+        self._scheduler = None
+        self._wakeup = None
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._shutting_down = False
     
     def _load_templates(self) -> Dict:
         """Carrega templates de workflow do diretório de templates."""
@@ -111,68 +126,206 @@ class WorkflowManager:
         # Implementar adição de nós para modelagem 3D
         return workflow
     
-    async def execute_workflow(self, workflow: Dict) -> str:
-        """Executa um workflow no ComfyUI."""
+    async def start(self):
+        """Inicia o agendador, retomando jobs interrompidos numa execução anterior."""
+        recovered = self.queue.recover()
+        if recovered:
+            self.logger.info(f"{recovered} workflow(s) retomados da fila")
+        self._ensure_scheduler()
+    
+    def _ensure_scheduler(self):
+        if self._scheduler is None or self._scheduler.done():
+            self._wakeup = asyncio.Event()
+            self._scheduler = asyncio.create_task(self._schedule_loop())
+        self._wakeup.set()
+    
+    async def execute_workflow(self, workflow: Dict, priority: int = 0) -> str:
+        """Enfileira um workflow para execução no ComfyUI.
+
+        Retorna o id imediatamente; use ``wait_workflow`` ou
+        ``get_workflow_status`` para acompanhar.
+        """
         try:
-            # Verifica limite de workflows concorrentes
-            if len(self.active_workflows) >= WORKFLOW_CONFIG['max_concurrent']:
-                raise RuntimeError("Limite de workflows concorrentes atingido")
-            
-            # Inicia execução
             workflow_id = workflow['id']
+            self.queue.enqueue(workflow_id, workflow, priority)
             self.active_workflows[workflow_id] = {
-                'status': 'running',
+                'status': 'queued',
                 'progress': 0,
                 'output': None,
-                'error': None
+                'error': None,
+                'attempts': 0,
+                'priority': priority
             }
+            self._ensure_scheduler()
+            return workflow_id
             
-            # Executa no ComfyUI
-            result = await self.comfy_manager.execute_workflow(
-                workflow_path=workflow['path'],
-                output_dir=OUTPUT_DIR
+        except Exception as e:
+            self.logger.error(f"Erro ao enfileirar workflow: {str(e)}")
+            raise
+    
+    async def wait_workflow(self, workflow_id: str, timeout: float = None) -> Dict:
+        """Aguarda um workflow terminar e retorna seu status final."""
+        status = await self.get_workflow_status(workflow_id)
+        if status['status'] in ('completed', 'failed', 'stopped'):
+            return status
+        
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(workflow_id, []).append(future)
+        return await asyncio.wait_for(future, timeout)
+    
+    async def _schedule_loop(self):
+        """Inicia jobs da fila enquanto houver vagas de execução."""
+        while True:
+            while len(self._running_jobs) < WORKFLOW_CONFIG['max_concurrent']:
+                job = self.queue.claim()
+                if job is None:
+                    break
+                task = asyncio.create_task(self._run_job(job))
+                self._running_jobs[job['id']] = task
+            
+            # Dorme até uma vaga abrir, um job chegar ou um retry ficar pronto
+            self._wakeup.clear()
+            delay = None
+            if len(self._running_jobs) < WORKFLOW_CONFIG['max_concurrent']:
+                delay = self.queue.next_ready_in()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _run_job(self, job: Dict):
+        """Executa um job com timeout e decide sobre novas tentativas."""
+        workflow_id = job['id']
+        workflow = job['payload']
+        state = self.active_workflows.setdefault(workflow_id, {
+            'progress': 0, 'output': None, 'error': None, 'priority': job['priority']
+        })
+        state.update(status='running', attempts=job['attempts'])
+        
+        try:
+            result = await asyncio.wait_for(
+                self.comfy_manager.execute_workflow(
+                    workflow_path=workflow['path'],
+                    output_dir=OUTPUT_DIR
+                ),
+                WORKFLOW_CONFIG['timeout']
             )
+            if not result.get('success'):
+                raise RuntimeError(result.get('error') or 'Falha na execução do workflow')
             
-            # Atualiza status
-            if result.get('success'):
-                self.active_workflows[workflow_id]['status'] = 'completed'
-                self.active_workflows[workflow_id]['output'] = result.get('output')
-            else:
-                self.active_workflows[workflow_id]['status'] = 'failed'
-                self.active_workflows[workflow_id]['error'] = result.get('error')
+            self.queue.complete(workflow_id, result)
+            state.update(status='completed', output=result.get('output'), error=None)
             
-            return workflow_id
+        except asyncio.CancelledError:
+            # No desligamento o job continua na fila para a próxima execução
+            state['status'] = 'queued' if self._shutting_down else 'stopped'
+            raise
             
         except Exception as e:
-            self.logger.error(f"Erro ao executar workflow: {str(e)}")
-            if workflow_id in self.active_workflows:
-                self.active_workflows[workflow_id]['status'] = 'failed'
-                self.active_workflows[workflow_id]['error'] = str(e)
-            raise
+            error = 'Timeout na execução do workflow' if isinstance(e, asyncio.TimeoutError) else str(e)
+            self.logger.error(f"Erro ao executar workflow {workflow_id}: {error}")
+            state['error'] = error
+            
+            if isinstance(e, asyncio.TimeoutError):
+                # O wait_for só cancela a espera local: sem interromper o prompt
+                # no ComfyUI, a nova tentativa rodaria em duplicidade
+                await self._interrupt(workflow_id)
+            
+            # ``attempts`` já conta a execução atual: max_retries=3 permite 4 execuções
+            if WORKFLOW_CONFIG.get('auto_retry') and job['attempts'] <= WORKFLOW_CONFIG.get('max_retries', 0):
+                delay = min(
+                    WORKFLOW_CONFIG.get('retry_backoff', 2) * 2 ** (job['attempts'] - 1),
+                    WORKFLOW_CONFIG.get('max_backoff', 60)
+                )
+                self.queue.fail(workflow_id, error, retry_in=delay)
+                state['status'] = 'queued'
+            else:
+                self.queue.fail(workflow_id, error)
+                state['status'] = 'failed'
+        
+        finally:
+            self._running_jobs.pop(workflow_id, None)
+            if state['status'] != 'queued':
+                for future in self._waiters.pop(workflow_id, []):
+                    if not future.done():
+                        future.set_result(state)
+            if self._wakeup:
+                self._wakeup.set()
+    
+    async def _interrupt(self, workflow_id: str):
+        """Interrompe o prompt no ComfyUI, registrando (sem propagar) falhas."""
+        try:
+            await self.comfy_manager.stop_workflow(workflow_id)
+        except Exception as e:
+            self.logger.error(f"Erro ao interromper workflow {workflow_id} no ComfyUI: {str(e)}")
     
     async def get_workflow_status(self, workflow_id: str) -> Dict:
         """Retorna o status de um workflow."""
-        if workflow_id not in self.active_workflows:
+        if workflow_id in self.active_workflows:
+            return self.active_workflows[workflow_id]
+        
+        # Workflows de execuções anteriores ficam registrados na fila
+        job = self.queue.get(workflow_id)
+        if job is None:
             raise ValueError(f"Workflow não encontrado: {workflow_id}")
         
-        return self.active_workflows[workflow_id]
+        result = job.get('result') or {}
+        return {
+            'status': 'stopped' if job['status'] == JobQueue.CANCELLED else job['status'],
+            'progress': 0,
+            'output': result.get('output'),
+            'error': job.get('error'),
+            'attempts': job['attempts'],
+            'priority': job['priority']
+        }
     
     async def stop_workflow(self, workflow_id: str):
-        """Para a execução de um workflow."""
+        """Cancela um workflow na fila ou interrompe sua execução."""
         try:
-            if workflow_id in self.active_workflows:
+            previous = self.queue.cancel(workflow_id)
+            
+            task = self._running_jobs.get(workflow_id)
+            if task is not None:
+                task.cancel()
                 await self.comfy_manager.stop_workflow(workflow_id)
+            
+            if workflow_id in self.active_workflows:
                 self.active_workflows[workflow_id]['status'] = 'stopped'
+            if previous is not None and task is None:
+                for future in self._waiters.pop(workflow_id, []):
+                    if not future.done():
+                        future.set_result(self.active_workflows.get(workflow_id, {'status': 'stopped'}))
                 
         except Exception as e:
             self.logger.error(f"Erro ao parar workflow: {str(e)}")
             raise
     
     async def stop_all(self):
-        """Para todos os workflows ativos."""
+        """Para o agendador e as execuções em andamento.
+
+        Os jobs não finalizados continuam na fila (em execução voltam a
+        ``pending``) e são retomados no próximo ``start``.
+        """
         try:
-            for workflow_id in list(self.active_workflows.keys()):
-                await self.stop_workflow(workflow_id)
+            if self._scheduler:
+                self._scheduler.cancel()
+                self._scheduler = None
+            
+            self._shutting_down = True
+            try:
+                tasks = dict(self._running_jobs)
+                for workflow_id, task in tasks.items():
+                    task.cancel()
+                    await self._interrupt(workflow_id)
+                await asyncio.gather(*tasks.values(), return_exceptions=True)
+            finally:
+                self._shutting_down = False
+            self.queue.recover()
+            
+            for futures in self._waiters.values():
+                for future in futures:
+                    future.cancel()
+            self._waiters.clear()
                 
         except Exception as e:
             self.logger.error(f"Erro ao parar todos os workflows: {str(e)}")
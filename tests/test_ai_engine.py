@@ -0,0 +1,235 @@
+import pytest
+import json
+import ai_engine.core as core
+from ai_engine.completion_cache import CompletionCache
+from ai_engine.lm_studio import LMStudioInterface
+
+class ClienteFalso:
+    """Cliente que responde com um texto fixo e registra os prompts"""
+
+    def __init__(self, modelos=("lmstudio-community/deepseek-coder.Q4_K_M.gguf",)):
+        self.modelos = list(modelos)
+        self.prompts = []
+        self.usuarios = []
+
+    def list_models(self):
+        return self.modelos
+
+    def complete(self, prompt, max_tokens, temperature, top_p, timeout=None):
+        self.prompts.append(prompt)
+        return f"resposta {len(self.prompts)}"
+
+    # Também faz o papel do dispatcher compartilhado do backend
+    def submit_sync(self, prompt, user="anon", max_tokens=2000, temperature=0.7, top_p=0.95, timeout=None):
+        self.usuarios.append(user)
+        return self.complete(prompt, max_tokens, temperature, top_p)
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """Fixture que cria um AIEngine com cliente falso e cache temporário"""
+    monkeypatch.chdir(tmp_path)
+    cliente = ClienteFalso()
+    cache = CompletionCache(path=tmp_path / "completions.sqlite3")
+    monkeypatch.setattr(core, "get_client", lambda url: cliente)
+    monkeypatch.setattr(core, "get_dispatcher", lambda url: cliente)
+    monkeypatch.setattr(core, "get_completion_cache", lambda: cache)
+    return core.AIEngine()
+
+def test_cache_de_completions_deterministicas(engine):
+    """Testa que só completions com temperatura 0 são cacheadas, pelo id real do modelo"""
+    assert engine.model_id == "deepseek-coder.Q4_K_M.gguf"
+
+    assert engine._generate_completion("prompt", temperature=0.0) == "resposta 1"
+    assert engine._generate_completion("prompt", temperature=0.0) == "resposta 1"
+    # O padrão continua sendo temperatura 0.7, sem cache
+    assert engine._generate_completion("prompt") == "resposta 2"
+    assert engine._generate_completion("prompt") == "resposta 3"
+    assert len(engine.client.prompts) == 3
+
+def test_chaves_compartilhadas_com_lm_studio(engine, monkeypatch):
+    """Testa que AIEngine e LMStudioInterface geram a mesma chave para o mesmo modelo"""
+    monkeypatch.setattr("ai_engine.lm_studio.get_client", lambda url: engine.client)
+    lm_studio = LMStudioInterface(model_path="/modelos/deepseek-coder.Q4_K_M.gguf")
+    assert lm_studio.model_name == engine.model_id
+
+def test_geracao_passa_pelo_dispatcher(engine, monkeypatch):
+    """Testa que AIEngine e LMStudioInterface enviam os prompts pelo dispatcher do backend"""
+    monkeypatch.setattr("ai_engine.lm_studio.get_client", lambda url: engine.client)
+    monkeypatch.setattr("ai_engine.lm_studio.get_dispatcher", lambda url: engine.client)
+    lm_studio = LMStudioInterface(model_path="/modelos/deepseek-coder.Q4_K_M.gguf")
+    lm_studio.cache = engine.completion_cache
+
+    engine._generate_completion("prompt", user="ana")
+    lm_studio.generate("outro prompt", user="bia")
+    assert engine.client.prompts == ["prompt", "outro prompt"]
+    assert engine.client.usuarios == ["ana", "bia"]
+
+def test_id_do_modelo_expira(engine, monkeypatch):
+    """Testa que o id do modelo é consultado de novo após o TTL e, sem servidor, após pouco tempo"""
+    agora = [1000.0]
+    monkeypatch.setattr(core.time, "monotonic", lambda: agora[0])
+    consultas = []
+    listar = engine.client.list_models
+    engine.client.list_models = lambda: consultas.append(1) or listar()
+
+    assert engine.model_id == "deepseek-coder.Q4_K_M.gguf"
+    engine.client.modelos = ["outro.gguf"]
+    assert engine.model_id == "deepseek-coder.Q4_K_M.gguf"
+    agora[0] += core.MODEL_ID_TTL
+    assert engine.model_id == "outro.gguf"
+
+    # Servidor fora do ar: a falha também fica em cache, por menos tempo
+    engine.client.modelos = []
+    agora[0] += core.MODEL_ID_TTL
+    assert engine.model_id == "default"
+    assert engine.model_id == "default"
+    assert len(consultas) == 3
+    engine.client.modelos = ["novo.gguf"]
+    agora[0] += core.MODEL_ID_RETRY
+    assert engine.model_id == "novo.gguf"
+
+def _resultado(arquivos, testes):
+    return core.CodeGenResult(files=arquivos, tests=testes, dependencies={},
+                              build_steps=[], validation_results={})
+
+def test_validacao_com_erro_de_sintaxe(engine):
+    """Testa que um erro de sintaxe interrompe a validação antes dos testes"""
+    resultado = _resultado({"app.py": "def f(:\n    pass\n"}, {"test_app.py": "def test_ok():\n    pass\n"})
+    assert engine.validate_code(resultado) is False
+    assert resultado.validation_results == {"syntax": False, "tests": False}
+
+def test_validacao_com_teste_falhando(engine):
+    """Testa que um teste falhando reprova o código"""
+    resultado = _resultado(
+        {"app.py": "def soma(a, b):\n    return a - b\n"},
+        {
+            "test_ok.py": "def test_ok():\n    assert True\n",
+            "test_soma.py": "from app import soma\n\ndef test_soma():\n    assert soma(1, 2) == 3\n"
+        }
+    )
+    assert engine.validate_code(resultado) is False
+    assert resultado.validation_results == {"syntax": True, "tests": False}
+
+def test_validacao_interrompe_testes_em_andamento(engine, monkeypatch):
+    """Testa que a primeira falha encerra os pytest ainda em execução antes de retornar"""
+    processos = []
+    popen_original = core.subprocess.Popen
+
+    def popen_registrado(*args, **kwargs):
+        processo = popen_original(*args, **kwargs)
+        processos.append(processo)
+        return processo
+
+    monkeypatch.setattr(core.subprocess, "Popen", popen_registrado)
+    resultado = _resultado(
+        {"app.py": "VALOR = 1\n"},
+        {
+            "test_lento.py": "import time\n\ndef test_lento():\n    time.sleep(60)\n",
+            "test_falha.py": "def test_falha():\n    assert False\n"
+        }
+    )
+
+    inicio = core.time.monotonic()
+    assert engine.validate_code(resultado, max_workers=2) is False
+    assert core.time.monotonic() - inicio < 30
+    assert len(processos) == 2
+    assert all(processo.returncode is not None for processo in processos)
+
+class ClienteDeCodigo(ClienteFalso):
+    """Cliente que devolve um módulo por prompt, com nome derivado da chamada"""
+
+    def complete(self, prompt, max_tokens, temperature, top_p, timeout=None):
+        self.prompts.append(prompt)
+        indice = len(self.prompts)
+        return json.dumps({
+            "files": {f"mod{indice}.py": f"VALOR = {indice}\n"},
+            "tests": {},
+            "dependencies": {},
+            "build_steps": []
+        })
+
+def _especificacao(descricao="Projeto de teste", modulos=None):
+    return core.ProjectSpec(
+        name="projeto", description=descricao, platform="linux", language="python",
+        dependencies=[], features=["login", "relatorios"],
+        architecture={"modules": modulos} if modulos is not None else {}
+    )
+
+def test_divisao_em_unidades(engine):
+    """Testa a divisão por módulos declarados (dict ou lista) e, sem eles, por feature"""
+    assert engine._split_units(_especificacao(modulos={"api": "rotas"})) == [
+        {"name": "api", "description": "rotas"}
+    ]
+    assert engine._split_units(_especificacao(modulos=["api", {"name": "db", "description": "sqlite"}])) == [
+        {"name": "api", "description": "api"},
+        {"name": "db", "description": "sqlite"}
+    ]
+    assert [u["name"] for u in engine._split_units(_especificacao())] == ["login", "relatorios"]
+
+def test_hash_cobre_o_prompt_inteiro(engine):
+    """Testa que mudar a descrição do projeto ou o modelo muda o hash da unidade"""
+    unidade = {"name": "api", "description": "rotas"}
+    original = engine._unit_hash(_especificacao(), unidade)
+    assert engine._unit_hash(_especificacao(), dict(unidade)) == original
+    assert engine._unit_hash(_especificacao(descricao="Outra descrição"), unidade) != original
+    engine._model_id = "outro.gguf"
+    assert engine._unit_hash(_especificacao(), unidade) != original
+
+def test_reuso_de_unidades_validadas(engine, monkeypatch):
+    """Testa que só unidades validadas e inalteradas deixam de ser geradas de novo"""
+    engine.dispatcher = ClienteDeCodigo()
+    geradas = []
+    gerar_original = engine._generate_unit
+
+    def gerar_registrando(spec, unidade, **kwargs):
+        geradas.append(unidade["name"])
+        return gerar_original(spec, unidade, **kwargs)
+
+    monkeypatch.setattr(engine, "_generate_unit", gerar_registrando)
+    spec = _especificacao()
+
+    engine.generate_code(spec)
+    assert geradas == ["login", "relatorios"]
+    # Sem validação nada é reaproveitado
+    engine._mark_units_validated(engine.generate_code(spec))
+    assert len(geradas) == 4
+    geradas.clear()
+
+    engine.generate_code(spec)
+    assert geradas == []
+
+    spec.features = ["login", "exportacao"]
+    resultado = engine.generate_code(spec)
+    assert geradas == ["exportacao"]
+    assert sorted(resultado.units.values()) == ["exportacao", "login"]
+
+def test_unidade_reprovada_nao_volta_do_cache(engine):
+    """Testa que regerar uma unidade não validada pede ao modelo uma nova resposta"""
+    engine.dispatcher = ClienteDeCodigo()
+    spec = _especificacao(modulos={"api": "rotas"})
+
+    primeiro = engine.generate_code(spec)
+    assert primeiro.files == {"mod1.py": "VALOR = 1\n"}
+    # Sem validação a unidade volta ao modelo, e não ao cache de completions
+    segundo = engine.generate_code(spec)
+    assert segundo.files == {"mod2.py": "VALOR = 2\n"}
+    assert len(engine.dispatcher.prompts) == 2
+
+    # A nova resposta substitui a antiga no cache
+    engine.knowledge_base["units"].clear()
+    assert engine.generate_code(spec).files == {"mod2.py": "VALOR = 2\n"}
+    assert len(engine.dispatcher.prompts) == 2
+
+def test_limite_de_unidades_guardadas(engine, monkeypatch):
+    """Testa que a knowledge base descarta primeiro as unidades antigas não validadas"""
+    monkeypatch.setattr(core, "MAX_STORED_UNITS", 3)
+    engine.dispatcher = ClienteDeCodigo()
+    unidades = engine.knowledge_base["units"]
+    unidades.update({
+        "antiga": {"validated": False, "last_used": 1},
+        "validada": {"validated": True, "last_used": 0},
+        "recente": {"validated": False, "last_used": 2}
+    })
+
+    resultado = engine.generate_code(_especificacao())
+    assert set(unidades) == {"validada", *resultado.units}
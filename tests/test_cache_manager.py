@@ -0,0 +1,199 @@
+import gc
+import pytest
+import json
+from core.cache_manager import CacheManager
+from core.cache_metrics import cache_metrics
+from core.cache_policies import create_policy
+
+@pytest.fixture
+def cache(tmp_path):
+    """Fixture que cria um cache isolado em diretório temporário"""
+    return CacheManager(cache_dir=tmp_path / "cache")
+
+def test_set_get_memoria(cache):
+    """Testa leitura pela camada em memória sem tocar o disco"""
+    assert cache.set("chave", {"valor": 1})
+    assert cache.get("chave") == {"valor": 1}
+
+    # Com write-back nada foi gravado ainda
+    assert len(cache.metadata) == 0
+    assert cache.get_stats()["pending_writes"] == 1
+
+def test_flush_grava_em_disco(cache):
+    """Testa a gravação das entradas pendentes"""
+    cache.set("chave", [1, 2, 3])
+    cache.flush()
+
+    assert len(cache.metadata) == 1
+    assert cache.get_stats()["pending_writes"] == 0
+
+    # Uma nova instância lê do disco
+    outro = CacheManager(cache_dir=cache.cache_dir)
+    assert outro.get("chave") == [1, 2, 3]
+    assert len(outro.memory) == 1
+
+def test_despejo_memoria_por_bytes(cache):
+    """Testa o despejo LRU limitado por bytes"""
+    cache.memory.max_bytes = 2 * len(json.dumps("x" * 100))
+    cache.set("a", "x" * 100)
+    cache.set("b", "x" * 100)
+    cache.get("a")
+    cache.set("c", "x" * 100)
+
+    # "b" era a menos usada e foi gravada em disco ao sair da memória
+    assert cache._generate_key("b") not in cache.memory
+    assert len(cache.memory) == 2
+    assert len(cache.metadata) == 1
+    assert cache.get("b") == "x" * 100
+
+def test_clear(cache):
+    """Testa a limpeza das duas camadas"""
+    cache.set("chave", "valor")
+    cache.flush()
+    cache.clear()
+
+    assert cache.get("chave") is None
+    assert cache.get_stats()["total_entries"] == 0
+    assert cache.get_stats()["memory_entries"] == 0
+
+def test_journal_metadados(cache):
+    """Testa a reconstrução do índice a partir do snapshot + journal"""
+    cache.write_back = False
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache._remove_entry(cache._generate_key("a"))
+
+    # Simula uma falha no meio da escrita de um registro
+    with open(cache.cache_dir / "metadata.log", "a") as f:
+        f.write('{"op":"set","key":"trunc')
+
+    outro = CacheManager(cache_dir=cache.cache_dir)
+    assert list(outro.metadata) == [cache._generate_key("b")]
+    assert outro.current_size == cache.current_size
+    assert outro.get("b") == "2"
+
+def test_journal_so_com_linha_truncada(cache):
+    """Testa que uma linha truncada sozinha no journal não corrompe o próximo registro"""
+    cache.write_back = False
+    cache.set("a", "1")
+    cache._save_metadata()
+    with open(cache.cache_dir / "metadata.log", "a") as f:
+        f.write('{"op":"set","key":"trunc')
+
+    outro = CacheManager(cache_dir=cache.cache_dir)
+    assert (cache.cache_dir / "metadata.log").read_text() == ""
+    outro.write_back = False
+    outro.set("b", "2")
+
+    terceiro = CacheManager(cache_dir=cache.cache_dir)
+    assert sorted(terceiro.metadata) == sorted([cache._generate_key("a"), cache._generate_key("b")])
+    assert terceiro.get("b") == "2"
+
+def test_tamanho_incremental(cache):
+    """Testa a manutenção do total de bytes sem recontagem"""
+    cache.write_back = False
+    cache.max_size = 3 * len(json.dumps("x" * 10))
+    for i in range(10):
+        cache.set(i, str(i) * 10)
+
+    assert cache.current_size <= cache.max_size
+    assert cache.current_size == sum(e["size"] for e in cache.metadata.values())
+
+def test_blobs_deduplicados(cache):
+    """Testa o compartilhamento de blobs com o mesmo conteúdo"""
+    cache.write_back = False
+    cache.set("a", {"x": 1})
+    cache.set("b", {"x": 1})
+
+    blobs = [p for p in (cache.cache_dir / "blobs").rglob("*") if p.is_file()]
+    assert len(blobs) == 1
+    assert blobs[0].parent.parent.parent == cache.cache_dir / "blobs"
+
+    cache._remove_entry(cache._generate_key("a"))
+    assert blobs[0].exists()
+    cache._remove_entry(cache._generate_key("b"))
+    assert not blobs[0].exists()
+    assert cache.current_size == 0
+
+def test_codecs_e_compressao(cache):
+    """Testa valores binários, pickle e compressão"""
+    cache.write_back = False
+    cache.mmap_min_size = 16
+    cache.set("bin", b"\x00" * 64)
+    cache.set("obj", {1, 2, 3})
+    cache.set("texto", "a" * 10000, compression="zlib")
+
+    outro = CacheManager(cache_dir=cache.cache_dir)
+    assert outro.get("obj") == {1, 2, 3}
+    assert outro.get("texto") == "a" * 10000
+    assert outro.metadata[cache._generate_key("texto")]["compression"] == "zlib"
+
+    buffer = outro.get_buffer("bin")
+    assert isinstance(buffer, memoryview)
+    assert buffer.tobytes() == b"\x00" * 64
+
+def test_politica_lru_considera_acessos(cache):
+    """Testa que acertos protegem a entrada do despejo"""
+    cache.write_back = False
+    cache.max_size = 3 * len(json.dumps("a" * 10))
+    cache.set("a", "a" * 10)
+    cache.set("b", "b" * 10)
+    cache.set("c", "c" * 10)
+    cache.get("a")
+    cache.set("d", "d" * 10)
+
+    assert cache._generate_key("a") in cache.metadata
+    assert cache._generate_key("b") not in cache.metadata
+
+def test_politicas_lfu_gdsf():
+    """Testa a ordem de despejo das políticas por frequência e tamanho"""
+    lfu = create_policy("lfu")
+    for chave in ("a", "b", "c"):
+        lfu.record_insert(chave, 10)
+    lfu.record_access("a")
+    lfu.record_access("a")
+    lfu.record_access("b")
+    assert [lfu.pop_victim() for _ in range(3)] == ["c", "b", "a"]
+
+    gdsf = create_policy("gdsf")
+    gdsf.record_insert("grande", 1000)
+    gdsf.record_insert("pequeno", 10)
+    assert gdsf.pop_victim() == "grande"
+
+def test_expiracao_em_segundo_plano(cache):
+    """Testa a remoção de entradas vencidas sem leitura"""
+    cache.write_back = False
+    cache.set("velha", "1")
+    cache.ttl = -1
+
+    assert cache.purge_expired() == 1
+    assert len(cache.metadata) == 0
+    assert len(cache.memory) == 0
+
+def test_instancias_descartadas_sao_liberadas(tmp_path):
+    """Testa que instâncias sem referências são coletadas e param a thread de expiração"""
+    cache = CacheManager(cache_dir=tmp_path / "cache")
+    thread = cache._expiry_thread
+    assert thread.is_alive()
+
+    del cache
+    gc.collect()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+def test_metricas(tmp_path):
+    """Testa contadores de acerto e a exportação para o Prometheus"""
+    cache = CacheManager(cache_dir=tmp_path / "cache", namespace="teste_metricas")
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("inexistente")
+
+    stats = cache.get_stats()
+    assert stats["hits_memory"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+    texto = cache_metrics.render_prometheus()
+    assert 'cache_hits_memory_total{namespace="teste_metricas"} 1' in texto
+    assert 'cache_operation_duration_seconds_count{namespace="teste_metricas",operation="get"} 2' in texto
+    assert 'cache_entries{namespace="teste_metricas",tier="memory"} 1' in texto
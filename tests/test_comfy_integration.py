@@ -0,0 +1,163 @@
+import json
+import queue
+import threading
+import time
+import pytest
+import comfy_integration
+from comfy_integration import ComfyJobTracker
+
+class SocketFalso:
+    """Conexão /ws falsa: entrega as mensagens colocadas em ``mensagens``"""
+
+    def __init__(self):
+        self.mensagens = queue.Queue()
+
+    def __call__(self, url):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def recv(self, timeout=None):
+        try:
+            return self.mensagens.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError
+
+    def enviar(self, tipo, **dados):
+        self.mensagens.put(json.dumps({"type": tipo, "data": dados}))
+
+@pytest.fixture
+def socket_falso(monkeypatch):
+    """Fixture que substitui a conexão websocket do tracker"""
+    socket = SocketFalso()
+    monkeypatch.setattr(comfy_integration, "ws_connect", socket)
+    return socket
+
+@pytest.fixture
+def tracker(socket_falso):
+    """Fixture que cria um tracker conectado ao socket falso"""
+    tracker = ComfyJobTracker("http://comfy.local")
+    assert tracker.start(timeout=5)
+    yield tracker
+    tracker.stop()
+
+def test_eventos_intercalados_de_dois_jobs(tracker, socket_falso):
+    """Testa que eventos intercalados chegam ao job certo, inclusive os anteriores ao registro"""
+    progresso = []
+    socket_falso.enviar("executed", prompt_id="b", node="9", output={"images": ["b.png"]})
+    time.sleep(0.1)
+
+    job_a = tracker.track("a", on_progress=lambda *args: progresso.append(args))
+    job_b = tracker.track("b")
+    socket_falso.enviar("progress", prompt_id="a", node="3", value=1, max=2)
+    socket_falso.enviar("executed", prompt_id="a", node="9", output={"images": ["a.png"]})
+    socket_falso.enviar("executing", prompt_id="b", node=None)
+    socket_falso.enviar("execution_error", prompt_id="c", exception_message="falhou")
+    socket_falso.enviar("executing", prompt_id="a", node=None)
+
+    assert job_a.result(timeout=5) == {"9": {"images": ["a.png"]}}
+    assert job_b.result(timeout=5) == {"9": {"images": ["b.png"]}}
+    assert progresso == [("a", "3", 1, 2)]
+
+    job_c = tracker.track("c")
+    with pytest.raises(RuntimeError, match="falhou"):
+        job_c.result(timeout=5)
+
+def test_reenvio_precede_eventos_novos(tracker, socket_falso):
+    """Testa que eventos novos esperam o reenvio dos eventos antigos do mesmo job"""
+    em_reenvio = threading.Event()
+
+    def progresso_lento(*args):
+        em_reenvio.set()
+        # Enquanto o reenvio está parado aqui, o fim do job já chegou pelo socket
+        time.sleep(0.3)
+
+    socket_falso.enviar("progress", prompt_id="a", node="3", value=1, max=1)
+    socket_falso.enviar("executed", prompt_id="a", node="9", output={"images": ["a.png"]})
+    time.sleep(0.1)
+
+    def liberar_fim():
+        em_reenvio.wait(5)
+        socket_falso.enviar("executing", prompt_id="a", node=None)
+
+    threading.Thread(target=liberar_fim, daemon=True).start()
+    job = tracker.track("a", on_progress=progresso_lento)
+    assert job.result(timeout=5) == {"9": {"images": ["a.png"]}}
+
+def test_orfaos_expiram_e_sao_limitados(monkeypatch):
+    """Testa que eventos sem job são descartados por idade e por quantidade"""
+    monkeypatch.setattr(comfy_integration, "MAX_ORPHANS", 2)
+    agora = [1000.0]
+    monkeypatch.setattr(comfy_integration.time, "monotonic", lambda: agora[0])
+    tracker = ComfyJobTracker("http://comfy.local")
+
+    def evento(prompt_id):
+        tracker._handle({"type": "progress", "data": {"prompt_id": prompt_id, "value": 1, "max": 1}})
+
+    evento("a")
+    evento("b")
+    evento("c")
+    assert list(tracker._orphans) == ["b", "c"]
+
+    agora[0] += comfy_integration.ORPHAN_TTL + 1
+    evento("d")
+    assert list(tracker._orphans) == ["d"]
+
+def test_geracao_de_imagens_em_lote(tmp_path, monkeypatch):
+    """Testa que pedidos compatíveis vão ao ComfyUI num só workflow"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "ComfyUI").mkdir()
+    comfy = comfy_integration.ComfyUIIntegration()
+    enviados = []
+
+    def executar(workflow, timeout=None, on_progress=None):
+        enviados.append(workflow)
+        outputs = {}
+        for no_id, no in workflow.items():
+            if no["class_type"] != "SaveImage":
+                continue
+            # SaveImage <- VAEDecode <- KSampler <- EmptyLatentImage
+            decodificador = workflow[no["inputs"]["images"][0]]
+            sampler = workflow[decodificador["inputs"]["samples"][0]]
+            latente = workflow[sampler["inputs"]["latent_image"][0]]
+            prefixo = no["inputs"]["filename_prefix"]
+            outputs[no_id] = {"images": [
+                {"filename": f"{prefixo}_{i}.png", "subfolder": ""}
+                for i in range(latente["inputs"]["batch_size"])
+            ]}
+        return outputs
+
+    monkeypatch.setattr(comfy, "start_server", lambda: True)
+    monkeypatch.setattr(comfy, "_run_workflow", executar)
+    monkeypatch.setattr(comfy_integration.ComfyUIIntegration, "__del__", lambda self: None)
+
+    caminhos = comfy.generate_images(["um gato", "um cachorro", "um gato", "um gato"])
+    assert len(enviados) == 1
+    assert all(caminhos)
+    assert len(set(caminhos)) == 4
+    assert all(caminho.startswith(str(comfy.comfy_path / "output")) for caminho in caminhos)
+
+class RespostaFalsa:
+    status_code = 200
+
+    def __init__(self, dados):
+        self.dados = dados
+
+    def json(self):
+        return self.dados
+
+def test_timeout_descarta_job_do_tracker(tmp_path, monkeypatch, tracker):
+    """Testa que um job que estourou o timeout deixa de ser acompanhado"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "ComfyUI").mkdir()
+    comfy = comfy_integration.ComfyUIIntegration()
+    comfy.tracker = tracker
+    monkeypatch.setattr(comfy_integration.ComfyUIIntegration, "__del__", lambda self: None)
+    monkeypatch.setattr(comfy_integration.requests, "post", lambda *args, **kwargs: RespostaFalsa({"prompt_id": "lento"}))
+
+    assert comfy._run_workflow({}, timeout=0.05) is None
+    assert "lento" not in tracker._jobs
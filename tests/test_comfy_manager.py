@@ -0,0 +1,251 @@
+import asyncio
+import pytest
+import core.comfy_manager as comfy_manager
+from core.comfy_manager import ComfyUIManager
+
+class RespostaFalsa:
+    """Resposta HTTP falsa usada como gerenciador de contexto assíncrono"""
+
+    def __init__(self, dados, status=200):
+        self.dados = dados
+        self.status = status
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def json(self):
+        return self.dados
+
+class SessaoFalsa:
+    """Sessão aiohttp falsa que responde /history/<id> a partir de um dict"""
+
+    def __init__(self, historico):
+        self.historico = historico
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        prompt_id = url.rsplit('/', 1)[1]
+        return RespostaFalsa({prompt_id: self.historico[prompt_id]} if prompt_id in self.historico else {})
+
+def _mensagem(tipo, prompt_id, **dados):
+    return {'type': tipo, 'data': dict(dados, prompt_id=prompt_id)}
+
+def test_mensagens_intercaladas_de_dois_workflows():
+    """Testa que mensagens intercaladas vão para o workflow certo, inclusive as anteriores ao registro"""
+    async def cenario():
+        manager = ComfyUIManager(api_url="http://comfy.local/api", launch=False)
+        manager._route(_mensagem('executed', 'b', node='9', output={'images': ['b.png']}))
+
+        espera_a = asyncio.create_task(manager._wait_for_execution('a', timeout=5))
+        espera_b = asyncio.create_task(manager._wait_for_execution('b', timeout=5))
+        await asyncio.sleep(0)
+
+        manager._route(_mensagem('executed', 'a', node='9', output={'images': ['a.png']}))
+        manager._route(_mensagem('executing', 'b', node='3'))
+        manager._route(_mensagem('execution_error', 'b', exception_message='sem memória'))
+        manager._route(_mensagem('executing', 'a', node=None))
+
+        assert await espera_a == {'success': True, 'outputs': {'9': {'images': ['a.png']}}}
+        assert await espera_b == {'success': False, 'error': 'sem memória'}
+        assert manager._waiters == {}
+        assert manager._orphans == {}
+
+    asyncio.run(cenario())
+
+def test_ressincronizacao_dos_pendentes():
+    """Testa que, após reconectar, só os workflows já concluídos no histórico são resolvidos"""
+    async def cenario():
+        manager = ComfyUIManager(api_url="http://comfy.local/api", launch=False)
+        manager.session = SessaoFalsa({'a': {'outputs': {'9': {'images': ['a.png']}}}})
+
+        espera_a = asyncio.create_task(manager._wait_for_execution('a', timeout=5))
+        espera_b = asyncio.create_task(manager._wait_for_execution('b', timeout=5))
+        await asyncio.sleep(0)
+
+        await manager._resync_pending()
+        assert await espera_a == {'success': True, 'outputs': {'9': {'images': ['a.png']}}}
+        assert not espera_b.done()
+        assert sorted(manager.session.urls) == [
+            "http://comfy.local/api/history/a", "http://comfy.local/api/history/b"
+        ]
+
+        manager._route(_mensagem('executing', 'b', node=None))
+        assert (await espera_b)['success']
+
+    asyncio.run(cenario())
+
+def test_orfaos_expiram_e_sao_limitados(monkeypatch):
+    """Testa que mensagens sem workflow são descartadas por idade e por quantidade"""
+    monkeypatch.setitem(comfy_manager.COMFY_CONFIG, 'max_orphans', 2)
+    agora = [1000.0]
+    monkeypatch.setattr(comfy_manager.time, 'monotonic', lambda: agora[0])
+    manager = ComfyUIManager(launch=False)
+
+    for prompt_id in ('a', 'b', 'c'):
+        manager._route(_mensagem('progress', prompt_id, value=1, max=1))
+    assert list(manager._orphans) == ['b', 'c']
+
+    agora[0] += comfy_manager.COMFY_CONFIG['orphan_ttl'] + 1
+    manager._route(_mensagem('progress', 'd', value=1, max=1))
+    assert list(manager._orphans) == ['d']
+
+class ConteudoFalso:
+    """Corpo de resposta que entrega blocos e pode cair no meio"""
+
+    def __init__(self, dados, cair_apos=None, silencioso=False):
+        self.dados = dados
+        self.cair_apos = cair_apos
+        self.silencioso = silencioso
+
+    async def iter_chunked(self, tamanho):
+        enviados = 0
+        for inicio in range(0, len(self.dados), tamanho):
+            if self.cair_apos is not None and enviados >= self.cair_apos:
+                if self.silencioso:
+                    # Corpo truncado sem erro de conexão
+                    return
+                raise ConnectionResetError("conexão caiu")
+            bloco = self.dados[inicio:inicio + tamanho]
+            enviados += len(bloco)
+            await asyncio.sleep(0.01)
+            yield bloco
+
+class RespostaDeArquivo(RespostaFalsa):
+    """Resposta de /view que registra quantos downloads estão abertos"""
+
+    def __init__(self, status, dados=b"", headers=None, servidor=None, cair_apos=None):
+        super().__init__(None, status)
+        self.headers = headers or {}
+        self.content_length = len(dados) if status in (200, 206) else None
+        self.content = ConteudoFalso(dados, cair_apos)
+        self.servidor = servidor
+
+    async def __aenter__(self):
+        self.servidor.ativos += 1
+        self.servidor.maximo_ativos = max(self.servidor.maximo_ativos, self.servidor.ativos)
+        return self
+
+    async def __aexit__(self, *args):
+        self.servidor.ativos -= 1
+        return False
+
+class ServidorDeArquivos:
+    """Sessão falsa que serve arquivos do ComfyUI com suporte a Range"""
+
+    def __init__(self, arquivos, quedas=0, sem_tamanho=False):
+        self.arquivos = arquivos
+        self.quedas = quedas
+        self.sem_tamanho = sem_tamanho
+        self.ranges = []
+        self.heads = 0
+        self.ativos = 0
+        self.maximo_ativos = 0
+
+    def get(self, url, headers=None):
+        dados = self.arquivos[url]
+        intervalo = (headers or {}).get('Range')
+        self.ranges.append(intervalo)
+        inicio = int(intervalo[len('bytes='):-1]) if intervalo else 0
+        if inicio >= len(dados):
+            return RespostaDeArquivo(416, headers={'Content-Range': f'bytes */{len(dados)}'}, servidor=self)
+
+        cair_apos = None
+        if self.quedas:
+            self.quedas -= 1
+            cair_apos = (len(dados) - inicio) // 2
+        status = 206 if inicio else 200
+        cabecalhos = {'Content-Range': f'bytes {inicio}-{len(dados) - 1}/{len(dados)}'} if inicio else {}
+        resposta = RespostaDeArquivo(status, dados[inicio:], cabecalhos, self, cair_apos)
+        if self.sem_tamanho:
+            # Sem Content-Length o corte do corpo só aparece no tamanho final
+            resposta.headers, resposta.content_length = {}, None
+            resposta.content.silencioso = True
+        return resposta
+
+    def head(self, url):
+        self.heads += 1
+        return RespostaDeArquivo(200, self.arquivos[url], servidor=self)
+
+@pytest.fixture
+def sem_espera(monkeypatch):
+    """Fixture que elimina a espera entre tentativas de download e registra os backoffs"""
+    dormir = asyncio.sleep
+    esperas = []
+
+    async def dormir_pouco(segundos, *args):
+        if segundos >= 1:
+            esperas.append(segundos)
+        await dormir(min(segundos, 0.01))
+
+    monkeypatch.setattr(comfy_manager.asyncio, 'sleep', dormir_pouco)
+    return esperas
+
+def _manager_com_servidor(servidor):
+    manager = ComfyUIManager(launch=False)
+    manager.session = servidor
+    return manager
+
+def test_download_retoma_arquivo_parcial(tmp_path, monkeypatch, sem_espera):
+    """Testa que o download continua do .part com Range em vez de recomeçar"""
+    monkeypatch.setitem(comfy_manager.COMFY_CONFIG, 'download_chunk_size', 4)
+    url = "http://comfy.local/view?filename=a.png"
+    servidor = ServidorDeArquivos({url: b"0123456789"})
+    (tmp_path / "a.png.part").write_bytes(b"0123")
+
+    assert asyncio.run(_manager_com_servidor(servidor)._download(url, tmp_path / "a.png"))
+    assert (tmp_path / "a.png").read_bytes() == b"0123456789"
+    assert not (tmp_path / "a.png.part").exists()
+    assert servidor.ranges == ["bytes=4-"]
+
+def test_download_tenta_de_novo_apos_queda(tmp_path, monkeypatch, sem_espera):
+    """Testa que uma conexão interrompida é retomada na tentativa seguinte"""
+    monkeypatch.setitem(comfy_manager.COMFY_CONFIG, 'download_chunk_size', 2)
+    url = "http://comfy.local/view?filename=b.png"
+    servidor = ServidorDeArquivos({url: b"abcdefghij"}, quedas=1)
+
+    assert asyncio.run(_manager_com_servidor(servidor)._download(url, tmp_path / "b.png"))
+    assert (tmp_path / "b.png").read_bytes() == b"abcdefghij"
+    assert servidor.ranges == [None, "bytes=6-"]
+
+def test_download_confere_tamanho_sem_cabecalhos(tmp_path, monkeypatch, sem_espera):
+    """Testa que, sem Content-Length, o tamanho final é conferido por HEAD"""
+    monkeypatch.setitem(comfy_manager.COMFY_CONFIG, 'download_chunk_size', 2)
+    url = "http://comfy.local/view?filename=c.png"
+    servidor = ServidorDeArquivos({url: b"abcdefghij"}, quedas=3, sem_tamanho=True)
+
+    assert not asyncio.run(_manager_com_servidor(servidor)._download(url, tmp_path / "c.png", retries=2))
+    assert not (tmp_path / "c.png").exists()
+    assert servidor.heads == 2
+    # Sem espera depois da última tentativa
+    assert sem_espera == [1]
+
+    servidor.quedas = 0
+    assert asyncio.run(_manager_com_servidor(servidor)._download(url, tmp_path / "c.png"))
+    assert (tmp_path / "c.png").read_bytes() == b"abcdefghij"
+
+def test_download_descarta_parcial_maior_que_o_arquivo(tmp_path, sem_espera):
+    """Testa que um .part maior que o arquivo remoto é descartado e baixado de novo"""
+    url = "http://comfy.local/view?filename=d.png"
+    servidor = ServidorDeArquivos({url: b"abc"})
+    (tmp_path / "d.png.part").write_bytes(b"arquivo antigo")
+
+    assert asyncio.run(_manager_com_servidor(servidor)._download(url, tmp_path / "d.png"))
+    assert (tmp_path / "d.png").read_bytes() == b"abc"
+    assert servidor.ranges == ["bytes=14-", None]
+
+def test_downloads_limitados_pelo_semaforo(tmp_path, monkeypatch):
+    """Testa que os outputs são baixados em paralelo até download_concurrency"""
+    monkeypatch.setitem(comfy_manager.COMFY_CONFIG, 'download_concurrency', 2)
+    monkeypatch.setitem(comfy_manager.COMFY_CONFIG, 'download_chunk_size', 1)
+    arquivos = {f"http://comfy.local/view?filename={i}.png": b"xyz" for i in range(6)}
+    servidor = ServidorDeArquivos(arquivos)
+    outputs = {"9": {f"imagem{i}": url for i, url in enumerate(arquivos)}}
+
+    salvos = asyncio.run(_manager_com_servidor(servidor)._save_outputs(outputs, tmp_path))
+    assert len(salvos) == 6
+    assert servidor.maximo_ativos == 2
+    assert all((tmp_path / f"9_imagem{i}.png").read_bytes() == b"xyz" for i in range(6))
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import pytest
+from core.comfy_manager import ComfyHTTPError
+from core.comfy_pool import ComfyUIPool
+
+class ComfyFalso:
+    """Instância do ComfyUI que registra os workflows recebidos"""
+
+    def __init__(self, nome, fila=0, falhar=False):
+        self.api_url = nome
+        self.fila = fila
+        self.falhar = falhar
+        self.executados = []
+        self.reinicios = 0
+
+    async def start_async(self):
+        return True
+
+    async def queue_depth(self):
+        if self.falhar:
+            raise ConnectionError("sem resposta")
+        return self.fila
+
+    async def execute_workflow(self, workflow_path, output_dir):
+        self.executados.append(workflow_path)
+        await asyncio.sleep(0.01)
+        return {'success': True, 'outputs': {}}
+
+    async def stop_workflow(self, workflow_id):
+        pass
+
+    async def stop(self):
+        self.reinicios += 1
+
+def _workflow(tmp_path, nome, checkpoint):
+    caminho = tmp_path / f"{nome}.json"
+    caminho.write_text(json.dumps({
+        "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": checkpoint}}
+    }))
+    return str(caminho)
+
+def test_prefere_worker_com_modelo_carregado(tmp_path):
+    """Testa que o workflow vai para quem já tem o checkpoint, salvo fila muito maior"""
+    async def cenario():
+        a, b = ComfyFalso("a", fila=1), ComfyFalso("b", fila=0)
+        pool = ComfyUIPool(managers=[a, b])
+        await pool.start_async()
+        await pool.refresh()
+        pool.workers[0].checkpoint = "sdxl.safetensors"
+
+        await pool.execute_workflow(_workflow(tmp_path, "w1", "sdxl.safetensors"), tmp_path)
+        assert len(a.executados) == 1
+
+        # Com a fila muito maior compensa trocar de modelo
+        a.fila = 10
+        await pool.refresh()
+        await pool.execute_workflow(_workflow(tmp_path, "w2", "sdxl.safetensors"), tmp_path)
+        assert len(b.executados) == 1
+        assert pool.workers[1].checkpoint == "sdxl.safetensors"
+        await pool.stop()
+
+    asyncio.run(cenario())
+
+def test_distribui_e_reinicia_worker_com_falha(tmp_path):
+    """Testa a distribuição de uma rajada e a drenagem de um worker que não responde"""
+    async def cenario():
+        a, b = ComfyFalso("a"), ComfyFalso("b")
+        pool = ComfyUIPool(managers=[a, b])
+        pool.max_failures = 2
+        await pool.start_async()
+
+        await asyncio.gather(*(
+            pool.execute_workflow(_workflow(tmp_path, f"w{i}", "sd15.ckpt"), tmp_path)
+            for i in range(4)
+        ))
+        assert len(a.executados) == 2 and len(b.executados) == 2
+
+        a.falhar = True
+        await pool.refresh()
+        assert pool.workers[0].healthy
+        await pool.refresh()
+
+        await asyncio.sleep(0.05)
+        assert a.reinicios == 1
+        assert pool.workers[0].healthy
+        await pool.stop()
+
+    asyncio.run(cenario())
+
+class ComfyQueRejeita(ComfyFalso):
+    """Instância que rejeita workflows com o status HTTP configurado"""
+
+    def __init__(self, nome, status):
+        super().__init__(nome)
+        self.status = status
+
+    async def execute_workflow(self, workflow_path, output_dir):
+        raise ComfyHTTPError("Erro ao enviar workflow", self.status)
+
+def test_workflow_invalido_nao_derruba_worker(tmp_path):
+    """Testa que só erros do servidor (5xx) contam como falha do worker"""
+    async def cenario():
+        comfy = ComfyQueRejeita("a", 400)
+        pool = ComfyUIPool(managers=[comfy])
+        pool.max_failures = 1
+        await pool.start_async()
+
+        with pytest.raises(ComfyHTTPError):
+            await pool.execute_workflow(_workflow(tmp_path, "w1", "sd15.ckpt"), tmp_path)
+        assert pool.workers[0].healthy and pool.workers[0].failures == 0
+
+        comfy.status = 502
+        with pytest.raises(ComfyHTTPError):
+            await pool.execute_workflow(_workflow(tmp_path, "w2", "sd15.ckpt"), tmp_path)
+        assert not pool.workers[0].healthy
+        await pool.stop()
+
+    asyncio.run(cenario())
+
+class ComfyQueNaoSobe(ComfyFalso):
+    """Instância que só volta a subir depois de algumas tentativas"""
+
+    def __init__(self, nome, falhas_ao_iniciar):
+        super().__init__(nome)
+        self.falhas_ao_iniciar = falhas_ao_iniciar
+        self.inicios = 0
+
+    async def start_async(self):
+        self.inicios += 1
+        if self.falhas_ao_iniciar:
+            self.falhas_ao_iniciar -= 1
+            raise ConnectionError("porta ocupada")
+        return True
+
+def test_worker_fora_de_rotacao_e_reiniciado_com_backoff(tmp_path):
+    """Testa que o monitor tenta reiniciar de novo, com espera crescente, um worker que não subiu"""
+    async def cenario():
+        a, b = ComfyFalso("a"), ComfyQueNaoSobe("b", falhas_ao_iniciar=3)
+        pool = ComfyUIPool(managers=[a, b])
+        pool.health_interval = 0.01
+        pool.restart_backoff = 0.05
+        await pool.start_async()
+        assert not pool.workers[1].healthy
+
+        # Dentro do backoff o worker não é tentado de novo
+        await asyncio.sleep(0.03)
+        assert b.inicios == 1
+
+        for _ in range(100):
+            if pool.workers[1].healthy:
+                break
+            await asyncio.sleep(0.02)
+        assert pool.workers[1].healthy
+        assert b.inicios == 4
+        assert pool.workers[1].restart_failures == 0
+        await pool.stop()
+
+    asyncio.run(cenario())
@@ -0,0 +1,32 @@
+import pytest
+from ai_engine.completion_cache import CompletionCache
+
+@pytest.fixture
+def cache(tmp_path):
+    """Fixture que cria um cache de completions temporário"""
+    return CompletionCache(path=tmp_path / "completions.sqlite3", max_entries=3)
+
+def test_chave_estavel():
+    """Testa que a chave depende apenas dos parâmetros da requisição"""
+    a = CompletionCache.make_key("modelo", "prompt", 100, 0, 0.95)
+    b = CompletionCache.make_key("modelo", "prompt", 100, 0, 0.95)
+    c = CompletionCache.make_key("modelo", "prompt", 100, 0.7, 0.95)
+    assert a == b
+    assert a != c
+
+def test_somente_deterministico():
+    """Testa a política de quais requisições são cacheadas"""
+    assert CompletionCache.should_cache(0)
+    assert not CompletionCache.should_cache(0.7)
+    assert CompletionCache.should_cache(0.7, cache=True)
+    assert not CompletionCache.should_cache(0, cache=False)
+
+def test_persistencia_e_limite(cache, tmp_path):
+    """Testa a persistência entre instâncias e o despejo por número de entradas"""
+    for i in range(4):
+        cache.set(f"k{i}", f"resposta {i}")
+
+    outro = CompletionCache(path=tmp_path / "completions.sqlite3", max_entries=3)
+    assert outro.get("k0") is None
+    assert outro.get("k3") == "resposta 3"
+    assert outro.get_stats()["entries"] == 3
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from core.cache_manager import CacheManager
+from core.dag_executor import DAGExecutor
+from core.generation_manager import GenerationManager
+
+def _etapas():
+    return [
+        {"name": "modelo", "type": "3d_model", "config": {}, "depends_on": []},
+        {"name": "cena", "type": "image", "config": {}, "depends_on": []},
+        {"name": "ui", "type": "ui", "config": {}, "depends_on": ["cena"]},
+        {"name": "logica", "type": "code", "config": {}, "depends_on": ["modelo", "cena", "ui"]}
+    ]
+
+def test_ordem_topologica_e_ciclos():
+    """Testa a ordenação em níveis e a detecção de ciclos"""
+    assert DAGExecutor.topological_order(_etapas()) == [["cena", "modelo"], ["ui"], ["logica"]]
+
+    ciclo = [
+        {"name": "a", "depends_on": ["b"]},
+        {"name": "b", "depends_on": ["a"]}
+    ]
+    with pytest.raises(ValueError):
+        DAGExecutor.topological_order(ciclo)
+
+def test_paralelismo_artefatos_e_retomada(tmp_path):
+    """Testa ramos concorrentes, passagem de saídas e retomada após falha"""
+    execucoes = []
+    ativos = {"agora": 0, "max": 0}
+    falhar = {"ui"}
+
+    async def executar(etapa, params, entradas):
+        execucoes.append(etapa["name"])
+        ativos["agora"] += 1
+        ativos["max"] = max(ativos["max"], ativos["agora"])
+        await asyncio.sleep(0.01)
+        ativos["agora"] -= 1
+        if etapa["name"] in falhar:
+            raise RuntimeError("falhou")
+        return {"de": etapa["name"], "entradas": sorted(entradas)}
+
+    executor = DAGExecutor(executar, cache=CacheManager(cache_dir=tmp_path / "cache"))
+
+    resultado = asyncio.run(executor.run(_etapas(), {"prompt": "jogo"}))
+    assert ativos["max"] == 2
+    assert resultado["failed"] == {"ui": "falhou"}
+    assert resultado["skipped"] == ["logica"]
+
+    # Na nova execução só rodam a etapa que falhou e as que dependem dela
+    falhar.clear()
+    execucoes.clear()
+    resultado = asyncio.run(executor.run(_etapas(), {"prompt": "jogo"}))
+    assert sorted(resultado["cached"]) == ["cena", "modelo"]
+    assert execucoes == ["ui", "logica"]
+    assert resultado["outputs"]["logica"]["entradas"] == ["cena", "modelo", "ui"]
+
+    # Outro prompt não aproveita o cache
+    execucoes.clear()
+    asyncio.run(executor.run(_etapas(), {"prompt": "outro"}))
+    assert len(execucoes) == 4
+
+def test_workflow_de_jogo(tmp_path, monkeypatch):
+    """Testa o workflow 'game' do GenerationManager executado como grafo"""
+    monkeypatch.chdir(tmp_path)
+    gerador = GenerationManager()
+    gerador._step_cache = CacheManager(cache_dir=tmp_path / "cache")
+
+    async def executar(workflow, params):
+        if "output_path" in params:
+            open(params["output_path"], "wb").close()
+        return {"status": "success", "metadata": {"inputs": params["inputs"]}}
+
+    monkeypatch.setattr(gerador, "_execute_workflow", executar)
+    resultado = asyncio.run(gerador.generate_workflow("um jogo de plataforma"))
+    assert resultado["status"] == "success"
+    entradas = resultado["outputs"]["game_logic"]["metadata"]["inputs"]
+    assert set(entradas) == {"character_model", "game_scene", "ui"}
+    assert entradas["ui"].endswith("ui.png")
+
+    resultado = asyncio.run(gerador.generate_workflow("um jogo de plataforma"))
+    assert len(resultado["metadata"]["cached_steps"]) == 4
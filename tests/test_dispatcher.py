@@ -0,0 +1,150 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from ai_engine.client import BatchingNotSupported
+import ai_engine.dispatcher as dispatcher_mod
+from ai_engine.dispatcher import LLMDispatcher, get_dispatcher
+
+class ClienteFalso:
+    """Cliente que registra as chamadas em vez de acessar o servidor"""
+
+    def __init__(self):
+        self.lotes = []
+        self.em_voo = 0
+        self.max_em_voo = 0
+
+    async def _chamar(self, prompts):
+        self.lotes.append(list(prompts))
+        self.em_voo += 1
+        self.max_em_voo = max(self.max_em_voo, self.em_voo)
+        await asyncio.sleep(0.01)
+        self.em_voo -= 1
+        return [f"r:{p}" for p in prompts]
+
+    async def complete(self, prompt, max_tokens, temperature, top_p):
+        return (await self._chamar([prompt]))[0]
+
+    async def complete_batch(self, prompts, max_tokens, temperature, top_p):
+        return await self._chamar(prompts)
+
+    async def close(self):
+        pass
+
+def test_lotes_e_limite_de_concorrencia():
+    """Testa o agrupamento de prompts e o limite de chamadas simultâneas"""
+    cliente = ClienteFalso()
+
+    async def executar():
+        dispatcher = LLMDispatcher("http://x", max_in_flight=1, max_batch_size=4, client=cliente)
+        resultados = await asyncio.gather(*[
+            dispatcher.submit(f"p{i}", user="u") for i in range(8)
+        ])
+        await dispatcher.close()
+        return resultados
+
+    resultados = asyncio.run(executar())
+    assert resultados == [f"r:p{i}" for i in range(8)]
+    assert len(cliente.lotes) == 2
+    assert cliente.max_em_voo == 1
+
+def test_rodizio_entre_usuarios():
+    """Testa que um usuário com muitas requisições não monopoliza o lote"""
+    cliente = ClienteFalso()
+
+    async def executar():
+        dispatcher = LLMDispatcher("http://x", max_in_flight=1, max_batch_size=2, client=cliente)
+        tarefas = [dispatcher.submit(f"a{i}", user="a") for i in range(4)]
+        tarefas.append(dispatcher.submit("b0", user="b"))
+        await asyncio.gather(*tarefas)
+        await dispatcher.close()
+
+    asyncio.run(executar())
+    assert cliente.lotes[0] == ["a0", "b0"]
+
+class ClienteSemLote(ClienteFalso):
+    """Cliente de um servidor que recusa ``prompt`` como lista"""
+
+    def __init__(self):
+        super().__init__()
+        self.recusas = 0
+
+    async def complete_batch(self, prompts, max_tokens, temperature, top_p):
+        self.recusas += 1
+        raise BatchingNotSupported("400")
+
+    async def stream(self, prompt, max_tokens, temperature, top_p):
+        self.em_voo += 1
+        self.max_em_voo = max(self.max_em_voo, self.em_voo)
+        for token in prompt.split():
+            await asyncio.sleep(0.005)
+            yield token
+        self.em_voo -= 1
+
+def test_deteccao_de_suporte_a_lotes():
+    """Testa o reenvio individual quando o servidor recusa o lote"""
+    cliente = ClienteSemLote()
+
+    async def executar():
+        dispatcher = LLMDispatcher("http://x", max_in_flight=1, max_batch_size=4, client=cliente)
+        primeira = await asyncio.gather(*[dispatcher.submit(f"p{i}", user="u") for i in range(3)])
+        segunda = await asyncio.gather(*[dispatcher.submit(f"q{i}", user="u") for i in range(3)])
+        await dispatcher.close()
+        return primeira + segunda, dispatcher
+
+    resultados, dispatcher = asyncio.run(executar())
+    assert resultados == [f"r:p{i}" for i in range(3)] + [f"r:q{i}" for i in range(3)]
+    assert dispatcher.supports_batching is False
+    assert cliente.recusas == 1
+    assert all(len(lote) == 1 for lote in cliente.lotes)
+
+def test_stream_ocupa_vaga_no_backend():
+    """Testa que streams entram no limite de chamadas simultâneas"""
+    cliente = ClienteSemLote()
+
+    async def executar():
+        dispatcher = LLMDispatcher("http://x", max_in_flight=1, supports_batching=False, client=cliente)
+
+        async def consumir(prompt, usuario):
+            return [token async for token in dispatcher.stream(prompt, user=usuario)]
+
+        resultados = await asyncio.gather(
+            consumir("a b c", "u1"), consumir("d e", "u2"), dispatcher.submit("x", user="u3")
+        )
+        await dispatcher.close()
+        return resultados
+
+    resultados = asyncio.run(executar())
+    assert resultados == [["a", "b", "c"], ["d", "e"], "r:x"]
+    assert cliente.max_em_voo == 1
+
+def test_dispatcher_compartilhado_entre_threads():
+    """Testa o dispatcher do processo usado a partir de várias threads"""
+    cliente = ClienteFalso()
+    dispatcher = get_dispatcher("http://compartilhado", max_in_flight=1, client=cliente)
+    assert get_dispatcher("http://compartilhado") is dispatcher
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        resultados = list(pool.map(lambda i: dispatcher.submit_sync(f"p{i}", user=f"u{i}"), range(8)))
+    assert resultados == [f"r:p{i}" for i in range(8)]
+    assert cliente.max_em_voo == 1
+
+def test_stream_sincrono_libera_vaga_ao_parar():
+    """Testa o stream bloqueante e a liberação da vaga quando o consumidor para"""
+    cliente = ClienteSemLote()
+    dispatcher = get_dispatcher("http://stream", max_in_flight=1, client=cliente)
+    assert list(dispatcher.stream_sync("a b c")) == ["a", "b", "c"]
+
+    tokens = dispatcher.stream_sync("d e f g")
+    assert next(tokens) == "d"
+    tokens.close()
+    assert dispatcher.submit_sync("x", timeout=5) == "r:x"
+
+def test_limites_do_dispatcher_vem_da_configuracao(monkeypatch):
+    """Testa que o dispatcher compartilhado usa max_in_flight da configuração"""
+    monkeypatch.setitem(dispatcher_mod.LLM_DISPATCH_CONFIG, "max_in_flight", 3)
+    cliente = ClienteFalso()
+    dispatcher = get_dispatcher("http://configurado", client=cliente)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: dispatcher.submit_sync(f"p{i}", user=f"u{i}", temperature=i), range(8)))
+    # Parâmetros diferentes impedem lotes: cada prompt ocupa uma vaga
+    assert cliente.max_em_voo == 3
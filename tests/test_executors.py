@@ -0,0 +1,54 @@
+import asyncio
+import threading
+from PIL import Image
+from core.executors import Executors
+from core.generation_manager import GenerationManager
+
+def test_pools_de_io_e_cpu():
+    """Testa que run_io usa threads e run_cpu não bloqueia o event loop"""
+    executores = Executors(io_workers=2, cpu_workers=1)
+
+    async def cenario():
+        nome = await executores.run_io(lambda: threading.current_thread().name)
+        assert nome.startswith("generation-io")
+
+        ticks = 0
+        async def relogio():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.001)
+                ticks += 1
+
+        tarefa = asyncio.create_task(relogio())
+        total = await executores.run_cpu(sum, range(3_000_000))
+        tarefa.cancel()
+        assert total == sum(range(3_000_000))
+        assert ticks > 0
+
+    try:
+        asyncio.run(cenario())
+    finally:
+        executores.shutdown()
+
+def test_geracao_concorrente_usa_executores(tmp_path, monkeypatch):
+    """Testa gerações simultâneas com codificação PNG fora do event loop"""
+    monkeypatch.chdir(tmp_path)
+    dormir = asyncio.sleep
+    monkeypatch.setattr(asyncio, "sleep", lambda segundos: dormir(0))
+
+    executores = Executors(io_workers=2, cpu_workers=2)
+    gerador = GenerationManager(executors=executores)
+
+    async def cenario():
+        return await asyncio.gather(*(
+            gerador.generate_image(f"imagem {i}", seed=i % 2) for i in range(4)
+        ))
+
+    try:
+        resultados = asyncio.run(cenario())
+    finally:
+        executores.shutdown()
+
+    assert all(r["status"] == "success" for r in resultados)
+    with Image.open(resultados[0]["image_url"]) as imagem:
+        assert imagem.size == (512, 512)
@@ -0,0 +1,47 @@
+import pytest
+from core.inference_backends import compare_backends, load_text_model, token_agreement
+
+class _Tokenizer:
+    def __call__(self, texto, return_tensors=None):
+        return {"input_ids": [[1, 2, 3]]}
+
+class _Modelo:
+    def __init__(self, continuacao):
+        self.continuacao = continuacao
+        self.chamadas = 0
+
+    def generate(self, input_ids, max_new_tokens, do_sample):
+        self.chamadas += 1
+        return [input_ids[0] + self.continuacao[:max_new_tokens]]
+
+def test_comparacao_de_backends():
+    """Testa as métricas de fidelidade em relação ao primeiro backend"""
+    modelos = {
+        "pytorch": _Modelo([10, 11, 12, 13]),
+        "int8": _Modelo([10, 11, 99, 13]),
+        "onnx": _Modelo([10, 11, 12, 13])
+    }
+
+    def carregar(chave, backend):
+        return {"model": modelos[backend], "tokenizer": _Tokenizer(), "backend": backend}
+
+    resultados = compare_backends("gpt2_medium", ["a", "b"], ["pytorch", "int8", "onnx"],
+                                  max_new_tokens=4, repeats=2, loader=carregar)
+
+    assert resultados["pytorch"]["token_agreement"] == 1.0
+    assert resultados["int8"]["token_agreement"] == 0.75
+    assert resultados["int8"]["exact_match"] == 0.0
+    assert resultados["onnx"]["exact_match"] == 1.0
+    assert resultados["onnx"]["latency_mean_ms"] is not None
+    # Aquecimento + repetições medidas, para cada prompt
+    assert modelos["int8"].chamadas == 2 * 3
+
+def test_concordancia_de_tokens():
+    """Testa a concordância entre gerações de tamanhos diferentes"""
+    assert token_agreement([], []) == 1.0
+    assert token_agreement([1, 2, 3, 4], [1, 2]) == 0.5
+
+def test_backend_desconhecido():
+    """Testa a rejeição de backends não suportados"""
+    with pytest.raises(ValueError):
+        load_text_model("dialogpt", "fp4")
@@ -0,0 +1,67 @@
+import json
+import time
+from pathlib import Path
+from config.system_config import DATA_DIR, INTENT_CLASSIFIER_CONFIG
+from core.intent_classifier import IntentClassifier
+
+EXEMPLOS = {
+    "cumprimento": ["olá tudo bem", "oi bom dia", "boa tarde pessoal", "olá bom dia a todos"],
+    "despedida": ["tchau até logo", "até amanhã tchau", "adeus até mais", "falou até a próxima"],
+    "agradecimento": ["muito obrigado", "obrigada pela ajuda", "valeu obrigado", "agradeço muito a ajuda"]
+}
+
+def _classificador(tmp_path):
+    return IntentClassifier(model_path=tmp_path / "modelo.npz", log_path=tmp_path / "intencoes.jsonl")
+
+def test_treina_com_classificacoes_registradas(tmp_path, monkeypatch):
+    """Testa o treino a partir do log do zero-shot e a persistência do modelo"""
+    monkeypatch.setitem(INTENT_CLASSIFIER_CONFIG, "min_examples", 10)
+    monkeypatch.setitem(INTENT_CLASSIFIER_CONFIG, "retrain_every", 0)
+    classificador = _classificador(tmp_path)
+    assert classificador.predict("olá") is None
+
+    for intencao, textos in EXEMPLOS.items():
+        for texto in textos * 3:
+            classificador.log(texto, intencao, 0.9)
+    classificador.log("texto ambíguo", "reclamação", 0.2)
+    assert classificador.train()
+    assert "reclamação" not in classificador.labels
+
+    inicio = time.perf_counter()
+    resultado = classificador.predict("olá bom dia")
+    assert time.perf_counter() - inicio < 0.05
+    assert resultado["intencao"] == "cumprimento"
+
+    # O modelo salvo é carregado por uma nova instância
+    recarregado = _classificador(tmp_path)
+    assert recarregado.predict("muito obrigado")["intencao"] == "agradecimento"
+
+def test_poucos_exemplos_nao_treinam(tmp_path):
+    """Testa que o modelo não é treinado sem exemplos suficientes"""
+    classificador = _classificador(tmp_path)
+    assert not classificador.train(["oi", "tchau"], ["cumprimento", "despedida"])
+    assert not classificador.trained
+
+def test_log_mantem_os_exemplos_mais_recentes(tmp_path, monkeypatch):
+    """Testa que o log de treino é limitado aos exemplos mais recentes"""
+    monkeypatch.setitem(INTENT_CLASSIFIER_CONFIG, "retrain_every", 0)
+    monkeypatch.setitem(INTENT_CLASSIFIER_CONFIG, "max_log_examples", 8)
+    classificador = _classificador(tmp_path)
+
+    for i in range(30):
+        classificador.log(f"texto {i}", "cumprimento", 0.9)
+    linhas = (tmp_path / "intencoes.jsonl").read_text(encoding="utf-8").splitlines()
+    assert 8 <= len(linhas) <= 10
+    assert json.loads(linhas[-1])["texto"] == "texto 29"
+
+    # Uma nova instância continua a partir do log existente
+    outro = _classificador(tmp_path)
+    for i in range(30, 40):
+        outro.log(f"texto {i}", "cumprimento", 0.9)
+    textos, _ = outro._load_examples()
+    assert len(textos) <= 10 and textos[-1] == "texto 39"
+
+def test_caminhos_padrao_ancorados_no_projeto():
+    """Testa que o modelo e o log ficam em data/ do projeto, independente do diretório atual"""
+    assert Path(INTENT_CLASSIFIER_CONFIG["log_path"]) == DATA_DIR / "intencoes.jsonl"
+    assert Path(INTENT_CLASSIFIER_CONFIG["model_path"]).is_absolute()
@@ -0,0 +1,43 @@
+import json
+from ai_engine.client import LLMClient, _DONE, _parse_sse_line
+
+def _evento(texto):
+    return "data: " + json.dumps({"choices": [{"text": texto}]})
+
+def test_parse_sse_line():
+    """Testa a interpretação das linhas do stream SSE de completions"""
+    assert _parse_sse_line(_evento("olá")) == "olá"
+    assert _parse_sse_line("data:" + json.dumps({"choices": [{"text": "x"}]})) == "x"
+    assert _parse_sse_line("data: [DONE]") is _DONE
+
+    # Comentários, linhas vazias e outros campos SSE são ignorados
+    assert _parse_sse_line(": keep-alive") is None
+    assert _parse_sse_line("") is None
+    assert _parse_sse_line("event: message") is None
+
+    # JSON malformado ou sem texto não interrompe o stream
+    assert _parse_sse_line("data: {inválido") is None
+    assert _parse_sse_line("data: " + json.dumps({"choices": []})) is None
+    assert _parse_sse_line(_evento("")) is None
+
+class _RespostaFalsa:
+    status_code = 200
+
+    def __init__(self, linhas):
+        self.linhas = linhas
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def iter_lines(self, decode_unicode=True):
+        return iter(self.linhas)
+
+def test_stream_para_no_done(monkeypatch):
+    """Testa que o stream entrega os tokens e para no marcador [DONE]"""
+    cliente = LLMClient("http://x")
+    linhas = [_evento("a"), ": ping", None, _evento("b"), "data: [DONE]", _evento("c")]
+    monkeypatch.setattr(cliente.session, "post", lambda *args, **kwargs: _RespostaFalsa(linhas))
+    assert list(cliente.stream("prompt")) == ["a", "b"]
@@ -0,0 +1,46 @@
+import threading
+from core.model_registry import ModelRegistry
+
+def _registro(**kwargs):
+    registro = ModelRegistry(idle_timeout=0, check_interval=0, **kwargs)
+    cargas = []
+
+    def carregador(nome):
+        def carregar():
+            cargas.append(nome)
+            return {"nome": nome}
+        return carregar
+
+    registro.register("a", carregador("a"))
+    registro.register("b", carregador("b"))
+    return registro, cargas
+
+def test_carga_sob_demanda_e_compartilhada():
+    """Testa que o modelo só carrega no primeiro uso, uma única vez"""
+    registro, cargas = _registro()
+    assert cargas == [] and registro.loaded() == []
+
+    threads = [threading.Thread(target=registro.get, args=("a",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cargas == ["a"]
+    assert registro.get("a") is registro.get("a")
+    assert registro.loaded() == ["a"]
+
+def test_descarrega_ociosos_sob_pressao(monkeypatch):
+    """Testa o descarregamento dos modelos mais antigos enquanto houver pressão"""
+    registro, cargas = _registro(max_memory_mb=1000)
+    registro.get("a")
+    registro.get("b")
+
+    uso = iter([2000, 500])
+    monkeypatch.setattr(registro, "memory_usage_mb", lambda: next(uso))
+    assert registro.unload_idle() == ["a"]
+    assert registro.loaded() == ["b"]
+
+    # Volta a carregar no próximo uso
+    registro.get("a")
+    assert cargas == ["a", "b", "a"]
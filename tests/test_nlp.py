@@ -0,0 +1,187 @@
+import numpy as np
+import pytest
+import core.nlp as nlp
+from core.model_registry import ModelRegistry
+from core.nlp import ProcessadorLinguagem
+
+class MorfologiaFalsa:
+    def get(self, chave):
+        return []
+
+class TokenFalso:
+    def __init__(self, texto):
+        self.text = texto
+        # Palavras com inicial maiúscula são substantivos próprios; as demais, substantivos
+        self.pos_ = "PROPN" if texto[:1].isupper() else "NOUN"
+        self.prob = -len(texto)
+        self.morph = MorfologiaFalsa()
+
+class DocFalso:
+    def __init__(self, texto):
+        self.text = texto
+        self.tokens = [TokenFalso(palavra) for palavra in texto.split()]
+        self.ents = []
+        self.vector = np.array([len(texto), texto.count("a") + 1, 1.0])
+
+    def __iter__(self):
+        return iter(self.tokens)
+
+class TokenizadorFalso:
+    def __init__(self):
+        self.textos = []
+
+    def pipe(self, textos, batch_size=None):
+        textos = list(textos)
+        self.textos.extend(textos)
+        return (DocFalso(texto) for texto in textos)
+
+class SpacyFalso:
+    """Pipeline do spaCy que registra as chamadas a ``pipe``"""
+
+    def __init__(self):
+        self.chamadas = []
+        self.tokenizer = TokenizadorFalso()
+
+    def __call__(self, texto):
+        return DocFalso(texto)
+
+    def pipe(self, textos, batch_size=None, n_process=1):
+        textos = list(textos)
+        self.chamadas.append((textos, batch_size))
+        return (DocFalso(texto) for texto in textos)
+
+class ZeroShotFalso:
+    """Pipeline zero-shot que responde pela primeira palavra do texto"""
+
+    INTENCOES = {"obrigado": "agradecimento", "tchau": "despedida", "abra": "comando"}
+
+    def __init__(self):
+        self.lotes = []
+
+    def _classificar(self, texto, rotulos):
+        intencao = self.INTENCOES.get(texto.split()[0], "pergunta")
+        return {"sequence": texto, "labels": [intencao] + [r for r in rotulos if r != intencao],
+                "scores": [0.9] + [0.1 / (len(rotulos) - 1)] * (len(rotulos) - 1)}
+
+    def __call__(self, textos, rotulos, batch_size=None):
+        if isinstance(textos, str):
+            self.lotes.append([textos])
+            return self._classificar(textos, rotulos)
+        self.lotes.append(list(textos))
+        resultados = [self._classificar(texto, rotulos) for texto in textos]
+        # Como o pipeline do transformers, um único texto devolve um dict
+        return resultados[0] if len(resultados) == 1 else resultados
+
+class ClassificadorRapidoFalso:
+    """Modelo leve que só reconhece cumprimentos e registra os exemplos recebidos"""
+
+    def __init__(self):
+        self.exemplos = []
+
+    def predict(self, texto):
+        if texto.startswith("olá"):
+            return {"intencao": "cumprimento", "confianca": 0.99}
+        return {"intencao": "pergunta", "confianca": 0.3}
+
+    def log(self, texto, intencao, confianca):
+        self.exemplos.append((texto, intencao))
+
+class AnalisadorFalso:
+    def polarity_scores(self, texto):
+        return {"compound": 0.5 if "obrigado" in texto else 0.0}
+
+class StopwordsFalsas:
+    @staticmethod
+    def words(idioma):
+        return ["de", "o", "a"]
+
+@pytest.fixture
+def processador(monkeypatch):
+    """Fixture com spaCy e zero-shot falsos fornecidos pelo registro de modelos"""
+    monkeypatch.setattr(nlp, "SentimentIntensityAnalyzer", AnalisadorFalso)
+    monkeypatch.setattr(nlp, "stopwords", StopwordsFalsas)
+    registro = ModelRegistry(idle_timeout=0, check_interval=0)
+    spacy, zero_shot = SpacyFalso(), ZeroShotFalso()
+    registro.register("spacy_pt", lambda: spacy)
+    registro.register("zero_shot", lambda: zero_shot)
+    return ProcessadorLinguagem(modelos=registro, classificador_rapido=ClassificadorRapidoFalso())
+
+TEXTOS = ["olá tudo bem", "obrigado pela ajuda", "abra o arquivo", "tchau até logo", "quem é Ana"]
+
+def test_processamento_em_lote(processador):
+    """Testa que spaCy e zero-shot recebem lotes e que a ordem de entrada é mantida"""
+    analises = list(processador.processar_entradas(iter(TEXTOS), batch_size=2))
+
+    assert [a["texto_original"] for a in analises] == TEXTOS
+    assert [a["intencao"]["intencao"] for a in analises] == [
+        "cumprimento", "agradecimento", "comando", "despedida", "pergunta"
+    ]
+    assert processador.nlp.chamadas == [(TEXTOS, 2)]
+    # O cumprimento é resolvido pelo modelo leve e não vai ao zero-shot
+    assert processador.classificador_intencoes.lotes == [
+        ["obrigado pela ajuda"], ["abra o arquivo", "tchau até logo"], ["quem é Ana"]
+    ]
+    assert analises[1]["sentimento"]["sentimento"] == "positivo"
+    assert analises[4]["tokens"] == ["quem", "é", "Ana"]
+
+def test_classificacao_de_intencoes_em_lote(processador):
+    """Testa uma só chamada ao zero-shot para os textos em que o modelo leve não confia"""
+    classificacoes = processador.classificar_intencoes(TEXTOS, batch_size=8)
+
+    assert [c["intencao"] for c in classificacoes] == [
+        "cumprimento", "agradecimento", "comando", "despedida", "pergunta"
+    ]
+    assert classificacoes[0]["confianca"] == 0.99
+    assert processador.classificador_intencoes.lotes == [TEXTOS[1:]]
+    # Só as respostas do zero-shot viram exemplos de treino
+    assert [texto for texto, _ in processador.classificador_rapido.exemplos] == TEXTOS[1:]
+    assert processador.classificar_intencoes([]) == []
+
+def test_palavras_chave_em_lote(processador):
+    """Testa a extração de palavras-chave com um único nlp.pipe, na ordem de entrada"""
+    palavras = list(processador.extrair_palavras_chave_lote(["o gato de Ana", "a casa"], batch_size=16))
+
+    # Sem stopwords e ordenadas pela importância (prob do token)
+    assert [[p["palavra"] for p in lista] for lista in palavras] == [["Ana", "gato"], ["casa"]]
+    assert palavras[0][0]["tipo"] == "PROPN"
+    assert processador.nlp.chamadas == [(["o gato de Ana", "a casa"], 16)]
+
+def test_cache_de_vetores(processador):
+    """Testa que textos já vistos não voltam ao tokenizador"""
+    primeiro = processador.similaridades("gato", ["casa", "gato"])
+    assert processador.similaridades("casa", ["gato", "sapo"]) is not None
+    assert processador.nlp.tokenizer.textos == ["gato", "casa", "sapo"]
+    assert primeiro[1] == pytest.approx(1.0)
+
+class TokenizadorConversaFalso:
+    def encode(self, texto, return_tensors=None):
+        return [texto]
+
+    def decode(self, saida, skip_special_tokens=True):
+        return f"resposta para {saida}"
+
+class ModeloConversaFalso:
+    def generate(self, entradas, **kwargs):
+        return entradas
+
+def test_conversas_indexadas_em_lote(processador, tmp_path, monkeypatch):
+    """Testa que as mensagens vão ao índice em lotes e que só as mais recentes são mantidas"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(nlp.VECTOR_INDEX_CONFIG, "conversation_batch_size", 3)
+    monkeypatch.setitem(nlp.VECTOR_INDEX_CONFIG, "max_conversations", 4)
+    processador.modelos.register("dialogpt", lambda: {
+        "model": ModeloConversaFalso(), "tokenizer": TokenizadorConversaFalso()
+    })
+    escritas = []
+    add_many = nlp.VectorIndex.add_many
+    monkeypatch.setattr(nlp.VectorIndex, "add_many",
+                        lambda indice, itens: escritas.append(list(itens)) or add_many(indice, escritas[-1]))
+
+    for i in range(7):
+        assert processador.gerar_resposta(f"mensagem {i}") == f"resposta para mensagem {i}"
+    assert [len(lote) for lote in escritas] == [3, 3]
+
+    # A busca grava antes as mensagens pendentes
+    resultados = processador.buscar_semelhantes("mensagem 6", k=10, fonte="conversa")
+    assert [len(lote) for lote in escritas] == [3, 3, 1]
+    assert sorted(r["texto"] for r in resultados) == [f"mensagem {i}" for i in range(3, 7)]
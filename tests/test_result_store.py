@@ -0,0 +1,95 @@
+import os
+import asyncio
+from core.generation_manager import GenerationManager
+from core.result_store import ResultStore
+
+def _gerador(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    gerador = GenerationManager()
+    chamadas = []
+
+    async def executar(workflow, params):
+        chamadas.append(params)
+        await asyncio.sleep(0.01)
+        with open(params["output_path"], "wb") as f:
+            f.write(b"png")
+        return {"status": "success", "metadata": {"seed": params.get("seed")}}
+
+    monkeypatch.setattr(gerador, "_execute_workflow", executar)
+    return gerador, chamadas
+
+def test_pedidos_deterministicos_reaproveitam_artefato(tmp_path, monkeypatch):
+    """Testa que prompt, config e seed iguais retornam o mesmo arquivo"""
+    gerador, chamadas = _gerador(tmp_path, monkeypatch)
+
+    async def cenario():
+        # Pedidos idênticos simultâneos geram uma só vez
+        a, b = await asyncio.gather(
+            gerador.generate_image("um gato", seed=42),
+            gerador.generate_image("um gato", seed=42)
+        )
+        c = await gerador.generate_image("um gato", seed=42)
+        d = await gerador.generate_image("um gato", seed=7)
+        e = await gerador.generate_image("um gato")
+        f = await gerador.generate_image("um gato")
+        return a, b, c, d, e, f
+
+    a, b, c, d, e, f = asyncio.run(cenario())
+    assert a["image_url"] == b["image_url"] == c["image_url"]
+    assert c["cached"] and not a["cached"]
+    assert len({a["image_url"], d["image_url"], e["image_url"], f["image_url"]}) == 4
+    assert len(chamadas) == 4
+
+    # Arquivo apagado externamente é gerado de novo
+    os.remove(a["image_url"])
+    g = asyncio.run(gerador.generate_image("um gato", seed=42))
+    assert not g["cached"] and os.path.exists(g["image_url"])
+
+def test_coleta_de_lixo(tmp_path, monkeypatch):
+    """Testa a remoção de artefatos sem referências, preservando arquivos que o store não criou"""
+    gerador, _ = _gerador(tmp_path, monkeypatch)
+    a = asyncio.run(gerador.generate_image("um gato", seed=1))["image_url"]
+    asyncio.run(gerador.generate_image("um gato", seed=1))
+    b = asyncio.run(gerador.generate_image("um cachorro", seed=1))["image_url"]
+    externo = os.path.join(gerador.image_dir, "externo.png")
+    open(externo, "wb").close()
+
+    assert gerador.release_output(a) == 1
+    assert gerador.release_output(a) == 0
+    assert gerador.collect_garbage(grace_period=60) == []
+
+    removidos = gerador.collect_garbage(grace_period=-1)
+    assert removidos == [os.path.abspath(a)]
+    assert os.path.exists(b) and os.path.exists(externo)
+    assert gerador.results.get_stats() == {"entries": 1, "referenced": 1, "orphaned": 0}
+
+def test_coleta_de_geracao_interrompida(tmp_path, monkeypatch):
+    """Testa que a saída parcial de uma geração que falhou é coletada depois"""
+    gerador, _ = _gerador(tmp_path, monkeypatch)
+
+    async def falhar(workflow, params):
+        with open(params["output_path"], "wb") as f:
+            f.write(b"parcial")
+        raise RuntimeError("ComfyUI caiu")
+
+    monkeypatch.setattr(gerador, "_execute_workflow", falhar)
+    resultado = asyncio.run(gerador.generate_image("um gato", seed=3))
+    assert resultado["status"] == "error"
+
+    parciais = [os.path.join(gerador.image_dir, nome) for nome in os.listdir(gerador.image_dir)]
+    assert len(parciais) == 1
+    assert gerador.collect_garbage(grace_period=60) == []
+    assert gerador.collect_garbage(grace_period=-1) == [os.path.abspath(parciais[0])]
+
+def test_registro_mantem_referencias(tmp_path):
+    """Testa que registrar de novo uma chave existente soma uma referência"""
+    store = ResultStore(tmp_path / "results.sqlite3")
+    caminho = tmp_path / "a.png"
+    caminho.write_bytes(b"png")
+
+    store.register("chave", str(caminho), "image")
+    assert store.acquire("chave")["refcount"] == 2
+    store.register("chave", str(caminho), "image", {"seed": 1})
+    assert store.release(str(caminho)) == 2
+    assert store.acquire("chave")["metadata"] == {"seed": 1}
+    store.close()
@@ -0,0 +1,116 @@
+import numpy as np
+from core.vector_index import VectorIndex
+
+def _vetores(n, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+def test_busca_top_k(tmp_path):
+    """Testa a busca semântica exata, filtro por fonte e substituição de ids"""
+    indice = VectorIndex(tmp_path)
+    vetores = _vetores(50)
+    indice.add_many(
+        (f"doc{i}", vetor, f"texto {i}", "fatos" if i % 2 else "conversa", {"i": i})
+        for i, vetor in enumerate(vetores)
+    )
+    assert len(indice) == 50
+
+    resultados = indice.search(vetores[7] * 3, k=3)
+    assert [r["id"] for r in resultados][0] == "doc7"
+    assert abs(resultados[0]["score"] - 1.0) < 1e-5
+    assert resultados[0]["metadados"] == {"i": 7}
+    assert resultados[0]["score"] >= resultados[1]["score"] >= resultados[2]["score"]
+
+    assert all(r["fonte"] == "conversa" for r in indice.search(vetores[7], k=5, source="conversa"))
+
+    # Substituir um id descarta o vetor antigo
+    indice.add("doc7", vetores[8], "novo texto 7", "fatos")
+    assert len(indice) == 50
+    ids = [r["id"] for r in indice.search(vetores[8], k=2)]
+    assert sorted(ids) == ["doc7", "doc8"]
+    assert indice.remove("doc8")
+    assert "doc8" not in [r["id"] for r in indice.search(vetores[8], k=5)]
+
+def test_persistencia_e_compactacao(tmp_path):
+    """Testa a reabertura do índice em disco e a compactação das linhas removidas"""
+    vetores = _vetores(10)
+    indice = VectorIndex(tmp_path)
+    indice.add_many((f"doc{i}", vetor, None, None, None) for i, vetor in enumerate(vetores))
+    indice.remove("doc3")
+    indice.close()
+
+    # Vetor escrito sem a entrada correspondente (queda no meio de uma inserção)
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(_vetores(1).tobytes())
+
+    indice = VectorIndex(tmp_path)
+    assert len(indice) == 9 and "doc3" not in indice
+    assert np.allclose(indice.vector("doc5"), VectorIndex.normalize(vetores[5]))
+
+    assert indice.compact() == 1
+    assert indice.matrix.shape == (9, 16)
+    assert indice.search(vetores[9], k=1)[0]["id"] == "doc9"
+
+    reaberto = VectorIndex(tmp_path)
+    assert len(reaberto) == 9
+    assert np.allclose(reaberto.vector("doc9"), VectorIndex.normalize(vetores[9]))
+
+def test_compactacao_interrompida(tmp_path, monkeypatch):
+    """Testa que uma queda entre o commit e a troca dos arquivos é concluída na reabertura"""
+    import core.vector_index as vector_index
+    vetores = _vetores(6)
+    indice = VectorIndex(tmp_path)
+    indice.add_many((f"doc{i}", vetor, None, None, None) for i, vetor in enumerate(vetores))
+    indice.remove("doc1")
+
+    def queda(*args):
+        raise OSError("processo interrompido")
+
+    with monkeypatch.context() as m:
+        m.setattr(vector_index.os, "replace", queda)
+        try:
+            indice.compact()
+        except OSError:
+            pass
+    indice.close()
+
+    reaberto = VectorIndex(tmp_path)
+    assert len(reaberto) == 5 and reaberto.matrix.shape == (5, 16)
+    assert not (tmp_path / "vectors.tmp").exists()
+    for i in (0, 2, 5):
+        assert np.allclose(reaberto.vector(f"doc{i}"), VectorIndex.normalize(vetores[i]))
+
+def test_temporario_sem_marcador_e_descartado(tmp_path):
+    """Testa que um .tmp de compactação anterior ao commit é ignorado"""
+    vetores = _vetores(4)
+    indice = VectorIndex(tmp_path)
+    indice.add_many((f"doc{i}", vetor, None, None, None) for i, vetor in enumerate(vetores))
+    indice.close()
+    (tmp_path / "vectors.tmp").write_bytes(_vetores(2, seed=1).tobytes())
+
+    reaberto = VectorIndex(tmp_path)
+    assert not (tmp_path / "vectors.tmp").exists()
+    assert len(reaberto) == 4
+    assert np.allclose(reaberto.vector("doc3"), VectorIndex.normalize(vetores[3]))
+
+def test_retencao_por_fonte(tmp_path, monkeypatch):
+    """Testa a remoção das entradas mais antigas de uma fonte, por quantidade e por idade"""
+    import core.vector_index as vector_index
+    agora = [1000.0]
+    monkeypatch.setattr(vector_index.time, "time", lambda: agora[0])
+    vetores = _vetores(8)
+    indice = VectorIndex(tmp_path)
+    indice.add_many((f"fato{i}", vetores[i], None, "fatos", None) for i in range(2))
+    for i in range(2, 8):
+        agora[0] += 10
+        indice.add(f"conversa{i}", vetores[i], None, "conversa")
+
+    assert indice.prune("conversa", max_entries=4) == 2
+    assert "conversa3" not in indice and "conversa4" in indice
+
+    # As 2 restantes mais antigas (t=1030, 1040) passam da idade máxima; com
+    # metade das linhas removidas o arquivo é compactado
+    agora[0] += 5
+    assert indice.prune("conversa", max_age=20) == 2
+    assert sorted(indice._rows_by_id) == ["conversa6", "conversa7", "fato0", "fato1"]
+    assert indice.matrix.shape == (4, 16)
+    assert indice.prune("fatos", max_entries=10) == 0
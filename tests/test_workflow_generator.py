@@ -0,0 +1,152 @@
+import os
+import copy
+import json
+import pytest
+from workflow_generator import WorkflowGenerator, ImageBatcher, ImageRequest
+
+def test_agrupa_pedidos_compativeis(tmp_path, monkeypatch):
+    """Testa que pedidos com mesmo modelo e amostragem viram um só workflow"""
+    monkeypatch.chdir(tmp_path)
+    batcher = ImageBatcher(WorkflowGenerator())
+    ids = [batcher.add(ImageRequest("um gato")) for _ in range(3)]
+    outro = batcher.add(ImageRequest("um cachorro"))
+    sdxl = batcher.add(ImageRequest("um gato", checkpoint="sdxl.safetensors"))
+
+    lotes = batcher.flush()
+    assert len(lotes) == 2
+    assert batcher.pending == []
+
+    lote = next(l for l in lotes if sdxl not in l.slots)
+    workflow = lote.workflow
+    carregadores = [n for n in workflow.values() if n["class_type"] == "CheckpointLoaderSimple"]
+    latentes = sorted(n["inputs"]["batch_size"] for n in workflow.values()
+                      if n["class_type"] == "EmptyLatentImage")
+    assert len(carregadores) == 1
+    assert latentes == [1, 3]
+
+    # Todas as referências apontam para nós existentes
+    for node in workflow.values():
+        for valor in node["inputs"].values():
+            if isinstance(valor, list):
+                assert valor[0] in workflow
+
+    # Os outputs voltam para cada pedido
+    outputs = {
+        no: {"images": [{"filename": f"{no}_{i}.png"} for i in range(3)]}
+        for no, n in workflow.items() if n["class_type"] == "SaveImage"
+    }
+    resultados = lote.split_outputs(outputs)
+    assert len({resultados[i]["filename"] for i in ids}) == 3
+    assert resultados[outro] is not None
+
+def test_seed_explicita_nao_compartilha_lote(tmp_path, monkeypatch):
+    """Testa que pedidos com seed própria ganham seu próprio lote latente"""
+    monkeypatch.chdir(tmp_path)
+    batcher = ImageBatcher(WorkflowGenerator(), max_batch_size=8)
+    batcher.add(ImageRequest("um gato", seed=1))
+    batcher.add(ImageRequest("um gato", seed=2))
+
+    chamadas = []
+    resultados = batcher.run(lambda wf: chamadas.append(wf) or {})
+    assert len(chamadas) == 1
+    seeds = sorted(n["inputs"]["seed"] for n in chamadas[0].values() if n["class_type"] == "KSampler")
+    assert seeds == [1, 2]
+    assert all(valor is None for valor in resultados.values())
+
+def test_template_compilado(tmp_path, monkeypatch):
+    """Testa slots nomeados, isolamento entre instâncias e recarga incremental"""
+    monkeypatch.chdir(tmp_path)
+    gerador = WorkflowGenerator()
+    gerador.save_template(gerador.create_image_workflow("base"), "imagem")
+
+    a = gerador.instantiate_template("imagem", prompt="um gato", seed=1, size=(768, 512))
+    b = gerador.instantiate_template("imagem", prompt="um cachorro", steps=30)
+    assert a["1"]["inputs"]["text"] == "um gato"
+    assert a["3"]["inputs"]["seed"] == 1
+    assert (a["5"]["inputs"]["width"], a["5"]["inputs"]["height"]) == (768, 512)
+    assert b["1"]["inputs"]["text"] == "um cachorro"
+    assert b["3"]["inputs"]["steps"] == 30 and b["3"]["inputs"]["seed"] == 8566257
+    assert a["3"]["inputs"]["model"] == ["4", 0]
+
+    # Alterar uma instância não afeta o template nem as outras
+    a["1"]["inputs"]["text"] = "outro"
+    assert gerador.instantiate_template("imagem")["1"]["inputs"]["text"] == "base"
+
+    # Só o arquivo alterado é relido
+    compilado = gerador.compile_template("imagem")
+    gerador.reload_templates()
+    assert gerador.compile_template("imagem") is compilado
+
+    arquivo = tmp_path / "workflow_templates" / "imagem.json"
+    dados = json.loads(arquivo.read_text())
+    dados["3"]["inputs"]["steps"] = 50
+    arquivo.write_text(json.dumps(dados))
+    os.utime(arquivo, (0, 12345))
+    gerador.reload_templates()
+    assert gerador.instantiate_template("imagem")["3"]["inputs"]["steps"] == 50
+
+    arquivo.unlink()
+    gerador.reload_templates()
+    assert gerador.instantiate_template("imagem") is None
+
+def test_template_salvo_e_independente(tmp_path, monkeypatch):
+    """Testa que alterar o dict passado a save_template não muda o template salvo"""
+    monkeypatch.chdir(tmp_path)
+    gerador = WorkflowGenerator()
+    workflow = gerador.create_image_workflow("base")
+    gerador.save_template(workflow, "imagem")
+
+    workflow["3"]["inputs"]["steps"] = 99
+    workflow["3"]["inputs"]["model"][0] = "99"
+    assert gerador.load_template("imagem")["3"]["inputs"]["steps"] == 20
+    instancia = gerador.instantiate_template("imagem")
+    assert instancia["3"]["inputs"]["steps"] == 20
+    assert instancia["3"]["inputs"]["model"] == ["4", 0]
+
+def test_instancia_compartilha_nos_sem_parametros(tmp_path, monkeypatch):
+    """Testa que só os nós com parâmetros são copiados e que os compartilhados não podem ser alterados"""
+    monkeypatch.chdir(tmp_path)
+    gerador = WorkflowGenerator()
+    gerador.save_template(gerador.create_image_workflow("base"), "imagem")
+
+    a = gerador.instantiate_template("imagem", seed=1)
+    b = gerador.instantiate_template("imagem", seed=2)
+    assert a["4"] is b["4"] and a["6"] is b["6"]
+    assert a["3"] is not b["3"]
+
+    # Os links continuam sendo listas, como no JSON
+    links = [valor for no in a.values() for valor in no["inputs"].values() if isinstance(valor, list)]
+    assert links and json.loads(json.dumps(a))["6"]["inputs"]["samples"] == ["3", 0]
+
+    with pytest.raises(TypeError):
+        a["6"]["inputs"]["vae"][0] = "outro"
+    with pytest.raises(TypeError):
+        a["4"]["inputs"]["ckpt_name"] = "outro.ckpt"
+    a["3"]["inputs"]["model"][0] = "outro"
+
+    copia = copy.deepcopy(a)
+    copia["6"]["inputs"]["vae"][0] = "outro"
+    instancia = gerador.instantiate_template("imagem")
+    assert instancia["6"]["inputs"]["vae"] == ["4", 2]
+    assert instancia["3"]["inputs"]["model"] == ["4", 0]
+
+def test_personalizacao_nao_altera_template(tmp_path, monkeypatch):
+    """Testa que alterar o workflow personalizado não muda o template em cache"""
+    monkeypatch.chdir(tmp_path)
+    gerador = WorkflowGenerator()
+    gerador.save_template(gerador.create_image_workflow("base"), "imagem")
+
+    workflow = gerador.customize_workflow(gerador.load_template("imagem"), {"3": {"steps": 40}})
+    assert workflow["3"]["inputs"]["steps"] == 40
+    workflow["6"]["inputs"]["vae"][0] = "outro"
+    workflow["7"]["inputs"]["filename_prefix"] = "outro"
+
+    template = gerador.load_template("imagem")
+    assert template["3"]["inputs"]["steps"] == 20
+    assert template["6"]["inputs"]["vae"] == ["4", 2]
+    assert template["7"]["inputs"]["filename_prefix"] == "ComfyUI"
+
+    # Um workflow instanciado também pode ser personalizado
+    personalizado = gerador.customize_workflow(gerador.instantiate_template("imagem"), {"6": {"vae": ["4", 1]}})
+    assert personalizado["6"]["inputs"]["vae"] == ["4", 1]
+    assert gerador.instantiate_template("imagem")["6"]["inputs"]["vae"] == ["4", 2]
@@ -0,0 +1,133 @@
+import asyncio
+import pytest
+from config.system_config import WORKFLOW_CONFIG
+from core.job_queue import JobQueue
+from core.workflow_manager import WorkflowManager
+
+class ComfyFalso:
+    """ComfyUI que falha as primeiras execuções e mede a concorrência"""
+
+    def __init__(self, falhas=0, duracao=0.01):
+        self.falhas = falhas
+        self.duracao = duracao
+        self.ordem = []
+        self.em_execucao = 0
+        self.max_em_execucao = 0
+        self.parados = []
+
+    async def execute_workflow(self, workflow_path, output_dir):
+        self.ordem.append(workflow_path)
+        self.em_execucao += 1
+        self.max_em_execucao = max(self.max_em_execucao, self.em_execucao)
+        try:
+            await asyncio.sleep(self.duracao)
+        finally:
+            self.em_execucao -= 1
+        if self.falhas:
+            self.falhas -= 1
+            return {'success': False, 'error': 'erro temporário'}
+        return {'success': True, 'output': workflow_path}
+
+    async def stop_workflow(self, workflow_id):
+        self.parados.append(workflow_id)
+
+@pytest.fixture
+def config(monkeypatch):
+    monkeypatch.setitem(WORKFLOW_CONFIG, 'max_concurrent', 2)
+    monkeypatch.setitem(WORKFLOW_CONFIG, 'timeout', 1)
+    monkeypatch.setitem(WORKFLOW_CONFIG, 'auto_retry', True)
+    monkeypatch.setitem(WORKFLOW_CONFIG, 'max_retries', 3)
+    monkeypatch.setitem(WORKFLOW_CONFIG, 'retry_backoff', 0.01)
+
+def test_fila_com_prioridade_e_limite(tmp_path, config):
+    """Testa admissão acima do limite, prioridade e concorrência máxima"""
+    async def cenario():
+        comfy = ComfyFalso()
+        manager = WorkflowManager(comfy, queue=JobQueue(tmp_path / "fila.sqlite3"))
+        for i in range(5):
+            await manager.execute_workflow({'id': f"w{i}", 'path': f"w{i}"}, priority=0)
+        await manager.execute_workflow({'id': "urgente", 'path': "urgente"}, priority=10)
+
+        estados = [await manager.wait_workflow(f"w{i}", timeout=2) for i in range(5)]
+        assert all(estado['status'] == 'completed' for estado in estados)
+        assert comfy.max_em_execucao == 2
+        assert comfy.ordem.index("urgente") < comfy.ordem.index("w4")
+        await manager.stop_all()
+
+    asyncio.run(cenario())
+
+def test_retry_timeout_e_cancelamento(tmp_path, config, monkeypatch):
+    """Testa novas tentativas com backoff, timeout e cancelamento"""
+    async def cenario():
+        fila = JobQueue(tmp_path / "fila.sqlite3")
+        comfy = ComfyFalso(falhas=2)
+        manager = WorkflowManager(comfy, queue=fila)
+
+        await manager.execute_workflow({'id': "instavel", 'path': "instavel"})
+        estado = await manager.wait_workflow("instavel", timeout=2)
+        assert estado['status'] == 'completed' and estado['attempts'] == 3
+
+        # Execução acima do timeout esgota as tentativas
+        monkeypatch.setitem(WORKFLOW_CONFIG, 'timeout', 0.01)
+        monkeypatch.setitem(WORKFLOW_CONFIG, 'max_retries', 1)
+        comfy.duracao = 0.5
+        await manager.execute_workflow({'id': "lento", 'path': "lento"})
+        estado = await manager.wait_workflow("lento", timeout=2)
+        assert estado['status'] == 'failed'
+        assert 'Timeout' in estado['error']
+        # max_retries conta novas tentativas; cada timeout interrompe o prompt no ComfyUI
+        assert estado['attempts'] == 2
+        assert comfy.parados == ["lento", "lento"]
+
+        monkeypatch.setitem(WORKFLOW_CONFIG, 'timeout', 5)
+        await manager.execute_workflow({'id': "cancelado", 'path': "cancelado"})
+        await asyncio.sleep(0.05)
+        await manager.stop_workflow("cancelado")
+        estado = await manager.wait_workflow("cancelado", timeout=2)
+        assert estado['status'] == 'stopped'
+        assert comfy.parados == ["lento", "lento", "cancelado"]
+        assert fila.get("cancelado")['status'] == JobQueue.CANCELLED
+        await manager.stop_all()
+
+    asyncio.run(cenario())
+
+def test_desligamento_mantem_jobs_na_fila(tmp_path, config, monkeypatch):
+    """Testa que stop_all devolve os jobs não finalizados à fila para a próxima execução"""
+    monkeypatch.setitem(WORKFLOW_CONFIG, 'max_concurrent', 1)
+
+    async def cenario():
+        fila = JobQueue(tmp_path / "fila.sqlite3")
+        comfy = ComfyFalso(duracao=5)
+        manager = WorkflowManager(comfy, queue=fila)
+        await manager.execute_workflow({'id': "a", 'path': "a"})
+        await manager.execute_workflow({'id': "b", 'path': "b"})
+        await asyncio.sleep(0.05)
+        espera = asyncio.create_task(manager.wait_workflow("a"))
+        await asyncio.sleep(0)
+
+        await manager.stop_all()
+        assert comfy.parados == ["a"]
+        with pytest.raises(asyncio.CancelledError):
+            await espera
+        assert [job['id'] for job in fila.list(JobQueue.PENDING)] == ["a", "b"]
+
+        comfy.duracao = 0.01
+        outro = WorkflowManager(comfy, queue=fila)
+        await outro.start()
+        assert (await outro.wait_workflow("b", timeout=2))['status'] == 'completed'
+        assert (await outro.wait_workflow("a", timeout=2))['status'] == 'completed'
+        await outro.stop_all()
+
+    asyncio.run(cenario())
+
+def test_recupera_jobs_interrompidos(tmp_path):
+    """Testa que jobs em execução numa queda voltam para a fila"""
+    fila = JobQueue(tmp_path / "fila.sqlite3")
+    fila.enqueue("a", {'id': "a"})
+    assert fila.claim()['id'] == "a"
+    fila.close()
+
+    fila = JobQueue(tmp_path / "fila.sqlite3")
+    assert fila.claim() is None
+    assert fila.recover() == 1
+    assert fila.claim()['attempts'] == 2
@@ -1,36 +1,242 @@
+import copy
 import json
-from typing import Dict, List, Optional
+import uuid
+import random
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 
+@dataclass
+class ImageRequest:
+    """Pedido de geração de imagem aguardando envio ao ComfyUI."""
+    prompt: str
+    negative: str = "bad, deformed"
+    checkpoint: str = "v1-5-pruned.ckpt"
+    sampler: str = "euler"
+    scheduler: str = "normal"
+    steps: int = 20
+    cfg: float = 8
+    width: int = 512
+    height: int = 512
+    seed: Optional[int] = None
+    request_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    
+    def batch_key(self) -> tuple:
+        """Parâmetros que precisam coincidir para dividir um workflow."""
+        return (self.checkpoint, self.sampler, self.scheduler, self.steps, self.width, self.height)
+    
+    def conditioning_key(self) -> tuple:
+        """Parâmetros que precisam coincidir para dividir um lote latente.
+
+        Uma seed explícita fixa o ruído, então esses pedidos não são agrupados.
+        """
+        return (self.prompt, self.negative, self.cfg,
+                None if self.seed is None else self.request_id)
+
+@dataclass
+class WorkflowBatch:
+    """Workflow agrupado e a posição de cada pedido nos outputs."""
+    workflow: Dict
+    slots: Dict[str, Tuple[str, int]]  # request_id -> (nó SaveImage, índice no lote)
+    
+    def split_outputs(self, outputs: Dict) -> Dict[str, Optional[Dict]]:
+        """Separa os outputs do ComfyUI (``{nó: {"images": [...]}}``) por pedido."""
+        results = {}
+        for request_id, (node_id, position) in self.slots.items():
+            images = (outputs.get(node_id) or {}).get("images", [])
+            results[request_id] = images[position] if position < len(images) else None
+        return results
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError("Nó compartilhado com o template é somente leitura; copie-o antes de alterar")
+
+class _FrozenDict(dict):
+    """Dicionário somente leitura dos nós compartilhados entre instâncias."""
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+    
+    def __copy__(self):
+        return dict(self)
+    
+    def __deepcopy__(self, memo):
+        return _thaw(self)
+    
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+class _FrozenList(list):
+    """Lista somente leitura (links como ``["4", 0]``) dos nós compartilhados."""
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+    
+    def __copy__(self):
+        return list(self)
+    
+    def __deepcopy__(self, memo):
+        return _thaw(self)
+    
+    def __reduce__(self):
+        return (list, (list(self),))
+
+def _freeze(value):
+    """Converte o valor em dicionários e listas somente leitura.
+
+    Continuam sendo ``dict``/``list`` (serializam como JSON e passam em
+    ``isinstance``), mas qualquer alteração levanta ``TypeError`` em vez de
+    mudar o template em silêncio.
+    """
+    if isinstance(value, list):
+        return _FrozenList(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return _FrozenDict((key, _freeze(item)) for key, item in value.items())
+    return value
+
+def _thaw(value):
+    """Copia o valor (congelado ou não) para dicionários e listas comuns.
+
+    Escalares são compartilhados.
+    """
+    if isinstance(value, dict):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_thaw(item) for item in value]
+    return value
+
+class CompiledTemplate:
+    """Template pré-processado com slots nomeados de parâmetros.
+
+    O grafo é mantido congelado (somente leitura) e os slots são
+    localizados uma única vez. ``instantiate`` copia apenas os nós que
+    recebem parâmetros; os demais são compartilhados entre as instâncias,
+    sem o custo de um ciclo ``json.dumps``/``json.loads``.
+    """
+    
+    # slot -> (class_type do nó, input)
+    SLOT_INPUTS = {
+        "seed": ("KSampler", "seed"),
+        "steps": ("KSampler", "steps"),
+        "cfg": ("KSampler", "cfg"),
+        "sampler": ("KSampler", "sampler_name"),
+        "scheduler": ("KSampler", "scheduler"),
+        "width": ("EmptyLatentImage", "width"),
+        "height": ("EmptyLatentImage", "height"),
+        "batch_size": ("EmptyLatentImage", "batch_size"),
+        "checkpoint": ("CheckpointLoaderSimple", "ckpt_name")
+    }
+    
+    def __init__(self, workflow: Dict):
+        self.graph = {node_id: _freeze(node) for node_id, node in workflow.items()}
+        self.slots: Dict[str, List[Tuple[str, str]]] = {}
+        
+        for node_id, node in self.graph.items():
+            class_type = node.get("class_type")
+            inputs = node.get("inputs", {})
+            for slot, (slot_class, input_name) in self.SLOT_INPUTS.items():
+                if class_type == slot_class and input_name in inputs:
+                    self.slots.setdefault(slot, []).append((node_id, input_name))
+            
+            # Os textos positivo/negativo são os CLIPTextEncode ligados ao sampler
+            if class_type == "KSampler":
+                for slot, input_name in (("prompt", "positive"), ("negative", "negative")):
+                    link = inputs.get(input_name)
+                    if isinstance(link, list) and link[0] in self.graph:
+                        self.slots.setdefault(slot, []).append((link[0], "text"))
+    
+    def instantiate(self, **params) -> Dict:
+        """Cria um workflow preenchendo os slots (``size=(w, h)`` define ambos).
+
+        Os nós sem parâmetros são os do template e não podem ser alterados;
+        use ``copy.deepcopy`` para obter um workflow totalmente editável.
+        """
+        if "size" in params:
+            params["width"], params["height"] = params.pop("size")
+        
+        unknown = set(params) - set(self.slots)
+        if unknown:
+            raise KeyError(f"Parâmetros sem slot no template: {', '.join(sorted(unknown))}")
+        
+        workflow = dict(self.graph)
+        for slot in params:
+            for node_id, _ in self.slots[slot]:
+                if workflow[node_id] is self.graph[node_id]:
+                    workflow[node_id] = _thaw(self.graph[node_id])
+        
+        for slot, value in params.items():
+            for node_id, input_name in self.slots[slot]:
+                workflow[node_id]["inputs"][input_name] = value
+        return workflow
+
 class WorkflowGenerator:
     def __init__(self):
         self.templates_path = Path("workflow_templates")
         self.templates_path.mkdir(exist_ok=True)
+        self.templates = {}
+        self._compiled: Dict[str, CompiledTemplate] = {}
+        self._mtimes: Dict[str, float] = {}
         self._load_templates()
         
     def _load_templates(self):
-        """Carrega templates de workflows."""
-        self.templates = {}
+        """Carrega templates de workflows novos ou alterados desde a última leitura."""
+        seen = set()
         for file in self.templates_path.glob("*.json"):
+            seen.add(file.stem)
+            mtime = file.stat().st_mtime
+            if self._mtimes.get(file.stem) == mtime:
+                continue
             with open(file) as f:
                 self.templates[file.stem] = json.load(f)
+            self._mtimes[file.stem] = mtime
+            self._compiled.pop(file.stem, None)
+        
+        # Templates removidos do diretório
+        for name in set(self._mtimes) - seen:
+            self.templates.pop(name, None)
+            self._compiled.pop(name, None)
+            del self._mtimes[name]
     
-    def create_image_workflow(self, prompt: str) -> Dict:
+    def reload_templates(self):
+        """Relê apenas os templates cujo arquivo mudou."""
+        self._load_templates()
+    
+    def compile_template(self, name: str) -> Optional[CompiledTemplate]:
+        """Retorna o template compilado, compilando-o na primeira vez."""
+        compiled = self._compiled.get(name)
+        if compiled is None and name in self.templates:
+            compiled = self._compiled[name] = CompiledTemplate(self.templates[name])
+        return compiled
+    
+    def instantiate_template(self, name: str, **params) -> Optional[Dict]:
+        """Cria um workflow a partir de um template, preenchendo os slots nomeados."""
+        compiled = self.compile_template(name)
+        return compiled.instantiate(**params) if compiled else None
+    
+    def create_image_workflow(self,
+                              prompt: str,
+                              negative: str = "bad, deformed",
+                              checkpoint: str = "v1-5-pruned.ckpt",
+                              sampler: str = "euler",
+                              scheduler: str = "normal",
+                              steps: int = 20,
+                              cfg: float = 8,
+                              width: int = 512,
+                              height: int = 512,
+                              seed: int = 8566257,
+                              batch_size: int = 1) -> Dict:
         """Cria um workflow para geração de imagens."""
         workflow = {
             "3": {
                 "class_type": "KSampler",
                 "inputs": {
-                    "cfg": 8,
+                    "cfg": cfg,
                     "denoise": 1,
                     "latent_image": ["5", 0],
                     "model": ["4", 0],
                     "negative": ["2", 0],
                     "positive": ["1", 0],
-                    "sampler_name": "euler",
-                    "scheduler": "normal",
-                    "seed": 8566257,
-                    "steps": 20
+                    "sampler_name": sampler,
+                    "scheduler": scheduler,
+                    "seed": seed,
+                    "steps": steps
                 }
             },
             "1": {
@@ -44,21 +250,21 @@ class WorkflowGenerator:
                 "class_type": "CLIPTextEncode",
                 "inputs": {
                     "clip": ["4", 1],
-                    "text": "bad, deformed"
+                    "text": negative
                 }
             },
             "4": {
                 "class_type": "CheckpointLoaderSimple",
                 "inputs": {
-                    "ckpt_name": "v1-5-pruned.ckpt"
+                    "ckpt_name": checkpoint
                 }
             },
             "5": {
                 "class_type": "EmptyLatentImage",
                 "inputs": {
-                    "batch_size": 1,
-                    "height": 512,
-                    "width": 512
+                    "batch_size": batch_size,
+                    "height": height,
+                    "width": width
                 }
             },
             "6": {
@@ -78,6 +284,54 @@ class WorkflowGenerator:
         }
         return workflow
     
+    def create_batch_workflow(self, requests: List[ImageRequest]) -> "WorkflowBatch":
+        """Cria um único workflow para requisições com o mesmo modelo e amostragem.
+
+        Requisições com o mesmo prompt (e sem seed própria) dividem um
+        ``EmptyLatentImage`` com ``batch_size`` igual ao seu número; prompts
+        diferentes viram ramos do mesmo grafo, compartilhando o checkpoint
+        carregado.
+        """
+        first = requests[0]
+        branches: Dict[tuple, List[ImageRequest]] = {}
+        for request in requests:
+            branches.setdefault(request.conditioning_key(), []).append(request)
+        
+        workflow = {}
+        slots = {}
+        for index, members in enumerate(branches.values()):
+            nodes = self.create_image_workflow(
+                members[0].prompt,
+                negative=members[0].negative,
+                checkpoint=first.checkpoint,
+                sampler=first.sampler,
+                scheduler=first.scheduler,
+                steps=first.steps,
+                cfg=members[0].cfg,
+                width=first.width,
+                height=first.height,
+                seed=members[0].seed if members[0].seed is not None else random.randint(0, 2**32 - 1),
+                batch_size=len(members)
+            )
+            # O primeiro ramo mantém os ids originais; os demais são deslocados
+            # e todos apontam para o mesmo CheckpointLoader ("4")
+            rename = {node_id: node_id if index == 0 or node_id == "4" else str(index * 100 + int(node_id))
+                      for node_id in nodes}
+            for node_id, node in nodes.items():
+                if node_id == "4" and "4" in workflow:
+                    continue
+                for name, value in node["inputs"].items():
+                    if isinstance(value, list):
+                        node["inputs"][name] = [rename[value[0]], value[1]]
+                workflow[rename[node_id]] = node
+            
+            save_node = rename["7"]
+            workflow[save_node]["inputs"]["filename_prefix"] = f"batch_{index}"
+            for position, request in enumerate(members):
+                slots[request.request_id] = (save_node, position)
+        
+        return WorkflowBatch(workflow=workflow, slots=slots)
+    
     def create_code_workflow(self, prompt: str) -> Dict:
         """Cria um workflow para geração de código."""
         # Implementar depois - por enquanto retorna um workflow básico
@@ -98,7 +352,12 @@ class WorkflowGenerator:
         file_path = self.templates_path / f"{name}.json"
         with open(file_path, "w") as f:
             json.dump(workflow, f, indent=2)
-        self._load_templates()  # Recarrega templates
+        
+        # Atualiza só este template, sem reler o diretório; a cópia impede que
+        # alterações posteriores do chamador mudem o template salvo
+        self.templates[name] = copy.deepcopy(workflow)
+        self._mtimes[name] = file_path.stat().st_mtime
+        self._compiled.pop(name, None)
     
     def load_template(self, name: str) -> Optional[Dict]:
         """Carrega um template de workflow."""
@@ -106,12 +365,55 @@ class WorkflowGenerator:
     
     def customize_workflow(self, base_workflow: Dict, modifications: Dict) -> Dict:
         """Personaliza um workflow existente."""
-        # Cria uma cópia do workflow base
-        workflow = json.loads(json.dumps(base_workflow))
+        # A base costuma ser um template em cache: a cópia completa impede
+        # que alterações no resultado cheguem a ele
+        workflow = copy.deepcopy(base_workflow)
         
         # Aplica modificações
         for node_id, modifications in modifications.items():
             if node_id in workflow:
                 workflow[node_id]["inputs"].update(modifications)
         
-        return workflow 
\ No newline at end of file
+        return workflow
+
+class ImageBatcher:
+    """Agrupa pedidos de imagem pendentes antes do envio ao ComfyUI.
+
+    Pedidos com o mesmo checkpoint, sampler, passos e tamanho viram um só
+    prompt no ComfyUI, evitando a sobrecarga de agendamento de cada um.
+    """
+    
+    def __init__(self, generator: WorkflowGenerator = None, max_batch_size: int = 8):
+        self.generator = generator or WorkflowGenerator()
+        self.max_batch_size = max_batch_size
+        self.pending: List[ImageRequest] = []
+    
+    def add(self, request: ImageRequest) -> str:
+        """Enfileira um pedido e retorna seu id."""
+        self.pending.append(request)
+        return request.request_id
+    
+    def flush(self) -> List[WorkflowBatch]:
+        """Monta os workflows agrupados e esvazia a fila."""
+        groups: Dict[tuple, List[ImageRequest]] = {}
+        for request in self.pending:
+            groups.setdefault(request.batch_key(), []).append(request)
+        self.pending = []
+        
+        batches = []
+        for requests in groups.values():
+            for start in range(0, len(requests), self.max_batch_size):
+                batches.append(self.generator.create_batch_workflow(
+                    requests[start:start + self.max_batch_size]
+                ))
+        return batches
+    
+    def run(self, execute: Callable[[Dict], Dict]) -> Dict[str, Optional[Dict]]:
+        """Envia os lotes pendentes com ``execute(workflow) -> outputs``.
+
+        Retorna o output de cada pedido pelo seu id.
+        """
+        results = {}
+        for batch in self.flush():
+            results.update(batch.split_outputs(execute(batch.workflow) or {}))
+        return results